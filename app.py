@@ -1,17 +1,27 @@
 import streamlit as st
 import pandas as pd
-from datetime import datetime, date, timedelta
-import gspread
+from datetime import datetime, timedelta
+import os
 from oauth2client.service_account import ServiceAccountCredentials
 import json
-import random
-import string
-import re
 import time
-import numpy as np
+from functools import partial
+from crm.agendador import Agendador
+from crm.busca import paginas
+from crm.carga import SincronizadorPlanilha
+from crm.conexao import ClienteSheets
+from crm.dados import BaseCompartilhada
+from crm.exportacao import FORMATOS, exportar
+from crm.fila import FilaEscrita
+from crm.metricas import METRICAS, memoria_processo_mb, prometheus, registros_json, tamanho_mb
+from crm.servico import Servico
+from crm.snapshot import PASTA_PADRAO
+from crm.helpers import fmt_moeda, fmt_data, fmt_doc
 
 # --- 1. CONFIGURAÇÃO VISUAL ---
 st.set_page_config(page_title="CRM Master 24.9", layout="wide")
+# Tempo do rerun inteiro (os que terminam em st.stop/st.rerun não entram)
+ini_rerun = time.perf_counter()
 URL_LOGO = "https://cdn-icons-png.flaticon.com/512/9187/9187604.png"
 
 # --- CSS ---
@@ -25,151 +35,54 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# --- 2. HELPERS ---
-def gerar_id_proposta(): 
-    return ''.join(random.choices(string.ascii_uppercase + string.digits, k=4))
-
-def extrair_id(t): 
-    match = re.search(r'(#[A-Z0-9]{4})', str(t))
-    return match.group(1) if pd.notna(t) and match else None
-
-def extrair_pedido_protheus(t): 
-    match = re.search(r'\[PROTHEUS\] Pedido: (\w+)', str(t))
-    return match.group(1) if pd.notna(t) and match else None
-
-def limpar_int(v): 
-    try: return int(re.sub(r'[^\d]', '', str(v).split(',')[0])) if pd.notna(v) and str(v).strip() else 0
-    except: return 0
-
-def limpar_doc(v):
-    return ''.join(filter(str.isdigit, str(v)))
-
-def fmt_moeda(v): 
-    try: return f"R$ {int(v):,.0f}".replace(',', '.')
-    except: return "R$ 0"
-
-def fmt_data(d): 
-    return pd.to_datetime(d).strftime('%d/%m/%Y') if pd.notna(d) and str(d).strip() != '' else "-"
-
-def fmt_doc(v):
-    d = limpar_doc(v)
-    return f"{d[:2]}.{d[2:5]}.{d[5:8]}/{d[8:12]}-{d[12:]}" if len(d)>11 else f"{d[:3]}.{d[3:6]}.{d[6:9]}-{d[9:]}"
+# --- 2. HELPERS (crm/helpers.py) ---
 
 # --- 3. CONEXÃO GOOGLE ---
+# Um cliente por processo: autoriza e abre a planilha uma vez e reaproveita as abas.
+# Com `planilha_id` nos secrets a planilha é aberta pelo id, sem a busca por nome no Drive.
+@st.cache_resource
+def obter_cliente_sheets():
+    def credenciais():
+        return ServiceAccountCredentials.from_json_keyfile_dict(json.loads(st.secrets["credenciais_google"]), ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"])
+    return ClienteSheets(credenciais, nome="Banco de Dados CRM", chave=st.secrets.get("planilha_id"))
+
 def conectar_google_sheets():
     try:
-        creds = ServiceAccountCredentials.from_json_keyfile_dict(json.loads(st.secrets["credenciais_google"]), ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"])
-        return gspread.authorize(creds).open("Banco de Dados CRM")
+        return obter_cliente_sheets().conectar()
     except Exception as e:
         st.error(f"Erro Conexão: {e}")
         return None
 
 # --- 4. CARREGAMENTO (CACHE) ---
-@st.cache_data(ttl=3600)
-def carregar_dados_cache():
-    ss = conectar_google_sheets()
-    if not ss: return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
-    
-    # Config
-    try:
-        df_cfg = pd.DataFrame(ss.worksheet("Config_Equipe").get_all_records()).astype(str)
-        for c in ['Meta_Fat','Meta_Clientes','Meta_Atividades']: 
-            if c in df_cfg.columns: df_cfg[c] = df_cfg[c].apply(limpar_int)
-        if 'Usuario' in df_cfg.columns: 
-            df_cfg['Usuario'] = df_cfg['Usuario'].str.strip().str.upper()
-    except: df_cfg = pd.DataFrame()
-
-    # Clientes
-    try:
-        df_cli = pd.DataFrame(ss.worksheet("Clientes").get_all_records())
-        if not df_cli.empty:
-            df_cli.columns = df_cli.columns.str.strip()
-            df_cli['ID_Cliente_CNPJ_CPF'] = df_cli['ID_Cliente_CNPJ_CPF'].astype(str)
-            df_cli['KEY_DOC'] = df_cli['ID_Cliente_CNPJ_CPF'].apply(limpar_doc)
-            if 'Ultimo_Vendedor' in df_cli.columns:
-                df_cli['Ultimo_Vendedor'] = df_cli['Ultimo_Vendedor'].astype(str).str.strip().str.upper()
-            if 'Total_Compras' in df_cli.columns: df_cli['Total_Compras'] = df_cli['Total_Compras'].apply(limpar_int)
-            if 'Data_Ultima_Compra' in df_cli.columns: df_cli['Data_Ultima_Compra'] = pd.to_datetime(df_cli['Data_Ultima_Compra'], dayfirst=True, errors='coerce')
-    except: df_cli = pd.DataFrame()
-
-    # Leads
-    try:
-        df_leads = pd.DataFrame(ss.worksheet("Novos_Leads").get_all_records()).astype(str)
-        if not df_leads.empty: 
-            df_leads['KEY_DOC'] = df_leads['ID_Cliente_CNPJ_CPF'].apply(limpar_doc)
-            if 'Vendedor' in df_leads.columns: df_leads['Vendedor'] = df_leads['Vendedor'].str.strip().str.upper()
-            df_cli = pd.concat([df_cli, df_leads], ignore_index=True)
-    except: pass
-
-    # Interações
-    try:
-        df_int = pd.DataFrame(ss.worksheet("Interacoes").get_all_records())
-        if not df_int.empty:
-            if 'Valor_Proposta' in df_int.columns: df_int['Valor_Proposta'] = df_int['Valor_Proposta'].apply(limpar_int)
-            if 'Data' in df_int.columns: df_int['Data_Obj'] = pd.to_datetime(df_int['Data'], dayfirst=True, errors='coerce').dt.date
-            df_int['CNPJ_Cliente'] = df_int['CNPJ_Cliente'].astype(str)
-            df_int['KEY_DOC'] = df_int['CNPJ_Cliente'].apply(limpar_doc)
-            if 'Vendedor' in df_int.columns: df_int['Vendedor'] = df_int['Vendedor'].astype(str).str.strip().str.upper()
-            
-            if 'Nome_Cliente' not in df_int.columns: df_int['Nome_Cliente'] = None
-            mapa = dict(zip(df_cli['KEY_DOC'], df_cli['Nome_Fantasia']))
-            mask_n = df_int['Nome_Cliente'].isna() | (df_int['Nome_Cliente'] == "")
-            df_int.loc[mask_n, 'Nome_Cliente'] = df_int.loc[mask_n, 'KEY_DOC'].map(mapa).fillna("Cliente Carteira")
-    except: df_int = pd.DataFrame(columns=['CNPJ_Cliente','KEY_DOC','Data','Tipo','Resumo','Vendedor','Valor_Proposta','Data_Obj','Nome_Cliente'])
-
-    return df_cfg, df_cli, df_int
-
-# --- 5. MOTOR DE CÁLCULO ---
-def recalcular_status_massa(df_c, df_i):
-    if df_c.empty: return df_c
-    hoje = datetime.now().date()
-    
-    df_c['Status'] = '🟢 ATIVO'
-    if 'Data_Ultima_Compra' in df_c.columns:
-        df_c['Dias_Sem_Comprar'] = (pd.Timestamp(hoje) - df_c['Data_Ultima_Compra']).dt.days
-        df_c.loc[df_c['Dias_Sem_Comprar'] >= 60, 'Status'] = '🔴 RECUPERAR'
-        df_c.loc[df_c['Dias_Sem_Comprar'].isna(), 'Status'] = '🆕 NOVO S/ INTERAÇÃO'
-    
-    if df_i.empty: return df_c
-
-    ultimas_interacoes = df_i.sort_values('Data_Obj', ascending=True).groupby('KEY_DOC').tail(1)
-    mapa_status_interacao = dict(zip(ultimas_interacoes['KEY_DOC'], ultimas_interacoes['Tipo']))
-    
-    def aplicar_status_crm(row):
-        key = row['KEY_DOC']
-        ultima_acao = mapa_status_interacao.get(key)
-        if not ultima_acao: return row['Status']
-        if ultima_acao == 'Orçamento Enviado': return '⏳ NEGOCIAÇÃO'
-        elif ultima_acao in ['Ligação Realizada', 'WhatsApp Enviado', 'Agendou Visita']: return '⚠️ FOLLOW-UP'
-        elif ultima_acao == 'Venda Perdida': return '👎 VENDA PERDIDA'
-        elif ultima_acao == 'Venda Fechada': return '⭐ VENDA RECENTE'
-        else: return row['Status']
-
-    df_c['Status'] = df_c.apply(aplicar_status_crm, axis=1)
-    return df_c
+# Uma única cópia dos dados por processo, compartilhada por todas as sessões.
+# A carga completa roda na criação e a cada 1h; fora isso só entram as linhas novas.
+# Num restart a base sobe do snapshot local e se reconcilia com a planilha em segundo plano.
+# As gravações entram na base na hora e vão para a planilha pela fila (diário em disco).
+@st.cache_resource
+def obter_fila():
+    return FilaEscrita(conectar_google_sheets, os.path.join(PASTA_PADRAO, 'fila.jsonl'))
+
+@st.cache_resource
+def obter_base():
+    return BaseCompartilhada(SincronizadorPlanilha(conectar_google_sheets), obter_fila(), ttl=3600, pasta_snapshot=PASTA_PADRAO)
+
+# --- 5. MOTOR DE CÁLCULO (crm/motor.py) ---
+# Carga, status, indicadores e importação ficam em crm/servico.py, memorizados pela versão
+# da base: esta parte só desenha o que o serviço devolve.
+# Status do dia, filas de recuperação/follow-up e metas do mês ficam prontos num Quadro,
+# remontado em segundo plano na virada do dia e a cada sincronização (crm/agendador.py).
+@st.cache_resource
+def obter_agendador():
+    return Agendador(obter_base())
+
+@st.cache_resource
+def obter_servico():
+    return Servico(obter_base(), obter_agendador())
 
 # --- 6. SALVAMENTO ---
 def salvar_nuvem(cnpj, data_input, tipo, resumo, vend, val):
     try:
-        if isinstance(data_input, datetime): data_obj = data_input.date()
-        else: data_obj = data_input
-
-        resumo_final = resumo
-        if tipo == "Orçamento Enviado":
-            id_prop = f"#{gerar_id_proposta()}"
-            resumo_final = f"{id_prop} {resumo}"
-
-        ss = conectar_google_sheets()
-        vend_clean = str(vend).strip().upper()
-        ss.worksheet("Interacoes").append_row([str(cnpj), data_obj.strftime('%d/%m/%Y'), tipo, resumo_final, vend_clean, int(val)])
-        
-        cnpj_clean = limpar_doc(cnpj)
-        novo = {
-            'CNPJ_Cliente': str(cnpj), 'KEY_DOC': cnpj_clean, 'Data_Obj': data_obj,
-            'Tipo': tipo, 'Resumo': resumo_final, 'Vendedor': vend_clean, 'Valor_Proposta': int(val), 'Nome_Cliente': '...'
-        }
-        st.session_state['df_int'] = pd.concat([st.session_state['df_int'], pd.DataFrame([novo])], ignore_index=True)
-        st.session_state['df_cli'] = recalcular_status_massa(st.session_state['df_cli'], st.session_state['df_int'])
+        obter_servico().salvar_interacao(cnpj, data_input, tipo, resumo, vend, val)
         return True
     except Exception as e:
         st.error(f"Erro ao salvar: {e}")
@@ -177,108 +90,62 @@ def salvar_nuvem(cnpj, data_input, tipo, resumo, vend, val):
 
 def salvar_lead(nome, doc, cont, tel, vend, ori, acao, res, val):
     try:
-        ss = conectar_google_sheets()
-        vend_clean = str(vend).strip().upper()
-        ss.worksheet("Novos_Leads").append_row([str(doc), nome.upper(), cont, "NOVO LEAD", tel, "", "", "0", "", "0", "", vend_clean, ori])
-        st.cache_data.clear() 
-        if acao:
-            id_p = f"#{gerar_id_proposta()} " if acao == "Orçamento Enviado" else ""
-            resumo_final = f"{id_p}{res}"
-            ss.worksheet("Interacoes").append_row([str(doc), datetime.now().strftime('%d/%m/%Y'), acao, resumo_final, vend_clean, int(val)])
+        obter_servico().salvar_lead(nome, doc, cont, tel, vend, ori, acao, res, val)
         return True
     except: return False
 
-def proc_import(file, df_old):
-    try:
-        df = pd.read_excel(file)
-        if not {'DATA','CNPJ','VENDEDOR','VALOR','PEDIDO','STATUS'}.issubset(df.columns): return False, "Colunas Erradas"
-        peds_ex = set(df_old['Resumo'].apply(extrair_pedido_protheus).dropna()) if not df_old.empty else set()
-        novos = []
-        for _, r in df.iterrows():
-            pid = str(r['PEDIDO']).strip()
-            if pid not in peds_ex:
-                stt = str(r['STATUS']).upper()
-                tipo = "Venda Fechada" if "FECHADO" in stt or "FATURADO" in stt else ("Venda Perdida" if "CANCELADO" in stt else "Orçamento Enviado")
-                res = f"{'#'+gerar_id_proposta()+' ' if tipo=='Orçamento Enviado' else ''}[PROTHEUS] Pedido: {pid} | {stt}"
-                try: dt = pd.to_datetime(r['DATA']).strftime('%d/%m/%Y')
-                except: dt = datetime.now().strftime('%d/%m/%Y')
-                v_imp = str(r['VENDEDOR']).strip().upper()
-                novos.append([''.join(filter(str.isdigit, str(r['CNPJ']))), dt, tipo, res, v_imp, limpar_int(r['VALOR'])])
-        if novos: 
-            conectar_google_sheets().worksheet("Interacoes").append_rows(novos)
-            st.cache_data.clear()
-            return True, f"{len(novos)} importados."
-        return True, "Nada novo."
+def proc_import(file):
+    try: return True, obter_servico().importar(file)
+    except Exception as e: return False, str(e)
+
+def proc_import_clientes(file):
+    try: return True, obter_servico().importar_clientes(file)
     except Exception as e: return False, str(e)
 
 # --- 7. APP PRINCIPAL ---
 if 'logado' not in st.session_state: st.session_state['logado'] = False
-if 'df_cli' not in st.session_state:
-    cfg, cli, inter = carregar_dados_cache()
-    if not cli.empty: cli = recalcular_status_massa(cli, inter)
-    st.session_state.update({'df_cfg':cfg, 'df_cli':cli, 'df_int':inter})
-
-df_cfg = st.session_state['df_cfg']
+base = obter_base()
+servico = obter_servico()
+base.garantir_atualizado()
 
 # LOGIN
 if not st.session_state['logado']:
     if URL_LOGO: st.sidebar.image(URL_LOGO, width=150)
     st.sidebar.title("CRM Login")
-    if df_cfg.empty: st.error("Erro Config"); st.stop()
-    usrs = sorted(df_cfg['Usuario'].unique())
+    usrs = servico.usuarios()
+    if not usrs: st.error("Erro Config"); st.stop()
     u = st.sidebar.selectbox("Usuário", usrs)
     p = st.sidebar.text_input("Senha", type="password")
     if st.sidebar.button("Entrar"):
-        ud = df_cfg[df_cfg['Usuario']==u].iloc[0]
-        if str(ud['Senha']).strip() == str(p).strip():
+        if servico.autenticar(u, p):
             st.session_state['logado'] = True; st.session_state['u_atual'] = u; st.rerun()
         else: st.error("Senha Incorreta")
     st.stop()
 
 u_log = st.session_state['u_atual']
-df_cli = st.session_state['df_cli']
-df_int = st.session_state['df_int']
-u_data = df_cfg[df_cfg['Usuario']==u_log].iloc[0]
-tipo_u = str(u_data['Tipo']).upper().strip()
-carts_raw = str(u_data['Carteira_Alvo']).split(',')
-carts = [x.strip().upper() for x in carts_raw if x.strip() != '']
+perfil = servico.perfil(u_log)
+tipo_u, carts = perfil['tipo'], perfil['carts']
 
 if URL_LOGO: st.sidebar.image(URL_LOGO, width=150)
 st.sidebar.title(f"Olá, {u_log}")
-if st.sidebar.button("🔄 Atualizar"): st.cache_data.clear(); st.rerun()
+if st.sidebar.button("🔄 Atualizar"):
+    try: base.sincronizar(); obter_agendador().avisar(); st.rerun()
+    except Exception as e:
+        METRICAS.contar('sincronizacao.erros')
+        st.sidebar.error(f"Erro ao atualizar: {e}")
 if st.sidebar.button("Sair"): st.session_state['logado'] = False; st.rerun()
+fila = obter_fila()
+pend = len(fila.pendentes())
+if pend:
+    erro = f" | último erro: {fila.ultimo_erro}" if fila.ultimo_erro else ""
+    st.sidebar.caption(f"⏳ {pend} gravação(ões) aguardando envio à planilha{erro}")
+if fila.recusados:
+    st.sidebar.warning(f"{fila.recusados} gravação(ões) recusada(s) pela planilha, guardadas em {os.path.basename(fila.arquivo_recusadas)}"
+                       + (f" ({fila.ultima_recusa})" if fila.ultima_recusa else ""))
 st.sidebar.divider()
 
-prim_dia = datetime.now().date().replace(day=1)
-
-if tipo_u == "GESTOR":
-    vendedores_cfg = df_cfg[df_cfg['Tipo'] == 'VENDEDOR']
-    mf = vendedores_cfg['Meta_Fat'].sum()
-    mc = vendedores_cfg['Meta_Clientes'].sum()
-    ma = vendedores_cfg['Meta_Atividades'].sum()
-    if not df_int.empty:
-        df_mes_gestor = df_int[df_int['Data_Obj'] >= prim_dia]
-        if "TODOS" not in carts:
-            lista_team = carts
-            df_mes_gestor = df_mes_gestor[df_mes_gestor['Vendedor'].isin(lista_team)]
-        fat_r = df_mes_gestor[df_mes_gestor['Tipo']=='Venda Fechada']['Valor_Proposta'].sum()
-        cli_r = df_mes_gestor[df_mes_gestor['Tipo']=='Venda Fechada']['CNPJ_Cliente'].nunique()
-        ativ_r = len(df_mes_gestor[df_mes_gestor['Tipo'].isin(['Ligação Realizada','WhatsApp Enviado','Agendou Visita'])])
-    else: fat_r=0; cli_r=0; ativ_r=0
-else:
-    mf, mc, ma = u_data.get('Meta_Fat',0), u_data.get('Meta_Clientes',0), u_data.get('Meta_Atividades',0)
-    if not df_int.empty:
-        mask_vendedor = df_int['Vendedor'] == u_log
-        def safe_date_compare(d):
-            if pd.isna(d): return False
-            if isinstance(d, datetime): return d.date() >= prim_dia
-            return d >= prim_dia
-        mask_data = df_int['Data_Obj'].apply(safe_date_compare)
-        df_m = df_int[mask_vendedor & mask_data]
-        fat_r = df_m[df_m['Tipo']=='Venda Fechada']['Valor_Proposta'].sum()
-        cli_r = df_m[df_m['Tipo']=='Venda Fechada']['CNPJ_Cliente'].nunique()
-        ativ_r = len(df_m[df_m['Tipo'].isin(['Ligação Realizada','WhatsApp Enviado','Agendou Visita'])])
-    else: fat_r=0; cli_r=0; ativ_r=0
+metas = servico.metas(u_log)
+(fat_r, mf), (cli_r, mc), (ativ_r, ma) = metas['Fat'], metas['Cli'], metas['Ativ']
 
 st.sidebar.markdown("### 🎯 Metas Mês")
 st.sidebar.caption(f"💰 Fat: {fmt_moeda(fat_r)} / {fmt_moeda(mf)}")
@@ -293,10 +160,44 @@ if tipo_u == "GESTOR":
     with st.sidebar.expander("📥 Importar Protheus"):
         f = st.file_uploader("Excel", type=["xlsx"])
         if f and st.button("Processar"): 
-            ok, msg = proc_import(f, df_int)
+            ok, msg = proc_import(f)
             if ok: st.success(msg); time.sleep(2); st.rerun()
             else: st.error(msg)
 
+    # Base de clientes do ERP (CSV ";" em Latin-1, mesmas colunas da aba Clientes)
+    with st.sidebar.expander("👥 Importar Clientes"):
+        f_cli = st.file_uploader("CSV", type=["csv"], key="csv_cli")
+        if f_cli and st.button("Processar", key="proc_cli"):
+            ok, msg = proc_import_clientes(f_cli)
+            if ok: st.success(msg); time.sleep(2); st.rerun()
+            else: st.error(msg)
+
+    # Métricas do processo (todas as sessões): só calculadas quando pedidas
+    with st.sidebar.expander("🩺 Diagnóstico"):
+        if st.checkbox("Carregar métricas", key="diag"):
+            api = obter_cliente_sheets().estatisticas()
+            memoria = {f"base.{t}": mb for t, mb in base.memoria()[1].items()}
+            memoria.update({'processo.pico': memoria_processo_mb(), 'sessao': tamanho_mb(st.session_state.to_dict().values())})
+            st.caption(f"Base versão {base.versao} | métricas desde {datetime.fromtimestamp(METRICAS.inicio):%d/%m %H:%M}")
+            agendador = obter_agendador()
+            quadro = agendador.quadro()
+            if quadro: st.caption(f"Quadro {quadro.versao} (base {quadro.versao_base}, status na {quadro.versao_status}, dia {quadro.dia:%d/%m}) montado em {quadro.segundos:.2f}s às {datetime.fromtimestamp(quadro.gerado_em):%H:%M:%S}")
+            # Remontagem em segundo plano que falhou: o Quadro acima é o último que deu certo
+            if agendador.ultimo_erro: st.warning(f"Quadro desatualizado: {agendador.falhas} falha(s), última: {agendador.ultimo_erro}")
+            elif agendador.falhas: st.caption(f"Quadro: {agendador.falhas} falha(s) desde o início, a última remontagem deu certo")
+            st.markdown("**Latência por etapa (ms)**")
+            st.dataframe(METRICAS.latencias().round(1), use_container_width=True)
+            st.markdown("**Caches**")
+            st.dataframe(METRICAS.caches().style.format({'taxa': '{:.0%}'}), use_container_width=True)
+            st.markdown("**Eventos**")
+            st.dataframe(pd.Series(METRICAS.contadores(), name='total', dtype='int64').sort_index(), use_container_width=True)
+            st.markdown("**Chamadas à planilha**")
+            st.dataframe(pd.DataFrame.from_dict(api, orient='index').round(3), use_container_width=True)
+            st.markdown("**Memória (MB)**")
+            st.dataframe(pd.Series(memoria, name='MB').round(1), use_container_width=True)
+            st.download_button("Prometheus", prometheus(api=api, memoria=memoria), file_name="crm_metricas.prom", mime="text/plain")
+            st.download_button("JSON", registros_json(api=api, memoria=memoria), file_name="crm_metricas.jsonl", mime="application/json")
+
 if "TODOS" in carts or tipo_u == "VENDEDOR":
     with st.sidebar.expander("➕ Novo Lead"):
         n = st.text_input("Nome", key="ln"); d = st.text_input("CPF/CNPJ", key="ld")
@@ -308,13 +209,6 @@ if "TODOS" in carts or tipo_u == "VENDEDOR":
         if st.button("Salvar Lead"):
             if salvar_lead(n,d,c,t,u_log,o,a,r,v): st.success("Salvo!"); time.sleep(1); st.rerun()
 
-if "TODOS" in carts:
-    meus_cli = df_cli
-    minhas_int = df_int
-else:
-    meus_cli = df_cli[df_cli['Ultimo_Vendedor'].isin(carts)]
-    minhas_int = df_int[df_int['Vendedor'].isin(carts)]
-
 # --- VIEW GESTOR ---
 if tipo_u == "GESTOR":
     st.title("📊 Painel Geral")
@@ -322,113 +216,75 @@ if tipo_u == "GESTOR":
         c1,c2,c3 = st.columns(3)
         di = c1.date_input("De", value=datetime.now()-timedelta(days=30))
         df = c2.date_input("Até", value=datetime.now())
-        if "TODOS" in carts:
-            lista_vendedores_disponiveis = sorted(df_cfg[df_cfg['Tipo'] == 'VENDEDOR']['Usuario'].unique())
-        else:
-            lista_vendedores_disponiveis = sorted([v for v in carts if v in df_cfg['Usuario'].values])
-        sel_v = c3.multiselect("Vendedores", lista_vendedores_disponiveis)
+        sel_v = c3.multiselect("Vendedores", servico.vendedores_disponiveis(carts))
     
-    if not minhas_int.empty:
-        def safe_date_filter(d):
-            if pd.isna(d): return False
-            if isinstance(d, datetime): d = d.date()
-            return di <= d <= df
-        mask_data_gestor = minhas_int['Data_Obj'].apply(safe_date_filter)
-        dff = minhas_int[mask_data_gestor]
-        if sel_v: dff = dff[dff['Vendedor'].isin(sel_v)]
-    else: dff = pd.DataFrame()
-        
-    if not dff.empty:
-        mapa_atualizado = dict(zip(df_cli['KEY_DOC'], df_cli['Nome_Fantasia']))
-        dff = dff.copy()
-        dff['Nome_Cliente'] = dff['KEY_DOC'].map(mapa_atualizado).fillna("Nome não encontrado")
-
-        resols = set(dff[dff['Tipo'].isin(['Venda Fechada','Venda Perdida'])]['Resumo'])
-        ids_res = set([extrair_id(x) for x in resols if extrair_id(x)])
-        peds_res = set([extrair_pedido_protheus(x) for x in resols if extrair_pedido_protheus(x)])
-        
-        mesa = 0
-        perdido = 0
-        orcado = 0
-        fechado = 0
-
-        # Loop único para calcular KPIs com precisão
-        for _, row in dff.iterrows():
-            if row['Tipo'] == 'Orçamento Enviado':
-                # Verifica se está aberto
-                if not ((extrair_id(row['Resumo']) in ids_res) or (extrair_pedido_protheus(row['Resumo']) in peds_res)):
-                    mesa += row['Valor_Proposta']
-                orcado += row['Valor_Proposta']
-            elif row['Tipo'] == 'Venda Fechada':
-                fechado += row['Valor_Proposta']
-            elif row['Tipo'] == 'Venda Perdida':
-                perdido += row['Valor_Proposta']
+    ini = time.perf_counter()
+    painel = servico.painel_gestor(carts, di, df, sel_v)
+    if painel:
+        kpi = painel['kpi']
         
         # --- NOVO: 4 COLUNAS DE KPI ---
         k1,k2,k3,k4 = st.columns(4)
-        k1.metric("Orçado", fmt_moeda(orcado))
-        k2.metric("Na Mesa", fmt_moeda(mesa))
-        k3.metric("Fechado", fmt_moeda(fechado))
-        k4.metric("Perdido", fmt_moeda(perdido)) # KPI NOVO
+        k1.metric("Orçado", fmt_moeda(kpi['Orcado']))
+        k2.metric("Na Mesa", fmt_moeda(kpi['Pipeline']))
+        k3.metric("Fechado", fmt_moeda(kpi['Fat']))
+        k4.metric("Perdido", fmt_moeda(kpi['Perdido'])) # KPI NOVO
         
         t1, t2 = st.tabs(["🏆 Ranking", "📝 Detalhes das Vendas"])
         
         with t1:
-            agg = dff.groupby('Vendedor').agg(
-                Fat=('Valor_Proposta', lambda x: x[dff.loc[x.index,'Tipo']=='Venda Fechada'].sum()),
-                Cli=('CNPJ_Cliente', lambda x: x[dff.loc[x.index,'Tipo']=='Venda Fechada'].nunique())
-            ).reset_index()
-            df_metas_merge = df_cfg[['Usuario', 'Meta_Fat']].rename(columns={'Usuario':'Vendedor'})
-            agg = pd.merge(agg, df_metas_merge, on='Vendedor', how='left').fillna(0)
-            agg['% Meta'] = agg.apply(lambda x: f"{x['Fat']/x['Meta_Fat']*100:.0f}%" if x['Meta_Fat']>0 else "-", axis=1)
-            agg['Fat'] = agg['Fat'].apply(fmt_moeda)
-            st.dataframe(agg, use_container_width=True)
+            st.dataframe(painel['ranking'], use_container_width=True)
             
         with t2:
-            view_detalhes = dff[['Data_Obj', 'Nome_Cliente', 'Tipo', 'Resumo', 'Valor_Proposta', 'Vendedor']].copy()
-            view_detalhes['Valor_Proposta_Fmt'] = view_detalhes['Valor_Proposta'].apply(fmt_moeda)
-            view_detalhes['Data_Obj'] = view_detalhes['Data_Obj'].apply(fmt_data)
+            view_detalhes = servico.detalhes_gestor(carts, di, df, sel_v)
             
             # --- NOVO: BOTÃO DE EXPORTAÇÃO ---
+            # O arquivo só é gerado no clique (em blocos, crm/exportacao.py), não a cada rerun do painel
             st.markdown("### Exportar Dados")
-            csv = view_detalhes.to_csv(index=False).encode('utf-8-sig')
+            formato = st.radio("Formato", list(FORMATOS), horizontal=True, key="fmt_export")
+            ext, mime = FORMATOS[formato]
             st.download_button(
                 label="📥 Baixar Relatório (Excel/CSV)",
-                data=csv,
-                file_name=f"relatorio_vendas_{datetime.now().strftime('%Y%m%d_%H%M')}.csv",
-                mime="text/csv"
+                data=partial(exportar, view_detalhes, formato),
+                file_name=f"relatorio_vendas_{datetime.now().strftime('%Y%m%d_%H%M')}.{ext}",
+                mime=mime
             )
             
             # Mostra tabela (sem a coluna formatada para não duplicar, mas usamos a formatada visualmente se quiser)
             st.dataframe(view_detalhes[['Data_Obj', 'Nome_Cliente', 'Tipo', 'Resumo', 'Valor_Proposta_Fmt', 'Vendedor']], use_container_width=True)
             
     else: st.info("Sem dados.")
+    METRICAS.registrar('app.gestor', time.perf_counter() - ini)
 
 # --- VIEW VENDEDOR ---
 else:
     st.title("💼 Minha Carteira")
     col_list, col_det = st.columns([1, 1.2])
+    ini = time.perf_counter()
     with col_list:
         st.markdown("### 🔍 Filtros")
         busca = st.text_input("Buscar", placeholder="Nome ou CNPJ...")
         status_padrao = ['⏳ NEGOCIAÇÃO', '⚠️ FOLLOW-UP']
         filtro_status = st.multiselect("Status", ['🔴 RECUPERAR', '⚠️ FOLLOW-UP', '⏳ NEGOCIAÇÃO', '🟢 ATIVO', '⭐ VENDA RECENTE', '🆕 NOVO S/ INTERAÇÃO'], default=status_padrao)
-        if busca:
-            busca = busca.upper()
-            mask_busca = (meus_cli['Nome_Fantasia'].str.upper().str.contains(busca, na=False)) | (meus_cli['KEY_DOC'].str.contains(limpar_doc(busca), na=False))
-            lista_final = meus_cli[mask_busca]
-        else:
-            lista_final = meus_cli[meus_cli['Status'].isin(filtro_status)].sort_values('Status')
-        st.caption(f"{len(lista_final)} clientes.")
+        # Com busca: índice da base (nome sem acento/caixa ou dígitos do documento), restrito à carteira
+        n_cli = len(servico.lista_clientes(carts, filtro_status, busca))
+        st.caption(f"{n_cli} clientes.")
+        filas = servico.filas(u_log)
+        if filas: st.caption(" | ".join(f"{st_} hoje: {len(f)}" for st_, f in filas.items()))
         cid_selecionado = None
-        if not lista_final.empty:
+        if n_cli:
+            n_pag = paginas(n_cli)
+            pag = st.selectbox("Página", range(1, n_pag + 1), key="pag_cli") if n_pag > 1 else 1
+            _, _, rotulos = servico.pagina_clientes(carts, filtro_status, busca, pag)
             with st.container(height=600):
-                cid_selecionado = st.radio("Selecione:", lista_final.head(100)['ID_Cliente_CNPJ_CPF'].tolist(), format_func=lambda x: f"[{lista_final[lista_final['ID_Cliente_CNPJ_CPF']==x]['Status'].values[0]}] {lista_final[lista_final['ID_Cliente_CNPJ_CPF']==x]['Nome_Fantasia'].values[0]}")
+                cid_selecionado = st.radio("Selecione:", list(rotulos), format_func=rotulos.get)
         else: st.info("Nenhum cliente.")
+    METRICAS.registrar('app.carteira', time.perf_counter() - ini)
 
     with col_det:
         if cid_selecionado:
-            c_dados = meus_cli[meus_cli['ID_Cliente_CNPJ_CPF'] == cid_selecionado].iloc[0]
+            cliente = servico.cliente(carts, cid_selecionado)
+            c_dados = cliente['dados']
             with st.container(border=True):
                 st.subheader(c_dados['Nome_Fantasia'])
                 st.caption(f"CNPJ: {fmt_doc(cid_selecionado)}")
@@ -440,24 +296,13 @@ else:
                 d2.markdown(f"**💰** {fmt_moeda(c_dados.get('Total_Compras', 0))}")
                 d2.markdown(f"**📅** {fmt_data(c_dados.get('Data_Ultima_Compra', '-'))}")
                 st.divider()
-                key_selecionada = limpar_doc(cid_selecionado)
-                c_ints = minhas_int[minhas_int['KEY_DOC'] == key_selecionada].sort_values('Data_Obj', ascending=False)
                 tab1, tab2, tab3 = st.tabs(["📜 Hist", "💰 Abertas", "📝 Nova"])
                 with tab1:
-                    if not c_ints.empty:
-                        view = c_ints[['Data_Obj', 'Tipo', 'Resumo', 'Valor_Proposta']].copy()
-                        view['Valor_Proposta'] = view['Valor_Proposta'].apply(fmt_moeda)
-                        view['Data_Obj'] = view['Data_Obj'].apply(fmt_data)
-                        st.dataframe(view, hide_index=True, use_container_width=True)
+                    if not cliente['historico'].empty:
+                        st.dataframe(cliente['historico'], hide_index=True, use_container_width=True)
                     else: st.info("Sem histórico.")
                 with tab2:
-                    resols_cli = set(c_ints[c_ints['Tipo'].isin(['Venda Fechada', 'Venda Perdida'])]['Resumo'])
-                    ids_res = set([extrair_id(x) for x in resols_cli if extrair_id(x)])
-                    peds_res = set([extrair_pedido_protheus(x) for x in resols_cli if extrair_pedido_protheus(x)])
-                    abertas = []
-                    for _, row in c_ints[c_ints['Tipo'] == 'Orçamento Enviado'].iterrows():
-                        pid, ped = extrair_id(row['Resumo']), extrair_pedido_protheus(row['Resumo'])
-                        if not ((pid and pid in ids_res) or (ped and ped in peds_res)): abertas.append(row)
+                    abertas = cliente['abertas']
                     if abertas:
                         for i, r in enumerate(abertas):
                             with st.container(border=True):
@@ -479,3 +324,5 @@ else:
                             if salvar_nuvem(cid_selecionado, datetime.now(), act, obs, u_log, valor_final):
                                 st.success("Salvo!"); time.sleep(1); st.rerun()
         else: st.info("👈 Selecione um cliente.")
+
+METRICAS.registrar('app.rerun', time.perf_counter() - ini_rerun)
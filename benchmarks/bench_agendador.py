@@ -0,0 +1,86 @@
+"""Quadro do Agendador acompanhando as gravações, contra a planilha falsa.
+
+Com o dia do Quadro algumas semanas à frente da carga (status do dia diferente do da
+base), grava interações e confere que as sessões continuam no Quadro: status, última
+interação e filas iguais às de um Quadro remontado do zero, sem voltar ao status da
+carga. Um lead novo (que a base recalcula inteira) tira o Quadro de uso até ser remontado.
+
+Uso: python -m benchmarks.bench_agendador [--clientes 100000] [--gravacoes 30] [--dias 40]
+"""
+import argparse
+import logging
+import statistics
+import time
+from datetime import date, timedelta
+
+from benchmarks.fake_gspread import FakeSpreadsheet
+from benchmarks.geradores import planilha
+from crm.agendador import FOLLOW_UP, RECUPERAR, Agendador, Quadro
+from crm.carga import SincronizadorPlanilha
+from crm.dados import BaseCompartilhada
+from crm.fila import EscritaDireta
+from crm.servico import Servico
+
+TIPOS = ['Ligação Realizada', 'Orçamento Enviado', 'Venda Fechada', 'Venda Perdida']
+
+
+def conferir(q, base, dia, vendedores):
+    # O Quadro seguido tem o mesmo status, última interação e filas de um montado agora
+    versao, clientes, inter = base.retrato()
+    novo = Quadro(0, versao, dia, clientes, inter)
+    assert (novo.clientes['Status'] == q.clientes['Status']).all(), "status diferente do Quadro remontado"
+    assert novo.clientes['Ultima_Interacao'].equals(q.clientes['Ultima_Interacao'])
+    for st in (RECUPERAR, FOLLOW_UP):
+        for v in vendedores:
+            assert novo.fila(st, v).index.equals(q.fila(st, v).index), f"fila {st} de {v} diferente"
+    return novo.segundos
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--clientes', type=int, default=100000)
+    ap.add_argument('--gravacoes', type=int, default=30)
+    ap.add_argument('--dias', type=int, default=40)
+    args = ap.parse_args()
+    logging.getLogger('crm.metricas').setLevel(logging.ERROR)
+
+    abas, docs, vends = planilha(args.clientes, 2 * args.clientes)
+    ss = FakeSpreadsheet(abas)
+    base = BaseCompartilhada(SincronizadorPlanilha(lambda: ss), EscritaDireta(lambda: ss))
+    dia = date.today() + timedelta(days=args.dias)
+    ag = Agendador(base, hoje=lambda: dia, iniciar=False)
+    sv = Servico(base, ag)
+    print(f"{args.clientes:,} clientes | Quadro para {dia:%d/%m} montado em {ag.quadro().segundos:.2f}s")
+
+    antes = sv.lista_clientes(['TODOS'], [RECUPERAR])
+    carga = int((base.df_cli['Status'] == RECUPERAR).sum())
+    print(f"RECUPERAR: {len(antes)} no Quadro, {carga} no status da carga")
+
+    # O Quadro que as sessões já tinham não muda com as gravações seguintes
+    publicado = ag.quadro()
+    status_publicado, ultima_publicada = publicado.clientes['Status'].copy(), dict(publicado._idx.ultima)
+    tempos = []
+    for i in range(args.gravacoes):
+        ini = time.perf_counter()
+        sv.salvar_interacao(str(docs[i * 7]), date.today(), TIPOS[i % len(TIPOS)], f"bench {i}", vends[i % len(vends)], 100 * (i % 3))
+        tempos.append(time.perf_counter() - ini)
+        q = sv._quadro()
+        assert q is not None and q.versao_status == base.versao, "sessão caiu no status da carga depois de gravar"
+    assert publicado.clientes['Status'].equals(status_publicado) and publicado._idx.ultima == ultima_publicada, "Quadro publicado foi alterado"
+    depois = sv.lista_clientes(['TODOS'], [RECUPERAR])
+    assert set(depois.index) <= set(antes.index), "cliente voltou a RECUPERAR pelo status da carga"
+    segundos = conferir(sv._quadro(), base, dia, vends)
+    print(f"{args.gravacoes} gravações seguidas: {statistics.median(tempos) * 1000:.1f} ms cada (mediana) | "
+          f"RECUPERAR {len(antes)} -> {len(depois)} | remontar seria {segundos:.2f}s")
+
+    # Lead novo: a base recalcula o status inteiro, o Quadro sai de uso até ser remontado
+    sv.salvar_lead("LEAD BENCH", "12345678000199", "CONTATO", "11999999999", vends[0], "Bench", None, "", 0)
+    assert sv._quadro() is None and ag.vencido()
+    ag.atualizar()
+    assert sv._quadro() is not None and not ag.vencido()
+    conferir(ag.quadro(), base, dia, vends)
+    print(f"lead novo: Quadro remontado em {ag.quadro().segundos:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""Busca de clientes na carteira: compara o str.contains sobre a carteira inteira a cada
+tecla com o índice de trigramas, e o format_func com máscaras com a consulta por dicionário.
+
+Uso: python -m benchmarks.bench_busca [--clientes 100000]
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from crm.busca import IndiceBusca, normalizar
+from crm.helpers import limpar_doc
+
+PALAVRAS = ['COMERCIO', 'COMÉRCIO', 'SÃO', 'JOSÉ', 'MATERIAIS', 'CONSTRUÇÃO', 'LTDA', 'ME', 'DISTRIBUIDORA',
+            'AÇO', 'FERRAGENS', 'IRMÃOS', 'SILVA', 'ÁGUA', 'ELÉTRICA', 'PEÇAS', 'INDÚSTRIA', 'NORTE', 'SUL']
+TERMOS = ['jose', 'SÃO', 'constru', 'ferr', 'aço', 'me', '4918', '12.345', 'xyz']
+
+
+def gerar_clientes(n, seed=17):
+    rng = np.random.default_rng(seed)
+    nomes = [' '.join(rng.choice(PALAVRAS, rng.integers(2, 5))) + f" {i}" for i in range(n)]
+    docs = (rng.choice(10**13, n, replace=False) + 10**13).astype(str)
+    return pd.DataFrame({'ID_Cliente_CNPJ_CPF': docs, 'KEY_DOC': docs, 'Nome_Fantasia': nomes,
+                         'Status': rng.choice(['🔴 RECUPERAR', '⚠️ FOLLOW-UP', '⏳ NEGOCIAÇÃO', '🟢 ATIVO'], n)})
+
+
+def busca_linear(df, termo):
+    # Referência: o mesmo critério do índice, varrendo tudo
+    nomes = df['Nome_Fantasia'].map(normalizar)
+    dig = limpar_doc(termo)
+    mask = nomes.str.contains(normalizar(termo), regex=False)
+    if dig: mask |= df['KEY_DOC'].str.contains(dig, regex=False)
+    return df.index[mask].to_numpy()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--clientes', type=int, default=100000)
+    args = ap.parse_args()
+
+    df = gerar_clientes(args.clientes)
+    ini = time.perf_counter(); idx = IndiceBusca(df); t = time.perf_counter() - ini
+    print(f"{len(df):,} clientes | índice montado em {t:.2f}s")
+
+    for termo in TERMOS:
+        ini = time.perf_counter()
+        busca = termo.upper()
+        df[(df['Nome_Fantasia'].str.upper().str.contains(busca, na=False)) | (df['KEY_DOC'].str.contains(limpar_doc(busca), na=False))]
+        t_antigo = time.perf_counter() - ini
+        ini = time.perf_counter(); r = idx.buscar(termo); t_novo = time.perf_counter() - ini
+        assert (r == busca_linear(df, termo)).all()
+        print(f"  {termo!r:>10}: {len(r):>6} resultados | str.contains {t_antigo * 1000:6.1f}ms | índice {t_novo * 1000:6.2f}ms")
+
+    pagina = df.head(100)
+    ini = time.perf_counter()
+    [f"[{pagina[pagina['ID_Cliente_CNPJ_CPF']==x]['Status'].values[0]}] {pagina[pagina['ID_Cliente_CNPJ_CPF']==x]['Nome_Fantasia'].values[0]}"
+     for x in pagina['ID_Cliente_CNPJ_CPF']]
+    t_antigo = time.perf_counter() - ini
+    ini = time.perf_counter()
+    rotulos = dict(zip(pagina['ID_Cliente_CNPJ_CPF'], "[" + pagina['Status'].astype(str) + "] " + pagina['Nome_Fantasia'].astype(str)))
+    [rotulos.get(x) for x in rotulos]
+    t_novo = time.perf_counter() - ini
+    print(f"rótulos de 100 opções: máscaras {t_antigo * 1000:.1f}ms | dicionário {t_novo * 1000:.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Importação da base de clientes do ERP (CSV ";" em Latin-1, como o "Teste CSV 20 Clientes.csv"):
+leitura em blocos + normalização vetorizada, o upsert na planilha falsa contra uma aba
+Clientes já carregada (parte dos clientes alterados, parte novos) e a reimportação do mesmo arquivo.
+
+Uso: python -m benchmarks.bench_clientes_csv [--clientes 100000] [--novos 0.1] [--alterados 0.2]
+"""
+import argparse
+import io
+import logging
+import time
+
+import numpy as np
+
+from benchmarks.fake_gspread import FakeSpreadsheet
+from benchmarks.geradores import planilha
+from crm.carga import SincronizadorPlanilha
+from crm.dados import BaseCompartilhada
+from crm.fila import EscritaDireta
+from crm.importacao import importar_clientes_csv
+
+
+def exportacao_erp(linhas, rng, novos, alterados):
+    # CSV do ERP a partir das linhas da aba: uma fração com contato alterado e outra de clientes
+    # que ainda não estão na aba (documentos novos); valores com vírgula decimal e espaços.
+    # A aba passa a ter Total_Compras em reais inteiros, como uma importação anterior deixaria,
+    # para que só os alterados sejam reescritos. Retorna o arquivo, os índices alterados e os novos.
+    cab, corpo = linhas[0], [list(l) for l in linhas[1:]]
+    for l in linhas[1:]: l[7] = l[7].split(',')[0]
+    idx = np.flatnonzero(rng.random(len(corpo)) < alterados)
+    for i in idx: corpo[i][2] = f"CONTATO {i}"
+    extras = [[str(10**13 + i)] + l[1:] for i, l in enumerate(corpo[:int(len(corpo) * novos)])]
+    texto = '\n'.join(';'.join([f" {l[0]} "] + l[1:]) for l in corpo + extras)
+    return io.BytesIO((';'.join(cab) + '\n' + texto).encode('latin-1', errors='replace')), idx, extras
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--clientes', type=int, default=100000)
+    ap.add_argument('--novos', type=float, default=0.1)
+    ap.add_argument('--alterados', type=float, default=0.2)
+    args = ap.parse_args()
+    logging.getLogger('crm.metricas').setLevel(logging.ERROR)
+
+    abas, _, _ = planilha(args.clientes, args.clientes)
+    arquivo, alterados, extras = exportacao_erp(abas['Clientes'], np.random.default_rng(1), args.novos, args.alterados)
+    antes = [list(l) for l in abas['Clientes']]
+    ss = FakeSpreadsheet(abas)
+    base = BaseCompartilhada(SincronizadorPlanilha(lambda: ss), EscritaDireta(lambda: ss))
+
+    ini = time.perf_counter()
+    df, rel = importar_clientes_csv(arquivo)
+    t_csv = time.perf_counter() - ini
+    print(f"{rel['lidas']:,} linhas no CSV | leitura {rel['tempos']['leitura']:.2f}s + normalização {rel['tempos']['normalizacao']:.2f}s = {t_csv:.2f}s")
+
+    ini = time.perf_counter()
+    res = base.gravar_clientes(df)
+    ws = ss.worksheet('Clientes')
+    print(f"upsert + recarga {time.perf_counter() - ini:.2f}s | {res} | chamadas {dict(ws.chamadas)}")
+    # Alterados reescritos na própria linha (cabeçalho na 1), os demais intactos, novos no fim uma vez
+    assert res == {'novos': len(extras), 'atualizados': len(alterados), 'iguais': len(antes) - 1 - len(alterados)}, res
+    assert len(ws.linhas) == len(antes) + len(extras)
+    esperado = [list(l) for l in antes]
+    for i in alterados: esperado[i + 1][2] = f"CONTATO {i}"
+    assert ws.linhas[:len(antes)] == esperado, "linhas existentes diferentes do esperado"
+    assert ws.linhas[len(antes):] == [l[:7] + [l[7].split(',')[0]] + l[8:] for l in extras], "novos fora do esperado"
+    ini = time.perf_counter()
+    chamadas = dict(ws.chamadas)
+    res = base.gravar_clientes(df)
+    print(f"mesmo arquivo    {time.perf_counter() - ini:.2f}s | {res}")
+    assert res == {'novos': 0, 'atualizados': 0, 'iguais': len(antes) - 1 + len(extras)}, res
+    assert ws.linhas[:len(antes)] == esperado and len(ws.linhas) == len(antes) + len(extras)
+    assert {k: v for k, v in ws.chamadas.items() if k != 'get'} == {k: v for k, v in chamadas.items() if k != 'get'}
+    ini = time.perf_counter()
+    base.recarregar()
+    print(f"  (só a recarga da base: {time.perf_counter() - ini:.2f}s)")
+
+
+if __name__ == '__main__':
+    main()
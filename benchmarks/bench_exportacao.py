@@ -0,0 +1,67 @@
+"""Relatório do GESTOR: compara a montagem anterior (apply de fmt_moeda/fmt_data linha a
+linha e o CSV inteiro em memória a cada rerun) com a formatação por valores distintos e o
+arquivo gerado em blocos por crm.exportacao (que no app só roda no clique).
+
+Uso: python -m benchmarks.bench_exportacao [--interacoes 500000] [--xlsx]
+"""
+import argparse
+import logging
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_periodo import gerar_log
+from crm.exportacao import exportar, formatar_relatorio
+from crm.helpers import fmt_data, fmt_moeda
+
+
+def relatorio_linha_a_linha(dff):
+    # Implementação anterior da aba "📝 Detalhes das Vendas" + botão de exportação
+    view_detalhes = dff[['Data_Obj', 'Nome_Cliente', 'Tipo', 'Resumo', 'Valor_Proposta', 'Vendedor']].copy()
+    view_detalhes['Valor_Proposta_Fmt'] = view_detalhes['Valor_Proposta'].apply(fmt_moeda)
+    view_detalhes['Data_Obj'] = view_detalhes['Data_Obj'].apply(fmt_data)
+    return view_detalhes, view_detalhes.to_csv(index=False).encode('utf-8-sig')
+
+
+def medir(fn):
+    # (resultado, segundos, pico MB): o tempo sem tracemalloc, que deixa tudo mais lento
+    ini = time.perf_counter()
+    r = fn()
+    segundos = time.perf_counter() - ini
+    tracemalloc.start()
+    try:
+        fn()
+        return r, segundos, tracemalloc.get_traced_memory()[1] / 2**20
+    finally: tracemalloc.stop()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--interacoes', type=int, default=500000)
+    ap.add_argument('--xlsx', action='store_true', help="mede também o Excel (openpyxl é lento)")
+    args = ap.parse_args()
+    logging.getLogger('crm.metricas').setLevel(logging.ERROR)
+
+    dff = gerar_log(args.interacoes)
+    dff['Data_Obj'] = pd.to_datetime(dff['Data_Obj'])
+    dff['Valor_Proposta'] = np.where(dff['Tipo'].isin(['Orçamento Enviado', 'Venda Fechada', 'Venda Perdida']), dff['Valor_Proposta'], 0)
+    dff['Nome_Cliente'] = 'CLIENTE ' + dff['CNPJ_Cliente']
+    dff['Resumo'] = 'Contato com o cliente'
+    print(f"{len(dff):,} interações no período")
+
+    (view_a, csv_a), t_a, m_a = medir(lambda: relatorio_linha_a_linha(dff))
+    view_b, t_b, m_b = medir(lambda: formatar_relatorio(dff))
+    assert view_a.equals(view_b)
+    print(f"rerun do painel  antes {t_a:6.2f}s {m_a:7.1f} MB | agora {t_b:6.2f}s {m_b:7.1f} MB (arquivo só no clique)")
+    arq, t_c, m_c = medir(lambda: exportar(view_b, 'CSV'))
+    assert arq.getvalue() == csv_a
+    print(f"clique CSV       {t_c:6.2f}s, pico {m_c:.1f} MB para um arquivo de {len(csv_a) / 2**20:.1f} MB")
+    if args.xlsx:
+        arq, t_d, m_d = medir(lambda: exportar(view_b, 'Excel'))
+        print(f"clique Excel     {t_d:6.2f}s, pico {m_d:.1f} MB para um arquivo de {len(arq.getvalue()) / 2**20:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
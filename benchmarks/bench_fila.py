@@ -0,0 +1,127 @@
+"""Fila de escrita (FilaEscrita) contra a planilha falsa, sem rede.
+
+Confere que uma cota excedida (429) é repetida com espera e entrega cada linha uma
+vez só, e que o que ficou no diário é reenviado por uma nova fila depois de um
+restart (inclusive com a última linha do diário cortada por uma queda), e que um
+erro permanente (aba inexistente) tira o lote da fila sem travar as outras gravações.
+
+Uso: python -m benchmarks.bench_fila [--linhas 200]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.fake_gspread import FakeSpreadsheet
+from crm.fila import FilaEscrita
+
+CAB_INT = ['CNPJ_Cliente','Data','Tipo','Resumo','Vendedor','Valor_Proposta']
+ESPERA_COTA = 0.3
+
+
+class CotaExcedida(Exception):
+    # Mesmo formato do gspread.exceptions.APIError que a fila examina
+    def __init__(self):
+        super().__init__("Quota exceeded")
+        self.response = type('Resposta', (), {'status_code': 429})()
+
+
+class PlanilhaComCota(FakeSpreadsheet):
+    # Recusa os primeiros `recusas` append_rows com 429
+    def __init__(self, abas, recusas=1):
+        super().__init__(abas)
+        self.recusas = recusas
+        self.recusado_em = []
+        ws = self.worksheet('Interacoes')
+        anexar = ws.append_rows
+        def append_rows(values, **kwargs):
+            if self.recusas:
+                self.recusas -= 1
+                self.recusado_em.append(time.perf_counter())
+                raise CotaExcedida()
+            return anexar(values, **kwargs)
+        ws.append_rows = append_rows
+
+
+def linhas(n, prefixo):
+    return [[f"{10**13 + i}", '01/03/2025', 'Ligação Realizada', f"{prefixo} {i}", 'VENDEDOR 0', 0] for i in range(n)]
+
+
+def esperar(cond, limite=10.0):
+    fim = time.perf_counter() + limite
+    while not cond():
+        assert time.perf_counter() < fim, "a fila não terminou no tempo esperado"
+        time.sleep(0.01)
+
+
+def diario(arquivo):
+    if not os.path.exists(arquivo): return []
+    with open(arquivo, encoding='utf-8') as f: return [l for l in f if l.strip()]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument('--linhas', type=int, default=200)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        # 1) 429 na primeira tentativa: espera a cota e envia tudo uma vez só, num append_rows
+        ss = PlanilhaComCota({'Interacoes': [CAB_INT]})
+        arq = os.path.join(pasta, 'fila.jsonl')
+        fila = FilaEscrita(lambda: ss, arq, intervalo=0.05, espera_cota=ESPERA_COTA)
+        enviadas = linhas(args.linhas, 'cota')
+        ini = time.perf_counter()
+        fila.enfileirar('Interacoes', enviadas[0])
+        fila.enfileirar_lote('Interacoes', enviadas[1:])
+        esperar(lambda: fila.enviados == len(enviadas))
+        t_cota = time.perf_counter() - ini
+        ws = ss.worksheet('Interacoes')
+        assert fila.falhas == 1 and len(ss.recusado_em) == 1 and fila.ultimo_erro is None
+        assert ws.linhas[1:] == [[str(v) for v in l] for l in enviadas]
+        assert ws.chamadas['append_rows'] == 1
+        assert t_cota >= ESPERA_COTA and not fila.pendentes() and not diario(arq)
+
+        # 2) sem conexão: as linhas ficam no diário; uma nova fila (restart) as reenvia
+        arq2 = os.path.join(pasta, 'restart.jsonl')
+        parada = FilaEscrita(lambda: None, arq2, intervalo=0.05, espera_max=60.0)
+        guardadas = linhas(args.linhas // 2, 'restart')
+        parada.enfileirar_lote('Interacoes', guardadas)
+        esperar(lambda: parada.falhas >= 1)
+        assert len(diario(arq2)) == len(guardadas) and parada.enviados == 0
+        with open(arq2, 'a', encoding='utf-8') as f: f.write('{"id": "cortada", "aba": "Interac')  # queda no meio da escrita
+
+        ss2 = FakeSpreadsheet({'Interacoes': [CAB_INT]})
+        ini = time.perf_counter()
+        nova = FilaEscrita(lambda: ss2, arq2, intervalo=0.05)
+        assert nova.pendentes() == [('Interacoes', l) for l in guardadas]
+        esperar(lambda: nova.enviados == len(guardadas))
+        t_restart = time.perf_counter() - ini
+        assert ss2.worksheet('Interacoes').linhas[1:] == [[str(v) for v in l] for l in guardadas]
+        assert not nova.pendentes() and not diario(arq2) and nova.falhas == 0
+
+        # 3) aba que não existe (erro permanente): depois das tentativas o lote vai para o diário de
+        #    recusadas e as gravações das outras abas, antes e depois dele, seguem
+        ss3 = FakeSpreadsheet({'Interacoes': [CAB_INT]})
+        arq3 = os.path.join(pasta, 'recusa.jsonl')
+        fila3 = FilaEscrita(lambda: ss3, arq3, intervalo=0.05, espera_max=0.2, tentativas=3)
+        fila3.enfileirar('Novos_Leads', ['123', 'LEAD SEM ABA'])
+        boas = linhas(10, 'depois')
+        fila3.enfileirar_lote('Interacoes', boas)
+        esperar(lambda: fila3.enviados == len(boas))
+        assert fila3.recusados == 0 and fila3.pendentes() == [('Novos_Leads', ['123', 'LEAD SEM ABA'])]
+        esperar(lambda: fila3.recusados == 1)
+        recusadas = [json.loads(l) for l in diario(fila3.arquivo_recusadas)]
+        assert [r['linha'] for r in recusadas] == [['123', 'LEAD SEM ABA']] and 'KeyError' in recusadas[0]['erro']
+        assert ss3.worksheet('Interacoes').linhas[1:] == [[str(v) for v in l] for l in boas]
+        assert fila3.falhas == 2 and not fila3.pendentes() and not diario(arq3)
+        # o contador de recusadas sobrevive ao restart
+        assert FilaEscrita(lambda: ss3, arq3).recusados == 1
+
+    print(f"429 uma vez: {len(enviadas)} linhas entregues uma vez em {t_cota:.2f}s (espera da cota {ESPERA_COTA}s), 1 append_rows")
+    print(f"restart: {len(guardadas)} linhas reenviadas do diário em {t_restart:.2f}s, linha cortada ignorada")
+    print(f"aba inexistente: lote recusado depois de 3 tentativas, {len(boas)} linhas de Interacoes entregues")
+
+
+if __name__ == '__main__':
+    main()
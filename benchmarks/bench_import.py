@@ -0,0 +1,76 @@
+"""Importação do Protheus: compara com o import linha a linha (iterrows) e mede cada etapa.
+
+Uso: python -m benchmarks.bench_import [--pedidos 50000] [--historico 100000]
+"""
+import argparse
+import re
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.geradores import protheus_xlsx
+from crm.helpers import extrair_pedido_protheus, gerar_id_proposta, limpar_int
+from crm.importacao import importar_protheus, pedidos_existentes
+
+
+def importar_linha_a_linha(arquivo, df_old):
+    # Implementação anterior de proc_import, sem a gravação
+    df = pd.read_excel(arquivo)
+    peds_ex = set(df_old['Resumo'].apply(extrair_pedido_protheus).dropna()) if not df_old.empty else set()
+    novos = []
+    for _, r in df.iterrows():
+        pid = str(r['PEDIDO']).strip()
+        if pid not in peds_ex:
+            stt = str(r['STATUS']).upper()
+            tipo = "Venda Fechada" if "FECHADO" in stt or "FATURADO" in stt else ("Venda Perdida" if "CANCELADO" in stt else "Orçamento Enviado")
+            res = f"{'#'+gerar_id_proposta()+' ' if tipo=='Orçamento Enviado' else ''}[PROTHEUS] Pedido: {pid} | {stt}"
+            try: dt = pd.to_datetime(r['DATA']).strftime('%d/%m/%Y')
+            except: dt = datetime.now().strftime('%d/%m/%Y')
+            v_imp = str(r['VENDEDOR']).strip().upper()
+            novos.append([''.join(filter(str.isdigit, str(r['CNPJ']))), dt, tipo, res, v_imp, limpar_int(r['VALOR'])])
+    return novos
+
+
+def historico(n, seed=5):
+    rng = np.random.default_rng(seed)
+    peds = rng.choice(10**5, n, replace=False) + 100000
+    resumo = np.where(rng.random(n) < 0.5, [f"[PROTHEUS] Pedido: {p} | FATURADO" for p in peds], "Ligação sem pedido")
+    return pd.DataFrame({'Resumo': resumo})
+
+
+def sem_id(linhas):
+    return [l[:3] + [re.sub(r'^#[A-Z0-9]{4} ', '', l[3])] + l[4:] for l in linhas]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--pedidos', type=int, default=50000)
+    ap.add_argument('--historico', type=int, default=100000)
+    args = ap.parse_args()
+
+    df_old = historico(args.historico)
+    ini = time.perf_counter(); pedidos = pedidos_existentes(df_old['Resumo']); t_idx = time.perf_counter() - ini
+    arquivo = protheus_xlsx(args.pedidos, pedidos_antigos=pedidos)
+    print(f"{args.pedidos:,} pedidos no arquivo, {len(pedidos):,} já importados (índice em {t_idx:.2f}s)")
+
+    ini = time.perf_counter(); antigo = importar_linha_a_linha(arquivo, df_old); t_antigo = time.perf_counter() - ini
+    arquivo.seek(0)
+    ini = time.perf_counter(); novo, rel = importar_protheus(arquivo, pedidos); t_novo = time.perf_counter() - ini
+
+    # O import antigo não descartava pedidos repetidos dentro do próprio arquivo
+    vistos, esperado = set(), []
+    for l in sem_id(antigo):
+        pid = re.search(r'Pedido: (\w+)', l[3]).group(1)
+        if pid not in vistos: vistos.add(pid); esperado.append(l)
+    assert sem_id(novo) == esperado, "resultado diferente do import linha a linha"
+    assert all(re.match(r'^#[A-Z0-9]{4} ', l[3]) for l in novo if l[2] == 'Orçamento Enviado')
+
+    print(f"linha a linha: {t_antigo:.2f}s | vetorizado: {t_novo:.2f}s ({t_antigo / t_novo:.1f}x)")
+    print(f"novos {rel['novos']:,} | duplicados {rel['duplicados']:,} | rejeitados {rel['rejeitados']:,}")
+    print(" | ".join(f"{k} {v:.2f}s" for k, v in rel['tempos'].items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Esquema tipado dos frames: compara memória e as operações mais frequentes (filtro da
+carteira por vendedor, índice de histórico por KEY_DOC) entre as colunas de texto de antes
+e o esquema de crm.esquema (KEY_DOC Int64, Status/Vendedor/Tipo como categoria).
+
+Uso: python -m benchmarks.bench_memoria [--clientes 100000] [--interacoes 500000]
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_busca import gerar_clientes
+from benchmarks.bench_periodo import gerar_log
+from crm.esquema import chaves_doc, relatorio_memoria, tipar_clientes, tipar_interacoes
+from crm.helpers import limpar_doc
+
+VENDEDORES = [f"VENDEDOR {i}" for i in range(20)]
+
+
+def cronometrar(fn, vezes=5):
+    ini = time.perf_counter()
+    for _ in range(vezes): fn()
+    return (time.perf_counter() - ini) / vezes
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--clientes', type=int, default=100000)
+    ap.add_argument('--interacoes', type=int, default=500000)
+    args = ap.parse_args()
+    rng = np.random.default_rng(5)
+
+    # Como a carga montava antes: KEY_DOC texto e demais colunas object/str
+    cli = gerar_clientes(args.clientes)
+    cli['Ultimo_Vendedor'] = rng.choice(VENDEDORES, len(cli))
+    cli['Status'] = cli['Status'].astype(object)
+    inter = gerar_log(args.interacoes)
+    inter['Data_Obj'] = pd.to_datetime(inter['Data_Obj'])
+    inter['KEY_DOC'] = inter['CNPJ_Cliente'].apply(limpar_doc)
+
+    ini = time.perf_counter()
+    cli_t = tipar_clientes(cli.assign(KEY_DOC=chaves_doc(cli['ID_Cliente_CNPJ_CPF'])))
+    inter_t = tipar_interacoes(inter.assign(KEY_DOC=chaves_doc(inter['CNPJ_Cliente'])))
+    print(f"{len(cli):,} clientes, {len(inter):,} interações | tipagem {time.perf_counter() - ini:.2f}s")
+
+    _, antes = relatorio_memoria({'Clientes': cli, 'Interacoes': inter})
+    _, depois = relatorio_memoria({'Clientes': cli_t, 'Interacoes': inter_t})
+    for tab in antes.index:
+        print(f"  {tab:<11} {antes[tab]:8.1f} MB -> {depois[tab]:7.1f} MB ({antes[tab] / depois[tab]:.1f}x)")
+
+    carts = VENDEDORES[:3]
+    for nome, a, b in [
+        ('carteira (clientes)', lambda: cli[cli['Ultimo_Vendedor'].isin(carts)], lambda: cli_t[cli_t['Ultimo_Vendedor'].isin(carts)]),
+        ('carteira (interações)', lambda: inter[inter['Vendedor'].isin(carts)], lambda: inter_t[inter_t['Vendedor'].isin(carts)]),
+        ('filtro de status', lambda: cli[cli['Status'].isin(['🔴 RECUPERAR'])], lambda: cli_t[cli_t['Status'].isin(['🔴 RECUPERAR'])]),
+        ('índice por KEY_DOC', lambda: inter.groupby('KEY_DOC', sort=False).indices, lambda: inter_t.groupby('KEY_DOC', sort=False).indices),
+    ]:
+        assert len(a()) == len(b())
+        t_a, t_b = cronometrar(a), cronometrar(b)
+        print(f"{nome:<22} texto {t_a * 1000:6.1f}ms | tipado {t_b * 1000:6.1f}ms ({t_a / t_b:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Filtros de período do painel e metas do mês: compara o .apply linha a linha sobre datas
+`date` com o log ordenado em datetime64 (busca binária) e o cache de metas da base.
+
+Uso: python -m benchmarks.bench_periodo [--interacoes 500000]
+"""
+import argparse
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from crm.dados import LogInteracoes
+from crm.indicadores import periodo, placar_vendedores
+
+TIPOS = ['Ligação Realizada', 'WhatsApp Enviado', 'Orçamento Enviado', 'Agendou Visita', 'Venda Fechada', 'Venda Perdida']
+
+
+def metas_linha_a_linha(df_int, u_log, prim_dia):
+    # Implementação anterior das metas do vendedor na barra lateral
+    mask_vendedor = df_int['Vendedor'] == u_log
+    def safe_date_compare(d):
+        if pd.isna(d): return False
+        if isinstance(d, datetime): return d.date() >= prim_dia
+        return d >= prim_dia
+    df_m = df_int[mask_vendedor & df_int['Data_Obj'].apply(safe_date_compare)]
+    return {'fat': int(df_m[df_m['Tipo']=='Venda Fechada']['Valor_Proposta'].sum()),
+            'cli': int(df_m[df_m['Tipo']=='Venda Fechada']['CNPJ_Cliente'].nunique()),
+            'ativ': len(df_m[df_m['Tipo'].isin(['Ligação Realizada','WhatsApp Enviado','Agendou Visita'])])}
+
+
+def periodo_linha_a_linha(df_int, di, df):
+    # Implementação anterior do filtro "De/Até" da VIEW GESTOR
+    def safe_date_filter(d):
+        if pd.isna(d): return False
+        if isinstance(d, datetime): d = d.date()
+        return di <= d <= df
+    return df_int[df_int['Data_Obj'].apply(safe_date_filter)]
+
+
+def gerar_log(n, seed=13):
+    rng = np.random.default_rng(seed)
+    hoje = date.today()
+    datas = [hoje - timedelta(days=int(d)) for d in rng.integers(0, 730, n)]
+    df = pd.DataFrame({
+        'CNPJ_Cliente': rng.integers(10**13, 10**13 + 50000, n).astype(str),
+        'Data_Obj': pd.Series(datas, dtype=object),
+        'Tipo': rng.choice(TIPOS, n),
+        'Vendedor': rng.choice([f"VENDEDOR {i}" for i in range(20)], n),
+        'Valor_Proposta': rng.integers(0, 50000, n),
+    })
+    df.loc[rng.random(n) < 0.01, 'Data_Obj'] = None
+    return df
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--interacoes', type=int, default=500000)
+    args = ap.parse_args()
+
+    antigo = gerar_log(args.interacoes)
+    ini = time.perf_counter()
+    log = LogInteracoes(antigo.assign(Data_Obj=pd.to_datetime(antigo['Data_Obj'])))
+    novo = log.frame()
+    print(f"{len(novo):,} interações | ordenação inicial {time.perf_counter() - ini:.2f}s")
+
+    hoje = date.today()
+    prim_dia, di = hoje.replace(day=1), hoje - timedelta(days=30)
+
+    ini = time.perf_counter(); a = metas_linha_a_linha(antigo, 'VENDEDOR 3', prim_dia); t_a = time.perf_counter() - ini
+    ini = time.perf_counter()
+    mes = periodo(novo, prim_dia)
+    b = placar_vendedores(mes[mes['Vendedor'].isin(['VENDEDOR 3'])], total=True).iloc[0]
+    b = {'fat': b['Fat'], 'cli': b['Cli'], 'ativ': b['Ativ']}
+    t_b = time.perf_counter() - ini
+    assert a == b, (a, b)
+    print(f"metas do mês   apply {t_a * 1000:.0f}ms | busca binária {t_b * 1000:.1f}ms")
+
+    ini = time.perf_counter(); a = periodo_linha_a_linha(antigo, di, hoje); t_a = time.perf_counter() - ini
+    ini = time.perf_counter(); b = periodo(novo, di, hoje); t_b = time.perf_counter() - ini
+    assert len(a) == len(b) and a['Valor_Proposta'].sum() == b['Valor_Proposta'].sum()
+    print(f"período 30 dias apply {t_a * 1000:.0f}ms | busca binária {t_b * 1000:.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""Placar dos vendedores (ranking do GESTOR e metas da barra lateral): compara o
+groupby com lambdas por grupo e o '% Meta' por apply com o placar numa passada.
+
+Uso: python -m benchmarks.bench_placar [--interacoes 500000]
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_periodo import gerar_log
+from crm.indicadores import placar_vendedores
+
+
+def ranking_linha_a_linha(dff, df_cfg):
+    # Implementação anterior da aba "🏆 Ranking" (sem a formatação do Fat)
+    agg = dff.groupby('Vendedor').agg(
+        Fat=('Valor_Proposta', lambda x: x[dff.loc[x.index,'Tipo']=='Venda Fechada'].sum()),
+        Cli=('CNPJ_Cliente', lambda x: x[dff.loc[x.index,'Tipo']=='Venda Fechada'].nunique())
+    ).reset_index()
+    df_metas_merge = df_cfg[['Usuario', 'Meta_Fat']].rename(columns={'Usuario':'Vendedor'})
+    agg = pd.merge(agg, df_metas_merge, on='Vendedor', how='left').fillna(0)
+    agg['% Meta'] = agg.apply(lambda x: f"{x['Fat']/x['Meta_Fat']*100:.0f}%" if x['Meta_Fat']>0 else "-", axis=1)
+    return agg
+
+
+def ranking_placar(dff, df_cfg):
+    # Mesma montagem da VIEW GESTOR sobre o placar
+    agg = placar_vendedores(dff)[['Fat', 'Cli']].reset_index()
+    df_metas_merge = df_cfg[['Usuario', 'Meta_Fat']].rename(columns={'Usuario':'Vendedor'})
+    agg = pd.merge(agg, df_metas_merge, on='Vendedor', how='left').fillna({'Meta_Fat': 0})
+    pct_meta = (agg['Fat'] / agg['Meta_Fat'].where(agg['Meta_Fat'] > 0) * 100).round().astype('Int64')
+    agg['% Meta'] = np.where(pct_meta.notna(), pct_meta.astype(str) + '%', '-')
+    return agg
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--interacoes', type=int, default=500000)
+    args = ap.parse_args()
+
+    dff = gerar_log(args.interacoes)
+    dff['Data_Obj'] = pd.to_datetime(dff['Data_Obj'])
+    vends = sorted(dff['Vendedor'].unique())
+    # Parte dos vendedores sem meta cadastrada
+    df_cfg = pd.DataFrame({'Usuario': vends[:15], 'Meta_Fat': np.arange(15) * 10**7})
+
+    ini = time.perf_counter(); a = ranking_linha_a_linha(dff, df_cfg); t_a = time.perf_counter() - ini
+    ini = time.perf_counter(); b = ranking_placar(dff, df_cfg); t_b = time.perf_counter() - ini
+    assert a['Vendedor'].tolist() == b['Vendedor'].tolist()
+    assert (a['Fat'].to_numpy() == b['Fat'].to_numpy()).all() and (a['Cli'].to_numpy() == b['Cli'].to_numpy()).all()
+    assert a['% Meta'].tolist() == b['% Meta'].tolist()
+    print(f"{len(dff):,} interações, {len(vends)} vendedores")
+    print(f"ranking  lambdas + apply {t_a * 1000:.0f}ms | placar {t_b * 1000:.0f}ms ({t_a / t_b:.1f}x)")
+
+    ini = time.perf_counter(); p = placar_vendedores(dff, mensal=True); t = time.perf_counter() - ini
+    print(f"placar mensal ({len(p)} linhas vendedor x mês): {t * 1000:.0f}ms")
+
+
+if __name__ == '__main__':
+    main()
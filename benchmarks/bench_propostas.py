@@ -0,0 +1,110 @@
+"""KPIs de propostas (Orçado/Na Mesa/Fechado/Perdido) e orçamentos abertos: compara o
+loop com iterrows/regex por linha com o índice de propostas da base e confere que as
+somas do placar (o que a VIEW GESTOR mostra) dão os mesmos totais.
+
+Uso: python -m benchmarks.bench_propostas [--interacoes 200000] [--clientes 20000]
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from crm.carga import limpar_interacoes, mapa_nomes
+from crm.esquema import chaves_doc
+from crm.helpers import extrair_id, extrair_pedido_protheus
+from crm.indicadores import ORCAMENTO, IndicePropostas, placar_vendedores, propostas_abertas
+
+
+def kpis_linha_a_linha(dff):
+    # Implementação anterior da VIEW GESTOR
+    resols = set(dff[dff['Tipo'].isin(['Venda Fechada','Venda Perdida'])]['Resumo'])
+    ids_res = set([extrair_id(x) for x in resols if extrair_id(x)])
+    peds_res = set([extrair_pedido_protheus(x) for x in resols if extrair_pedido_protheus(x)])
+    mesa = perdido = orcado = fechado = 0
+    for _, row in dff.iterrows():
+        if row['Tipo'] == 'Orçamento Enviado':
+            if not ((extrair_id(row['Resumo']) in ids_res) or (extrair_pedido_protheus(row['Resumo']) in peds_res)):
+                mesa += row['Valor_Proposta']
+            orcado += row['Valor_Proposta']
+        elif row['Tipo'] == 'Venda Fechada': fechado += row['Valor_Proposta']
+        elif row['Tipo'] == 'Venda Perdida': perdido += row['Valor_Proposta']
+    return {'orcado': orcado, 'mesa': mesa, 'fechado': fechado, 'perdido': perdido}
+
+
+def kpis_propostas(df, indice):
+    # Referência vetorizada pelo índice (o app tira os mesmos totais das somas do placar)
+    if df.empty: return {'orcado': 0, 'mesa': 0, 'fechado': 0, 'perdido': 0}
+    v, tipo = df['Valor_Proposta'].to_numpy(), df['Tipo']
+    return {
+        'orcado': int(v[tipo.eq(ORCAMENTO).to_numpy()].sum()),
+        'mesa': int(v[indice.abertas(df)].sum()),
+        'fechado': int(v[tipo.eq('Venda Fechada').to_numpy()].sum()),
+        'perdido': int(v[tipo.eq('Venda Perdida').to_numpy()].sum()),
+    }
+
+
+def abertas_linha_a_linha(c_ints):
+    # Implementação anterior da aba "💰 Abertas"
+    resols_cli = set(c_ints[c_ints['Tipo'].isin(['Venda Fechada', 'Venda Perdida'])]['Resumo'])
+    ids_res = set([extrair_id(x) for x in resols_cli if extrair_id(x)])
+    peds_res = set([extrair_pedido_protheus(x) for x in resols_cli if extrair_pedido_protheus(x)])
+    abertas = []
+    for _, row in c_ints[c_ints['Tipo'] == 'Orçamento Enviado'].iterrows():
+        pid, ped = extrair_id(row['Resumo']), extrair_pedido_protheus(row['Resumo'])
+        if not ((pid and pid in ids_res) or (ped and ped in peds_res)): abertas.append(row)
+    return abertas
+
+
+def gerar_log(n_int, n_cli, seed=11):
+    # Orçamentos com #ID únicos (parte vinda do Protheus), fechamentos/perdas com "Ref" e ligações
+    rng = np.random.default_rng(seed)
+    docs = (rng.choice(10**13, n_cli, replace=False) + 10**13).astype(str)
+    n_orc = n_int // 3
+    ids = np.array([f"#{np.base_repr(i, 36):0>4}" for i in rng.choice(36**4, n_orc, replace=False)])
+    protheus = rng.random(n_orc) < 0.3
+    resumo_orc = np.where(protheus, np.char.add(np.char.add(ids, ' [PROTHEUS] Pedido: '), (np.arange(n_orc) + 500000).astype(str)),
+                          np.char.add(ids, ' Proposta enviada'))
+    cli_orc = docs[rng.integers(0, n_cli, n_orc)]
+    regs = [{'CNPJ_Cliente': c, 'Data': '01/03/2025', 'Tipo': 'Orçamento Enviado', 'Resumo': r, 'Vendedor': 'V1',
+             'Valor_Proposta': int(v)} for c, r, v in zip(cli_orc, resumo_orc, rng.integers(100, 50000, n_orc))]
+    resolvidos = rng.choice(n_orc, n_orc // 2, replace=False)
+    for i in resolvidos:
+        regs.append({'CNPJ_Cliente': cli_orc[i], 'Data': '15/03/2025', 'Tipo': rng.choice(['Venda Fechada', 'Venda Perdida']),
+                     'Resumo': f"Ref {resumo_orc[i]}", 'Vendedor': 'V1', 'Valor_Proposta': int(rng.integers(100, 50000))})
+    for _ in range(n_int - len(regs)):
+        regs.append({'CNPJ_Cliente': docs[rng.integers(0, n_cli)], 'Data': '20/03/2025', 'Tipo': 'Ligação Realizada',
+                     'Resumo': 'Ligou', 'Vendedor': 'V1', 'Valor_Proposta': 0})
+    df_cli = pd.DataFrame({'KEY_DOC': chaves_doc(pd.Series(docs)), 'Nome_Fantasia': docs})
+    return limpar_interacoes(regs, mapa_nomes(df_cli)), docs
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--interacoes', type=int, default=200000)
+    ap.add_argument('--clientes', type=int, default=20000)
+    args = ap.parse_args()
+
+    df_int, docs = gerar_log(args.interacoes, args.clientes)
+    ini = time.perf_counter(); indice = IndicePropostas(df_int); t_idx = time.perf_counter() - ini
+    print(f"{len(df_int):,} interações | índice montado em {t_idx:.2f}s")
+
+    ini = time.perf_counter(); antigo = kpis_linha_a_linha(df_int); t_antigo = time.perf_counter() - ini
+    ini = time.perf_counter(); novo = kpis_propostas(df_int, indice); t_novo = time.perf_counter() - ini
+    assert antigo == novo, (antigo, novo)
+    ini = time.perf_counter(); placar = placar_vendedores(df_int, indice)[['Orcado', 'Pipeline', 'Fat', 'Perdido']].sum(); t_placar = time.perf_counter() - ini
+    assert dict(zip(['orcado', 'mesa', 'fechado', 'perdido'], placar.astype(int).tolist())) == novo, (placar, novo)
+    print(f"KPIs      linha a linha {t_antigo:.2f}s | índice {t_novo * 1000:.1f}ms ({t_antigo / t_novo:.0f}x) | placar {t_placar * 1000:.1f}ms")
+
+    amostra = docs[:200].astype(np.int64)
+    grupos = {k: g for k, g in df_int[df_int['KEY_DOC'].isin(amostra)].groupby('KEY_DOC')}
+    t_antigo = t_novo = 0.0
+    for g in grupos.values():
+        ini = time.perf_counter(); a = abertas_linha_a_linha(g); t_antigo += time.perf_counter() - ini
+        ini = time.perf_counter(); b = propostas_abertas(g, indice); t_novo += time.perf_counter() - ini
+        assert [r['Resumo'] for r in a] == b['Resumo'].tolist()
+    print(f"Abertas   linha a linha {t_antigo / len(grupos) * 1000:.2f}ms | índice {t_novo / len(grupos) * 1000:.2f}ms por cliente")
+
+
+if __name__ == '__main__':
+    main()
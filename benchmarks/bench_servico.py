@@ -0,0 +1,73 @@
+"""Camada de serviço: tempo de um rerun do GESTOR e da carteira do vendedor calculando tudo
+(primeira chamada) e lendo o resultado memorizado (reruns sem mudança), e depois de uma
+gravação (nova versão da base). Por fim o GESTOR troca de período enquanto chegam gravações:
+confere que o memo só guarda a versão atual e poucos detalhes (frames do tamanho do período).
+
+Uso: python -m benchmarks.bench_servico [--clientes 100000] [--interacoes 2]
+"""
+import argparse
+import logging
+import time
+from datetime import date, timedelta
+
+from benchmarks.fake_gspread import FakeSpreadsheet
+from benchmarks.geradores import planilha
+from crm.carga import SincronizadorPlanilha
+from crm.dados import BaseCompartilhada
+from crm.fila import EscritaDireta
+from crm.servico import LIMITES_MEMO, Servico
+
+STATUS = ['⏳ NEGOCIAÇÃO', '⚠️ FOLLOW-UP']
+
+
+def rerun(servico, vend, hoje):
+    # O que um rerun pede ao serviço: GESTOR (metas + painel) e vendedor (metas + lista + página + cliente)
+    servico.metas('ADMIN', hoje)
+    servico.painel_gestor(['TODOS'], hoje - timedelta(days=30), hoje)
+    servico.detalhes_gestor(['TODOS'], hoje - timedelta(days=30), hoje)
+    servico.metas(vend, hoje)
+    servico.lista_clientes([vend], STATUS)
+    _, _, rotulos = servico.pagina_clientes([vend], STATUS, '', 1)
+    if rotulos: servico.cliente([vend], next(iter(rotulos)))
+
+
+def cronometrar(fn, vezes=1):
+    ini = time.perf_counter()
+    for _ in range(vezes): fn()
+    return (time.perf_counter() - ini) / vezes
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--clientes', type=int, default=100000)
+    ap.add_argument('--interacoes', type=int, default=2, help="interações por cliente")
+    args = ap.parse_args()
+    logging.getLogger('crm.metricas').setLevel(logging.ERROR)
+
+    abas, docs, vends = planilha(args.clientes, args.clientes * args.interacoes)
+    ss = FakeSpreadsheet(abas)
+    base = BaseCompartilhada(SincronizadorPlanilha(lambda: ss), EscritaDireta(lambda: ss))
+    servico = Servico(base)
+    hoje = date.today()
+    print(f"{args.clientes:,} clientes, {len(base.df_int):,} interações")
+
+    frio = cronometrar(lambda: rerun(servico, vends[0], hoje))
+    quente = cronometrar(lambda: rerun(servico, vends[0], hoje), 20)
+    print(f"rerun calculando   {frio * 1000:8.1f}ms")
+    print(f"rerun memorizado   {quente * 1000:8.2f}ms ({frio / quente:.0f}x)")
+    servico.salvar_interacao(str(docs[0]), hoje, "Ligação Realizada", "bench", vends[0], 0)
+    print(f"após gravação      {cronometrar(lambda: rerun(servico, vends[0], hoje)) * 1000:8.1f}ms")
+
+    for i in range(30):
+        inicio = hoje - timedelta(days=30 + 10 * i)
+        servico.painel_gestor(['TODOS'], inicio, hoje)
+        servico.detalhes_gestor(['TODOS'], inicio, hoje)
+        if i % 3 == 0: servico.salvar_interacao(str(docs[i]), hoje, "Ligação Realizada", "bench", vends[0], 0)
+    guardados = {nome: len(memo) for nome, memo in servico._memo.items()}
+    mb = sum(df.memory_usage(deep=True).sum() for df in servico._memo['detalhes_gestor'].values()) / 2**20
+    assert guardados['detalhes_gestor'] <= LIMITES_MEMO['detalhes_gestor'] and guardados['painel_gestor'] <= 3, guardados
+    print(f"30 períodos, 10 gravações: memo {guardados}, detalhes {mb:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
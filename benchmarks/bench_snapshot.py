@@ -0,0 +1,45 @@
+"""Partida a frio: carga completa da planilha x abertura do snapshot local.
+
+Uso: python -m benchmarks.bench_snapshot [--clientes 50000] [--interacoes 200000]
+"""
+import argparse
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.bench_sync import planilha
+from crm.carga import SincronizadorPlanilha
+from crm.dados import BaseCompartilhada
+from crm.fila import EscritaDireta
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument('--clientes', type=int, default=50_000)
+    ap.add_argument('--interacoes', type=int, default=200_000)
+    args = ap.parse_args()
+
+    ss, *_ = planilha(args.clientes, args.interacoes)
+    with tempfile.TemporaryDirectory() as pasta:
+        ini = time.perf_counter()
+        fria = BaseCompartilhada(SincronizadorPlanilha(lambda: ss), EscritaDireta(lambda: ss), pasta_snapshot=pasta)
+        t_fria = time.perf_counter() - ini
+
+        antes = ss.chamadas()
+        ini = time.perf_counter()
+        quente = BaseCompartilhada(SincronizadorPlanilha(lambda: ss), EscritaDireta(lambda: ss), pasta_snapshot=pasta)
+        t_quente = time.perf_counter() - ini
+        quente._thread.join()
+        chamadas = ss.chamadas() - antes
+
+        pd.testing.assert_series_equal(fria.df_cli['Status'], quente.df_cli['Status'])
+        cols = ['KEY_DOC', 'Tipo', 'Resumo', 'Vendedor', 'Valor_Proposta', 'Data_Obj']
+        pd.testing.assert_frame_equal(fria.df_int[cols], quente.df_int[cols], check_dtype=False)
+
+    print(f"carga completa da planilha: {t_fria:.3f}s")
+    print(f"abertura pelo snapshot:     {t_quente:.3f}s (reconciliação em segundo plano: {dict(chamadas)})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Benchmark do motor de status: compara com a versão linha a linha e mede a escala.
+
+Uso: python -m benchmarks.bench_status [--tamanhos 10000 100000 1000000]
+"""
+import argparse
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from crm.motor import recalcular_status_massa
+
+TIPOS = ['Ligação Realizada', 'WhatsApp Enviado', 'Orçamento Enviado', 'Agendou Visita', 'Venda Fechada', 'Venda Perdida']
+
+
+def recalcular_status_linha_a_linha(df_c, df_i, hoje=None):
+    # Implementação anterior (apply por linha), com sort estável para desempate determinístico
+    hoje = hoje or datetime.now().date()
+    df_c['Status'] = '🟢 ATIVO'
+    if 'Data_Ultima_Compra' in df_c.columns:
+        df_c['Dias_Sem_Comprar'] = (pd.Timestamp(hoje) - df_c['Data_Ultima_Compra']).dt.days
+        df_c.loc[df_c['Dias_Sem_Comprar'] >= 60, 'Status'] = '🔴 RECUPERAR'
+        df_c.loc[df_c['Dias_Sem_Comprar'].isna(), 'Status'] = '🆕 NOVO S/ INTERAÇÃO'
+    if df_i.empty: return df_c
+    ultimas_interacoes = df_i.sort_values('Data_Obj', ascending=True, kind='stable').groupby('KEY_DOC').tail(1)
+    mapa_status_interacao = dict(zip(ultimas_interacoes['KEY_DOC'], ultimas_interacoes['Tipo']))
+
+    def aplicar_status_crm(row):
+        ultima_acao = mapa_status_interacao.get(row['KEY_DOC'])
+        if not ultima_acao: return row['Status']
+        if ultima_acao == 'Orçamento Enviado': return '⏳ NEGOCIAÇÃO'
+        elif ultima_acao in ['Ligação Realizada', 'WhatsApp Enviado', 'Agendou Visita']: return '⚠️ FOLLOW-UP'
+        elif ultima_acao == 'Venda Perdida': return '👎 VENDA PERDIDA'
+        elif ultima_acao == 'Venda Fechada': return '⭐ VENDA RECENTE'
+        else: return row['Status']
+
+    df_c['Status'] = df_c.apply(aplicar_status_crm, axis=1)
+    return df_c
+
+
+def gerar_dados(n_cli, n_int, seed=42):
+    rng = np.random.default_rng(seed)
+    hoje = date.today()
+    docs = pd.Series(rng.choice(10**13, n_cli, replace=False) + 10**13).astype(str)
+    ult_compra = pd.Series(pd.Timestamp(hoje) - pd.to_timedelta(rng.integers(0, 400, n_cli), unit='D'))
+    ult_compra[rng.random(n_cli) < 0.1] = pd.NaT
+    df_c = pd.DataFrame({'ID_Cliente_CNPJ_CPF': docs, 'KEY_DOC': docs, 'Data_Ultima_Compra': ult_compra})
+
+    datas = [hoje - timedelta(days=int(d)) for d in rng.integers(0, 365, n_int)]
+    df_i = pd.DataFrame({
+        # Parte das interações aponta para documentos fora da carteira
+        'KEY_DOC': np.where(rng.random(n_int) < 0.05, '0', docs.to_numpy()[rng.integers(0, n_cli, n_int)]),
+        'Data_Obj': pd.Series(datas, dtype=object),
+        'Tipo': rng.choice(TIPOS + [''], n_int),
+    })
+    df_i.loc[rng.random(n_int) < 0.01, 'Data_Obj'] = pd.NaT
+    return df_c, df_i
+
+
+def medir(fn, df_c, df_i):
+    ini = time.perf_counter()
+    res = fn(df_c.copy(), df_i)
+    return res, time.perf_counter() - ini
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument('--tamanhos', type=int, nargs='+', default=[10_000, 100_000, 300_000])
+    ap.add_argument('--limite-legado', type=int, default=100_000, help='maior tamanho em que a versão linha a linha também roda')
+    args = ap.parse_args()
+
+    print(f"{'clientes':>10} {'interações':>11} {'vetorizado':>11} {'µs/linha':>9} {'linha a linha':>14} {'ganho':>7}")
+    for n in args.tamanhos:
+        df_c, df_i = gerar_dados(n, 2 * n)
+        novo, t_novo = medir(recalcular_status_massa, df_c, df_i)
+        legado_txt, ganho_txt = '-', '-'
+        if n <= args.limite_legado:
+            legado, t_leg = medir(recalcular_status_linha_a_linha, df_c, df_i)
+            pd.testing.assert_series_equal(novo['Status'].astype(object), legado['Status'].astype(object), check_names=False)
+            pd.testing.assert_series_equal(novo['Dias_Sem_Comprar'], legado['Dias_Sem_Comprar'])
+            legado_txt, ganho_txt = f"{t_leg:.3f}s", f"{t_leg / t_novo:.0f}x"
+        print(f"{n:>10} {2 * n:>11} {t_novo:>10.3f}s {t_novo / (3 * n) * 1e6:>9.2f} {legado_txt:>14} {ganho_txt:>7}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Sincronização incremental contra a planilha falsa (sem rede).
+
+Confere que carga completa + leituras incrementais dão o mesmo resultado que
+uma carga completa do zero, e compara o número de chamadas e o tempo de cada
+estratégia.
+
+Uso: python -m benchmarks.bench_sync [--clientes 20000] [--interacoes 100000] [--rodadas 20]
+"""
+import argparse
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.fake_gspread import FakeSpreadsheet
+from crm.carga import SincronizadorPlanilha
+from crm.dados import BaseCompartilhada
+from crm.fila import EscritaDireta
+
+CAB_CLI = ['ID_Cliente_CNPJ_CPF','Nome_Fantasia','Contato','Tipo_Cliente','Telefone_Contato1','Telefone_Contato2','Email','Total_Compras','Data_Ultima_Compra','Total_Notas','Dias_Sem_Comprar','Ultimo_Vendedor']
+CAB_LEADS = CAB_CLI[:11] + ['Vendedor', 'Origem']
+CAB_INT = ['CNPJ_Cliente','Data','Tipo','Resumo','Vendedor','Valor_Proposta']
+TIPOS = ['Ligação Realizada', 'WhatsApp Enviado', 'Orçamento Enviado', 'Agendou Visita', 'Venda Fechada', 'Venda Perdida']
+
+
+def planilha(n_cli, n_int, seed=7):
+    rng = np.random.default_rng(seed)
+    docs = (rng.choice(10**13, n_cli, replace=False) + 10**13).astype(str)
+    vends = [f"VENDEDOR {i}" for i in range(10)]
+    cli = [CAB_CLI] + [[d, f"CLIENTE {i}", '', 'CORPORATIVO', '', '', '', '1500,00', '01/01/2025', '1', '', vends[i % 10]] for i, d in enumerate(docs)]
+    cfg = [['Usuario','Senha','Tipo','Carteira_Alvo','Meta_Fat','Meta_Clientes','Meta_Atividades']] + [[v, '1', 'VENDEDOR', v, '10000', '10', '100'] for v in vends]
+    return FakeSpreadsheet({
+        'Config_Equipe': cfg, 'Clientes': cli, 'Novos_Leads': [CAB_LEADS],
+        'Interacoes': [CAB_INT] + [linha_int(rng, docs, vends) for _ in range(n_int)],
+    }), rng, docs, vends
+
+
+def linha_int(rng, docs, vends):
+    d = date.today() - timedelta(days=int(rng.integers(0, 365)))
+    return [docs[rng.integers(len(docs))], d.strftime('%d/%m/%Y'), TIPOS[rng.integers(len(TIPOS))], 'obs', vends[rng.integers(len(vends))], str(rng.integers(0, 5000))]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument('--clientes', type=int, default=20_000)
+    ap.add_argument('--interacoes', type=int, default=100_000)
+    ap.add_argument('--rodadas', type=int, default=20)
+    args = ap.parse_args()
+
+    ss, rng, docs, vends = planilha(args.clientes, args.interacoes)
+    base = BaseCompartilhada(SincronizadorPlanilha(lambda: ss), EscritaDireta(lambda: ss))
+    t_delta = t_full = 0.0
+    for i in range(args.rodadas):
+        # Outros usuários gravando direto na planilha + um lead novo de vez em quando
+        ss.worksheet('Interacoes').append_rows([linha_int(rng, docs, vends) for _ in range(25)])
+        if i % 5 == 0: ss.worksheet('Novos_Leads').append_row([f"999{i:010d}", f"LEAD {i}", '', 'NOVO LEAD', '', '', '', '0', '', '0', '', vends[0], 'LIGAÇÃO'])
+        # ... e gravações desta instância, que não podem voltar duplicadas
+        base.gravar('Interacoes', [docs[0], date.today().strftime('%d/%m/%Y'), 'Ligação Realizada', f"local {i}", vends[0], 0])
+
+        antes = ss.chamadas()
+        ini = time.perf_counter(); base.sincronizar(); t_delta += time.perf_counter() - ini
+        chamadas_delta = ss.chamadas() - antes
+
+    ini = time.perf_counter()
+    ref = BaseCompartilhada(SincronizadorPlanilha(lambda: ss), EscritaDireta(lambda: ss))
+    t_full = time.perf_counter() - ini
+
+    cols = ['KEY_DOC', 'Tipo', 'Resumo', 'Vendedor', 'Valor_Proposta']
+    # Linhas gravadas localmente entram no log antes das de outros usuários: compara sem a ordem
+    ordenar = lambda df: df[cols].astype(str).sort_values(cols).reset_index(drop=True)
+    pd.testing.assert_frame_equal(ordenar(base.df_int), ordenar(ref.df_int))
+    st_inc = base.df_cli.set_index('KEY_DOC')['Status'].sort_index()
+    st_ref = ref.df_cli.set_index('KEY_DOC')['Status'].sort_index()
+    pd.testing.assert_series_equal(st_inc, st_ref)
+
+    print(f"interações finais: {len(ref.df_int)} | clientes: {len(ref.df_cli)} (resultado idêntico à carga completa)")
+    print(f"carga completa: {t_full:.3f}s")
+    print(f"sincronização incremental: {t_delta / args.rodadas * 1000:.1f} ms/rodada, chamadas na última: {dict(chamadas_delta)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Planilha em memória com a parte da API do gspread usada pelo CRM.
+
+Os valores ficam guardados como texto formatado, como a API devolve, e cada
+chamada é contada em `chamadas` para comparar estratégias de leitura/escrita.
+"""
+import re
+from collections import Counter
+
+from gspread.utils import a1_to_rowcol
+
+
+def _texto(v):
+    return '' if v is None else str(v)
+
+
+def _aparar(linhas):
+    # A API omite células vazias no fim de cada linha e linhas vazias no fim do intervalo
+    linhas = [list(l) for l in linhas]
+    for l in linhas:
+        while l and l[-1] == '': l.pop()
+    while linhas and not linhas[-1]: linhas.pop()
+    return linhas
+
+
+class FakeWorksheet:
+    def __init__(self, title, linhas=None):
+        self.title = title
+        self.linhas = [[_texto(v) for v in l] for l in (linhas or [])]
+        self.chamadas = Counter()
+
+    def _intervalo(self, a1):
+        # Suporta 'N:M' (linhas inteiras) e 'A1:C' / 'A2:C10' (colunas limitadas, fim opcional)
+        ini, _, fim = a1.partition(':')
+        if re.fullmatch(r'\d+', ini):
+            return int(ini), int(fim or ini), 1, None
+        r1, c1 = a1_to_rowcol(ini if re.search(r'\d', ini) else ini + '1')
+        if re.search(r'\d', fim): r2, c2 = a1_to_rowcol(fim)
+        else: r2, c2 = None, a1_to_rowcol(fim + '1')[1]
+        return r1, r2, c1, c2
+
+    def _ler(self, a1):
+        r1, r2, c1, c2 = self._intervalo(a1)
+        linhas = self.linhas[r1 - 1:r2]
+        return _aparar([l[c1 - 1:c2] for l in linhas])
+
+    def get(self, range_name=None, pad_values=False, **kwargs):
+        self.chamadas['get'] += 1
+        valores = self._ler(range_name) if range_name else _aparar(self.linhas)
+        if pad_values and valores:
+            largura = max(len(l) for l in valores)
+            valores = [l + [''] * (largura - len(l)) for l in valores]
+        return valores or [[]]
+
+    def get_all_records(self, **kwargs):
+        from crm.carga import registros
+        valores = self.get(pad_values=True)
+        return registros(valores[0], valores[1:]) if valores != [[]] else []
+
+    def batch_get(self, ranges, **kwargs):
+        self.chamadas['batch_get'] += 1
+        return [self._ler(r) for r in ranges]
+
+    def row_values(self, row, **kwargs):
+        self.chamadas['row_values'] += 1
+        return _aparar([self.linhas[row - 1]])[0] if row <= len(self.linhas) else []
+
+    def col_values(self, col, **kwargs):
+        self.chamadas['col_values'] += 1
+        coluna = [l[col - 1] if len(l) >= col else '' for l in self.linhas]
+        while coluna and coluna[-1] == '': coluna.pop()
+        return coluna
+
+    def append_row(self, values, **kwargs):
+        self.chamadas['append_row'] += 1
+        self.linhas.append([_texto(v) for v in values])
+
+    def append_rows(self, values, **kwargs):
+        self.chamadas['append_rows'] += 1
+        self.linhas.extend([_texto(v) for v in l] for l in values)
+
+    def update(self, values, range_name, **kwargs):
+        self.chamadas['update'] += 1
+        self._escrever(range_name, values)
+
+    def batch_update(self, data, **kwargs):
+        self.chamadas['batch_update'] += 1
+        for d in data: self._escrever(d['range'], d['values'])
+
+    def _escrever(self, a1, values):
+        r1, _, c1, _ = self._intervalo(a1)
+        for i, l in enumerate(values):
+            pos = r1 - 1 + i
+            while len(self.linhas) <= pos: self.linhas.append([])
+            atual = self.linhas[pos]
+            atual.extend([''] * (c1 - 1 + len(l) - len(atual)))
+            atual[c1 - 1:c1 - 1 + len(l)] = [_texto(v) for v in l]
+
+
+class FakeSpreadsheet:
+    def __init__(self, abas=None):
+        self.abas = {}
+        for titulo, linhas in (abas or {}).items(): self.abas[titulo] = FakeWorksheet(titulo, linhas)
+
+    def worksheet(self, title):
+        if title not in self.abas: raise KeyError(title)
+        return self.abas[title]
+
+    def chamadas(self):
+        total = Counter()
+        for ws in self.abas.values(): total.update({f"{ws.title}.{k}": v for k, v in ws.chamadas.items()})
+        return total
@@ -0,0 +1,148 @@
+"""Dados sintéticos no formato da planilha (as colunas do "Teste CSV 20 Clientes.csv" e das
+demais abas) e da exportação do Protheus, para medir o CRM com 10k/100k/1M linhas sem rede.
+
+Os valores saem como texto, do jeito que a API do Sheets devolve ("36297,70", "21/05/2025").
+Tudo é determinístico pela `seed`.
+
+Uso típico:
+    abas, docs, vends = planilha(100_000, 200_000)
+    ss = FakeSpreadsheet(abas)
+    arquivo = protheus_xlsx(10_000, docs, vends)
+"""
+import io
+import string
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+from crm.importacao import COLUNAS_PROTHEUS
+
+CAB_CLI = ['ID_Cliente_CNPJ_CPF','Nome_Fantasia','Contato','Tipo_Cliente','Telefone_Contato1','Telefone_Contato2','Email','Total_Compras','Data_Ultima_Compra','Total_Notas','Dias_Sem_Comprar','Ultimo_Vendedor']
+CAB_LEADS = CAB_CLI[:11] + ['Vendedor', 'Origem']
+CAB_INT = ['CNPJ_Cliente','Data','Tipo','Resumo','Vendedor','Valor_Proposta']
+CAB_CFG = ['Usuario','Senha','Tipo','Carteira_Alvo','Meta_Fat','Meta_Clientes','Meta_Atividades']
+
+TIPOS_CLIENTE = ['CORPORATIVO', 'REVENDA JURIDICA', 'CONSUMIDOR FINAL', 'ORGAO PUBLICO']
+PALAVRAS = ['COMERCIO', 'COMÉRCIO', 'SÃO', 'JOSÉ', 'MATERIAIS', 'CONSTRUÇÃO', 'LTDA', 'ME', 'DISTRIBUIDORA',
+            'AÇO', 'FERRAGENS', 'IRMÃOS', 'SILVA', 'ÁGUA', 'ELÉTRICA', 'PEÇAS', 'INDÚSTRIA', 'NORTE', 'SUL']
+CONTATOS = ['JOHNNY', 'DYEMY', 'MARIA', 'JOSÉ', 'ANA PAULA', 'CARLOS', '']
+# Peso de cada tipo no log: contatos dominam, fechamentos e perdas citam um orçamento anterior
+TIPOS_INT = {'Ligação Realizada': 0.35, 'WhatsApp Enviado': 0.2, 'Agendou Visita': 0.05,
+             'Orçamento Enviado': 0.25, 'Venda Fechada': 0.1, 'Venda Perdida': 0.05}
+STATUS_PROTHEUS = ['FATURADO', 'PEDIDO FECHADO', 'CANCELADO', 'EM ABERTO', 'LIBERADO']
+_BASE36 = np.array(list(string.ascii_uppercase + string.digits))
+
+
+def vendedores(n):
+    return [f"VENDEDOR {i:02d}" for i in range(n)]
+
+
+def _datas(rng, n, dias, hoje=None):
+    # Datas dd/mm/aaaa nos últimos `dias` dias
+    hoje = pd.Timestamp(hoje or date.today())
+    return (hoje - pd.to_timedelta(rng.integers(0, dias, n), unit='D')).strftime('%d/%m/%Y').to_numpy(dtype=object)
+
+
+def _moeda(centavos):
+    # 3629770 -> "36297,70"
+    return np.char.add(np.char.add((centavos // 100).astype(str), ','), np.char.zfill((centavos % 100).astype(str), 2))
+
+
+def _textos(coluna):
+    # str do Python em vez de np.str_, como viriam da API
+    return np.asarray(coluna, dtype=object)
+
+
+def _documentos(rng, n):
+    # 30% CPF (11 dígitos) e 70% CNPJ (14), todos distintos também como número; parte fica com
+    # zeros à esquerda, que a planilha perde ao converter para número
+    n_cpf = int(n * 0.3)
+    cpf = np.char.zfill(rng.choice(10**11, n_cpf, replace=False).astype(str), 11)
+    cnpj = np.char.zfill((rng.choice(10**14 - 10**11, n - n_cpf, replace=False) + 10**11).astype(str), 14)
+    return rng.permutation(np.concatenate([cpf, cnpj]).astype(object))
+
+
+def config_equipe(vends):
+    linhas = [CAB_CFG, ['ADMIN', '1', 'GESTOR', 'TODOS', str(10**6 * len(vends)), str(50 * len(vends)), str(500 * len(vends))]]
+    return linhas + [[v, '1', 'VENDEDOR', v, '100000', '50', '500'] for v in vends]
+
+
+def clientes(rng, n, vends):
+    docs = _documentos(rng, n)
+    nomes = [' '.join(p) + f" {i}" for i, p in enumerate(rng.choice(PALAVRAS, (n, 3)))]
+    ultima = _datas(rng, n, 6 * 365)
+    ultima[rng.random(n) < 0.05] = ''
+    colunas = [docs, nomes, rng.choice(CONTATOS, n), rng.choice(TIPOS_CLIENTE, n),
+               rng.integers(30000000, 39999999, n).astype(str), np.full(n, ''), np.char.add(docs.astype(str), '@cliente.com.br'),
+               _moeda(rng.integers(0, 10**8, n)), ultima, rng.integers(0, 200, n).astype(str), np.full(n, ''),
+               rng.choice(vends, n)]
+    return [CAB_CLI] + [list(l) for l in zip(*map(_textos, colunas))], docs
+
+
+def novos_leads(rng, n, vends):
+    docs = _documentos(rng, n)
+    linhas = [[d, f"LEAD {i}", '', 'NOVO LEAD', '', '', '', '0', '', '0', '', v, o]
+              for i, (d, v, o) in enumerate(zip(docs, *map(_textos, [rng.choice(vends, n), rng.choice(['LIGAÇÃO', 'E-MAIL', 'INDICAÇÃO'], n)])))]
+    return [CAB_LEADS] + linhas
+
+
+def interacoes(rng, n, docs, vends, dias=730):
+    # Log em ordem de registro (por data). Cada orçamento tem um #ID único (parte vem do
+    # Protheus, com pedido); fechamentos e perdas são "Ref <resumo do orçamento>".
+    tipos = rng.choice(list(TIPOS_INT), n, p=list(TIPOS_INT.values()))
+    cli = rng.choice(docs, n)
+    resumo = np.full(n, 'Contato com o cliente', dtype=object)
+    valor = np.zeros(n, dtype=np.int64)
+
+    orc = np.flatnonzero(tipos == 'Orçamento Enviado')
+    cod = rng.choice(36**4, len(orc), replace=False)
+    ids = np.char.add('#', _BASE36[np.stack([cod // 36**k % 36 for k in (3, 2, 1, 0)], axis=1)].view('<U4').ravel())
+    protheus = rng.random(len(orc)) < 0.3
+    pedidos = (np.arange(len(orc)) + 100000).astype(str)
+    resumo[orc] = np.where(protheus, np.char.add(np.char.add(ids, ' [PROTHEUS] Pedido: '), pedidos), np.char.add(ids, ' Proposta enviada'))
+    valor[orc] = rng.integers(100, 100000, len(orc))
+
+    res = np.flatnonzero(np.isin(tipos, ['Venda Fechada', 'Venda Perdida']))
+    if len(orc):
+        ref = orc[rng.integers(0, len(orc), len(res))]
+        cli[res], valor[res] = cli[ref], valor[ref]
+        resumo[res] = np.char.add('Ref ', resumo[ref].astype(str))
+    else: tipos[res] = 'Ligação Realizada'
+
+    datas = pd.Timestamp(date.today()) - pd.to_timedelta(np.sort(rng.integers(0, dias, n))[::-1], unit='D')
+    colunas = [cli, datas.strftime('%d/%m/%Y'), tipos, resumo, rng.choice(vends, n), valor.astype(str)]
+    return [CAB_INT] + [list(l) for l in zip(*map(_textos, colunas))]
+
+
+def planilha(n_cli, n_int, n_vend=10, n_leads=0, seed=7):
+    # Abas da planilha (cabeçalho + linhas de texto), os documentos dos clientes e os vendedores
+    rng = np.random.default_rng(seed)
+    vends = vendedores(n_vend)
+    abas_cli, docs = clientes(rng, n_cli, vends)
+    abas = {'Config_Equipe': config_equipe(vends), 'Clientes': abas_cli,
+            'Novos_Leads': novos_leads(rng, n_leads, vends) if n_leads else [CAB_LEADS],
+            'Interacoes': interacoes(rng, n_int, docs, vends)}
+    return abas, docs, vends
+
+
+def protheus_xlsx(n, docs=None, vends=None, pedidos_antigos=(), seed=3):
+    # Exportação do Protheus (.xlsx em memória) com metade dos pedidos já importados antes
+    # (quando há `pedidos_antigos`), vendedores com caixa/espaços fora do padrão e STATUS em minúsculas
+    rng = np.random.default_rng(seed)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(COLUNAS_PROTHEUS)
+    antigos = np.array(sorted(pedidos_antigos))
+    hoje = date.today()
+    for i in range(n):
+        pid = int(rng.choice(antigos)) if len(antigos) and rng.random() < 0.5 else 900000 + i
+        doc = int(rng.choice(docs)) if docs is not None else int(rng.integers(10**13, 10**14))
+        vend = rng.choice(vends) if vends is not None else f"vendedor {rng.integers(0, 10)}"
+        ws.append([datetime.combine(hoje - timedelta(days=int(rng.integers(0, 60))), datetime.min.time()),
+                   doc, f" {str(vend).lower()} ", int(rng.integers(100, 100000)), pid, str(rng.choice(STATUS_PROTHEUS)).lower()])
+    buf = io.BytesIO()
+    wb.save(buf)
+    buf.seek(0)
+    return buf
@@ -0,0 +1,169 @@
+"""Suíte de desempenho dos caminhos quentes do CRM, sem rede: dados de benchmarks.geradores
+servidos pela planilha falsa (benchmarks.fake_gspread).
+
+Para cada escala (nº de clientes; o log tem `--interacoes` interações por cliente) cada caso
+roda `--repeticoes` vezes e vale a mediana (guardando também a pior repetição); depois roda
+mais uma vez sob tracemalloc para o pico de memória alocada pelo Python/numpy.
+
+Com --base, compara com um baseline salvo por --salvar e termina com código 1 se a mediana de
+algum caso passou da pior repetição do baseline além da tolerância. Diferenças abaixo de
+FOLGA_MINIMA são ruído e não contam: casos de milissegundos variam bem mais que 50% entre
+rodadas sem mudança no código. O caso `calibracao` (só pandas/numpy, nada do CRM) mede a
+máquina na hora: se ela está mais lenta que no baseline, o limite sobe na mesma proporção.
+
+Uso:
+    python -m benchmarks.suite [--escalas 10000,100000] [--casos carga_completa,importar_protheus]
+    python -m benchmarks.suite --salvar benchmarks/baseline.json
+    python -m benchmarks.suite --base benchmarks/baseline.json [--tolerancia 0.5]
+"""
+import argparse
+import gc
+import json
+import logging
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_propostas import kpis_propostas
+from benchmarks.fake_gspread import FakeSpreadsheet
+from benchmarks.geradores import planilha, protheus_xlsx
+from crm.busca import IndiceBusca
+from crm.carga import SincronizadorPlanilha
+from crm.dados import BaseCompartilhada
+from crm.fila import EscritaDireta
+from crm.importacao import importar_protheus
+from crm.indicadores import IndicePropostas, periodo, placar_vendedores
+from crm.motor import recalcular_status_massa
+
+FOLGA_MINIMA = 0.05  # segundos
+
+
+def casos(escala, interacoes_por_cliente):
+    # (nome, função sem argumentos) de cada caminho medido, sobre a mesma planilha sintética
+    abas, docs, vends = planilha(escala, escala * interacoes_por_cliente, n_leads=escala // 100)
+    ss = FakeSpreadsheet(abas)
+    sinc = SincronizadorPlanilha(lambda: ss)
+    _, cli, _ = sinc.carregar_tudo()
+    base = BaseCompartilhada(SincronizadorPlanilha(lambda: ss), EscritaDireta(lambda: ss))
+    inter = base.df_int
+    indice = IndicePropostas(inter)
+    busca = IndiceBusca(base.df_cli)
+    arquivo = protheus_xlsx(max(1000, escala // 10), docs, vends, pedidos_antigos=[int(p) for p in sorted(indice.pedidos)[:escala // 20]])
+    hoje = date.today()
+
+    def importar():
+        arquivo.seek(0)
+        return importar_protheus(arquivo, indice.pedidos)
+
+    def metas():
+        mes = periodo(inter, hoje.replace(day=1))
+        return placar_vendedores(mes[mes['Vendedor'].isin(vends[:1])], total=True)
+
+    return [
+        ('calibracao', calibracao()),
+        ('carga_completa', sinc.carregar_tudo),
+        ('abrir_base', lambda: BaseCompartilhada(SincronizadorPlanilha(lambda: ss), EscritaDireta(lambda: ss))),
+        ('recalcular_status_massa', lambda: recalcular_status_massa(cli.copy(), inter)),
+        ('importar_protheus', importar),
+        ('placar_gestor', lambda: placar_vendedores(periodo(inter, hoje - timedelta(days=30), hoje), indice)),
+        ('kpis_propostas', lambda: kpis_propostas(inter, indice)),
+        ('metas_mes', metas),
+        ('indice_busca', lambda: IndiceBusca(base.df_cli)),
+        ('buscar', lambda: [busca.buscar(t) for t in ('silva', 'constru', '4918')]),
+    ]
+
+
+def calibracao():
+    # Carga fixa, independente do código do CRM, para descontar a velocidade da máquina
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({'k': rng.integers(0, 1000, 500_000), 'v': rng.random(500_000)})
+    return lambda: df.sort_values('v').groupby('k')['v'].sum()
+
+
+def medir(fn, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        gc.collect()
+        ini = time.perf_counter()
+        fn()
+        tempos.append(time.perf_counter() - ini)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        pico = tracemalloc.get_traced_memory()[1]
+    finally: tracemalloc.stop()
+    return {'segundos': float(np.median(tempos)), 'maximo': max(tempos), 'pico_mb': pico / 2**20}
+
+
+def ambiente():
+    return {'python': platform.python_version(), 'pandas': pd.__version__, 'numpy': np.__version__,
+            'maquina': platform.machine(), 'sistema': platform.system()}
+
+
+def comparar(resultados, base, tolerancia):
+    # Casos cuja mediana passou da pior repetição do baseline além da tolerância (baselines
+    # antigos, só com 'segundos', usam esse tempo), corrigida pela calibração da escala
+    lentos = []
+    for chave, r in resultados.items():
+        ref = base.get(chave)
+        nome, escala = chave.split('@')
+        if not ref or nome == 'calibracao': continue
+        cal, cal_ref = resultados.get(f"calibracao@{escala}"), base.get(f"calibracao@{escala}")
+        fator = max(cal['segundos'] / cal_ref['segundos'], 1.0) if cal and cal_ref else 1.0
+        teto = ref.get('maximo', ref['segundos']) * fator
+        if r['segundos'] > teto * (1 + tolerancia) and r['segundos'] - teto > FOLGA_MINIMA:
+            lentos.append(chave)
+    return lentos
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--escalas', default='10000,100000', help="nº de clientes, separados por vírgula (ex.: 10000,100000,1000000)")
+    ap.add_argument('--interacoes', type=int, default=2, help="interações por cliente")
+    ap.add_argument('--repeticoes', type=int, default=5)
+    ap.add_argument('--casos', default='', help="só estes casos (separados por vírgula)")
+    ap.add_argument('--salvar', help="grava os resultados como baseline neste JSON")
+    ap.add_argument('--base', help="baseline (JSON) para comparar")
+    ap.add_argument('--tolerancia', type=float, default=0.5, help="lentidão aceita sobre o baseline (0.5 = 50%%)")
+    args = ap.parse_args()
+    # As rodadas sob tracemalloc passam do LIMITE_LENTO e poluiriam a saída com o log de etapa lenta
+    logging.getLogger('crm.metricas').setLevel(logging.ERROR)
+
+    base = {}
+    if args.base:
+        with open(args.base, encoding='utf-8') as f: base = json.load(f)['resultados']
+    filtro = {c for c in args.casos.split(',') if c}
+
+    resultados = {}
+    print(f"{'caso':<24} {'escala':>9} {'tempo':>9} {'pico':>9} {'baseline':>9} {'Δ':>7}")
+    for escala in (int(e) for e in args.escalas.split(',')):
+        ini = time.perf_counter()
+        lista = casos(escala, args.interacoes)
+        print(f"-- {escala:,} clientes, {escala * args.interacoes:,} interações (dados em {time.perf_counter() - ini:.1f}s)")
+        for nome, fn in lista:
+            if filtro and nome not in filtro and nome != 'calibracao': continue
+            chave = f"{nome}@{escala}"
+            r = resultados[chave] = medir(fn, args.repeticoes)
+            ref = base.get(chave)
+            comp = f"{ref['segundos']:8.3f}s {r['segundos'] / ref['segundos'] - 1:+6.0%}" if ref else f"{'-':>9} {'':>7}"
+            print(f"{nome:<24} {escala:>9,} {r['segundos']:8.3f}s {r['pico_mb']:6.1f} MB {comp}")
+
+    if args.salvar:
+        with open(args.salvar, 'w', encoding='utf-8') as f:
+            json.dump({'ambiente': ambiente(), 'resultados': resultados}, f, indent=2, ensure_ascii=False)
+        print(f"baseline gravado em {args.salvar}")
+
+    lentos = comparar(resultados, base, args.tolerancia)
+    if lentos:
+        print(f"REGRESSÃO (> {args.tolerancia:.0%} sobre o baseline): {', '.join(lentos)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
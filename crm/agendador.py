@@ -0,0 +1,192 @@
+import copy
+import threading
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from crm.indicadores import COLUNAS_PLACAR, periodo, placar_vendedores
+from crm.metricas import METRICAS
+from crm.motor import IndiceStatus, recalcular_status_massa, ultima_interacao_por_cliente
+
+RECUPERAR, FOLLOW_UP = '🔴 RECUPERAR', '⚠️ FOLLOW-UP'
+# De quanto em quanto tempo a thread confere se virou o dia ou a base mudou (segundos)
+INTERVALO = 10.0
+
+
+def _filas(clientes, grupos):
+    # Filas do dia por vendedor (`grupos`: vendedor -> posições crescentes em clientes): quem está
+    # há mais tempo sem comprar primeiro; follow-ups pelo contato mais antigo. Empates na ordem da
+    # base (ordenação estável): refazer as filas de alguns vendedores dá o mesmo que remontar todas
+    filas = {RECUPERAR: {}, FOLLOW_UP: {}}
+    if clientes.empty: return filas
+    for status, ordem, asc in [(RECUPERAR, 'Dias_Sem_Comprar', False), (FOLLOW_UP, 'Ultima_Interacao', True)]:
+        if ordem not in clientes.columns: continue
+        for v, pos in grupos.items():
+            pos = pos[(clientes['Status'].iloc[pos] == status).to_numpy()]
+            if not len(pos): continue
+            # Ordena só a coluna da ordem e copia as linhas uma vez
+            ordenado = clientes[ordem].iloc[pos].reset_index(drop=True).sort_values(ascending=asc, kind='stable')
+            filas[status][v] = clientes.iloc[pos[ordenado.index.to_numpy()]]
+    return filas
+
+
+class Quadro:
+    # Retrato da carteira para um dia e uma versão da base: status e dias sem comprar do dia,
+    # filas de recuperação e follow-up por vendedor e as metas do mês. Depois de publicado não
+    # é alterado: as sessões pegam a referência atual do Agendador e leem sem lock.
+    # `versao_status` é a versão da base que o status reflete: as interações gravadas depois do
+    # retrato entram por `seguir`, que gera o Quadro seguinte sem remontar tudo.
+    def __init__(self, versao, versao_base, dia, clientes, inter):
+        ini = time.perf_counter()
+        self.versao, self.versao_base, self.versao_status, self.dia = versao, versao_base, versao_base, dia
+        clientes = recalcular_status_massa(clientes, inter, dia) if not clientes.empty else clientes
+        if not clientes.empty and inter.empty: clientes['Ultima_Interacao'] = pd.Series(pd.NaT, index=clientes.index, dtype='datetime64[us]')
+        elif not clientes.empty:
+            ultimas = ultima_interacao_por_cliente(inter)
+            clientes['Ultima_Interacao'] = clientes['KEY_DOC'].map(pd.Series(ultimas['Data_Obj'].to_numpy(), index=ultimas['KEY_DOC'].to_numpy()))
+        self.clientes = clientes
+        self._linhas = clientes.groupby('Ultimo_Vendedor', observed=True, sort=False).indices if not clientes.empty else {}
+        self._idx = IndiceStatus(clientes, inter)
+        self.filas = _filas(clientes, self._linhas)
+
+        # Realizado no mês por vendedor e do time todo (None), no formato de BaseCompartilhada.metas_mes
+        mes = periodo(inter, dia.replace(day=1)) if not inter.empty else inter
+        por_vend = placar_vendedores(mes)
+        total = placar_vendedores(mes, total=True)
+        self.metas = {v: {c: por_vend.at[v, c] for c in COLUNAS_PLACAR} for v in por_vend.index}
+        self.metas[None] = {c: total[c].iloc[0] if len(total) else 0 for c in COLUNAS_PLACAR}
+        self.gerado_em = time.time()
+        self.segundos = time.perf_counter() - ini
+
+    def seguir(self, versao, versao_base, inter):
+        # Quadro seguinte com as interações da versão `versao_base` da base aplicadas ponto a ponto,
+        # como a base faz (IndiceStatus), com o dia do Quadro. Só as filas dos vendedores afetados
+        # são refeitas; as metas continuam as do retrato (valem só para `versao_base` do retrato).
+        # O Quadro publicado segue intacto para quem ainda o lê: índice e colunas alteradas são cópias
+        novo = copy.copy(self)
+        novo.versao, novo.versao_status = versao, versao_base
+        if inter.empty or self.clientes.empty: return novo
+        novo._idx = idx = self._idx.copia()
+        clientes = self.clientes.copy(deep=False)
+        clientes['Status'] = clientes['Status'].copy()
+        clientes['Ultima_Interacao'] = clientes['Ultima_Interacao'].copy()
+        col = clientes.columns.get_loc('Ultima_Interacao')
+        pos = []
+        for key, data, tipo in zip(inter['KEY_DOC'], inter['Data_Obj'], inter['Tipo']):
+            idx.registrar(clientes, key, data, tipo, self.dia)
+            p = idx.linhas.get(key)
+            if p is None: continue
+            pos.append(p)
+            atual = clientes['Ultima_Interacao'].iloc[p]
+            if pd.notna(data): clientes.iloc[p, col] = atual.where(atual >= data, data).to_numpy()
+        novo.clientes = clientes
+        if not pos: return novo
+        afetados = set(clientes['Ultimo_Vendedor'].iloc[np.concatenate(pos)].tolist())
+        parcial = _filas(clientes, {v: self._linhas[v] for v in afetados if v in self._linhas})
+        novo.filas = {}
+        for status, por_vend in self.filas.items():
+            por_vend = {v: f for v, f in por_vend.items() if v not in afetados}
+            por_vend.update(parcial[status])
+            novo.filas[status] = por_vend
+        return novo
+
+    def carteira(self, carts):
+        # Clientes dos vendedores da carteira, na ordem da base
+        if "TODOS" in carts or self.clientes.empty: return self.clientes
+        pos = [self._linhas[v] for v in carts if v in self._linhas]
+        return self.clientes.iloc[np.sort(np.concatenate(pos))] if pos else self.clientes.iloc[0:0]
+
+    def fila(self, status, vendedor):
+        return self.filas[status].get(vendedor, self.clientes.iloc[0:0])
+
+    def meta(self, vendedor=None):
+        # Realizado do mês de um vendedor (None = time todo); zerado para quem não tem interação no mês
+        return self.metas.get(vendedor) or {c: 0 for c in COLUNAS_PLACAR}
+
+
+class Agendador:
+    # Thread do processo que mantém o Quadro atual: remonta na virada do dia e quando a base
+    # muda de um jeito que não dá para seguir ponto a ponto (recarga, leads, importações grandes),
+    # e publica trocando a referência. As interações gravadas entram na hora pelo aviso da base
+    # (`_acompanhar`), sem esperar a thread. `avisar()` acorda a thread na hora (ex.: depois do
+    # "Atualizar"); `hoje` é injetável.
+    def __init__(self, base, intervalo=INTERVALO, hoje=date.today, iniciar=True):
+        self.base = base
+        self._intervalo = intervalo
+        self._hoje = hoje
+        self._lock = threading.Lock()
+        # Só para trocar o Quadro publicado; nunca segurado ao pedir o lock da base
+        self._lock_quadro = threading.Lock()
+        self._evento = threading.Event()
+        self._quadro = None
+        # Versões da base publicadas enquanto um Quadro é montado (None fora de atualizar)
+        self._novas = None
+        self.versao = 0
+        self.falhas = 0
+        self.ultimo_erro = None
+        base.ouvir(self._acompanhar)
+        self.atualizar()
+        self._thread = threading.Thread(target=self._trabalhar, daemon=True)
+        if iniciar: self._thread.start()
+
+    def quadro(self):
+        return self._quadro
+
+    def avisar(self):
+        self._evento.set()
+
+    def vencido(self):
+        q = self._quadro
+        return q is None or q.dia != self._hoje() or q.versao_status != self.base.versao
+
+    def _acompanhar(self, versao_base, inter):
+        # Aviso da base (sob o lock dela) a cada versão publicada: `inter` são as interações
+        # aplicadas ponto a ponto, ou None quando a base foi recalculada e o Quadro precisa ser remontado
+        with self._lock_quadro:
+            if self._novas is not None: self._novas.append((versao_base, inter))
+            q = self._quadro
+            if inter is None or q is None or q.versao_status != versao_base - 1:
+                self._evento.set()
+                return
+            self._publicar(q.seguir(self.versao + 1, versao_base, inter))
+
+    def _publicar(self, q):
+        self.versao = q.versao
+        self._quadro = q
+
+    @METRICAS.cronometrar('agendador.quadro')
+    def atualizar(self):
+        # Monta fora do lock da base (sobre uma cópia dos clientes) e publica de uma vez, já com
+        # o que foi gravado durante a montagem
+        with self._lock:
+            with self._lock_quadro: self._novas = []
+            try:
+                versao_base, clientes, inter = self.base.retrato()
+                novo = Quadro(self.versao + 1, versao_base, self._hoje(), clientes, inter)
+                with self._lock_quadro:
+                    novo.versao = self.versao + 1
+                    for versao, df in self._novas:
+                        if versao <= novo.versao_status: continue
+                        if df is None or versao != novo.versao_status + 1:
+                            self._evento.set()
+                            break
+                        novo = novo.seguir(novo.versao, versao, df)
+                    self._publicar(novo)
+            finally:
+                with self._lock_quadro: self._novas = None
+        return novo
+
+    def _trabalhar(self):
+        while True:
+            self._evento.wait(self._intervalo)
+            self._evento.clear()
+            if not self.vencido(): continue
+            try:
+                self.atualizar()
+                self.ultimo_erro = None
+            except Exception as e:
+                self.falhas += 1
+                METRICAS.contar('agendador.erros')
+                self.ultimo_erro = f"{type(e).__name__}: {e}"
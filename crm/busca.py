@@ -0,0 +1,87 @@
+import re
+import unicodedata
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from crm.helpers import limpar_doc
+from crm.metricas import METRICAS
+
+TAMANHO_PAGINA = 100
+_ACENTOS = '[\u0300-\u036f]'
+
+
+def normalizar(texto):
+    # Caixa alta, sem acentos e com espaços simples ("  José  d'Ávila" -> "JOSE D'AVILA")
+    if pd.isna(texto): return ''
+    return ' '.join(re.sub(_ACENTOS, '', unicodedata.normalize('NFKD', str(texto))).upper().split())
+
+
+def normalizar_serie(s):
+    # normalizar para uma coluna inteira
+    s = s.astype(object).where(s.notna(), '').astype(str)
+    return s.str.normalize('NFKD').str.replace(_ACENTOS, '', regex=True).str.upper().str.split().str.join(' ')
+
+
+def _trigramas(texto):
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+class IndiceBusca:
+    # Índice de busca da base de clientes, montado uma vez por df_cli (a base recria quando
+    # o df_cli é trocado). Nomes normalizados e documentos (só dígitos) vão para índices de
+    # trigramas: um termo com 3+ caracteres só confere os candidatos que têm todos os
+    # trigramas dele. Resultados são rótulos do df_cli (RangeIndex), que valem também para
+    # as visões por carteira, que são filtros dele.
+    def __init__(self, df_cli):
+        vazio = df_cli.empty
+        self.rotulos = df_cli.index.to_numpy()
+        self.nomes = [] if vazio else normalizar_serie(df_cli['Nome_Fantasia']).tolist()
+        # Dígitos do documento como foi digitado (KEY_DOC é numérico e perde zeros à esquerda)
+        self.docs = [] if vazio else df_cli['ID_Cliente_CNPJ_CPF'].astype(str).str.replace(r'\D', '', regex=True).tolist()
+        self._tri_nomes = self._indexar(self.nomes)
+        self._tri_docs = self._indexar(self.docs)
+        # Primeira linha de cada ID, como o .iloc[0] da seleção fazia
+        self.por_id = {}
+        if not vazio:
+            for r, i in zip(self.rotulos, df_cli['ID_Cliente_CNPJ_CPF'].astype(str)): self.por_id.setdefault(i, r)
+
+    @staticmethod
+    def _indexar(textos):
+        idx = defaultdict(list)
+        for p, t in enumerate(textos):
+            for g in {t[i:i + 3] for i in range(len(t) - 2)}: idx[g].append(p)
+        return {g: np.array(v) for g, v in idx.items()}
+
+    @staticmethod
+    def _procurar(termo, textos, tri):
+        if not termo: return np.empty(0, dtype=int)
+        if len(termo) < 3: cand = range(len(textos))  # termo curto demais para o índice
+        else:
+            listas = [tri.get(g) for g in _trigramas(termo)]
+            if any(l is None for l in listas): return np.empty(0, dtype=int)
+            listas.sort(key=len)
+            cand = listas[0]
+            for l in listas[1:]: cand = np.intersect1d(cand, l, assume_unique=True)
+        return np.array([p for p in cand if termo in textos[p]], dtype=int)
+
+    @METRICAS.cronometrar('busca')
+    def buscar(self, termo):
+        # Rótulos (em ordem) dos clientes cujo nome contém o termo, ignorando acentos e caixa,
+        # ou cujo documento contém os dígitos do termo
+        pos = np.union1d(self._procurar(normalizar(termo), self.nomes, self._tri_nomes),
+                         self._procurar(limpar_doc(termo), self.docs, self._tri_docs))
+        return self.rotulos[pos]
+
+    def linha(self, id_cliente):
+        return self.por_id.get(str(id_cliente))
+
+
+def paginas(n, tamanho=TAMANHO_PAGINA):
+    return max(1, -(-n // tamanho))
+
+
+def paginar(df, pagina, tamanho=TAMANHO_PAGINA):
+    # Linhas da página `pagina` (começando em 1)
+    return df.iloc[(pagina - 1) * tamanho:pagina * tamanho]
@@ -0,0 +1,184 @@
+import copy
+
+import pandas as pd
+from gspread.utils import numericise_all, rowcol_to_a1
+
+from crm.esquema import chaves_doc, tipar_clientes, tipar_interacoes
+from crm.helpers import extrair_ids, extrair_pedidos, limpar_int, limpar_int_serie
+from crm.metricas import METRICAS
+
+COLUNAS_INT = ['CNPJ_Cliente','KEY_DOC','Data','Tipo','Resumo','Vendedor','Valor_Proposta','Data_Obj','Nome_Cliente','ID_Proposta','Pedido']
+
+
+def registros(cabecalho, linhas):
+    # Mesmo resultado do get_all_records (linhas completadas com "" e números convertidos)
+    n = len(cabecalho)
+    return [dict(zip(cabecalho, numericise_all((l + [''] * (n - len(l)))[:n]))) for l in linhas]
+
+
+# --- LIMPEZA POR ABA ---
+@METRICAS.cronometrar('limpeza.config')
+def limpar_config(regs):
+    df_cfg = pd.DataFrame(regs).astype(str)
+    for c in ['Meta_Fat','Meta_Clientes','Meta_Atividades']:
+        if c in df_cfg.columns: df_cfg[c] = df_cfg[c].apply(limpar_int)
+    if 'Usuario' in df_cfg.columns:
+        df_cfg['Usuario'] = df_cfg['Usuario'].str.strip().str.upper()
+    return df_cfg
+
+
+@METRICAS.cronometrar('limpeza.clientes')
+def limpar_clientes(regs):
+    df_cli = pd.DataFrame(regs)
+    if not df_cli.empty:
+        df_cli.columns = df_cli.columns.str.strip()
+        df_cli['ID_Cliente_CNPJ_CPF'] = df_cli['ID_Cliente_CNPJ_CPF'].astype(str)
+        df_cli['KEY_DOC'] = chaves_doc(df_cli['ID_Cliente_CNPJ_CPF'])
+        if 'Ultimo_Vendedor' in df_cli.columns:
+            df_cli['Ultimo_Vendedor'] = df_cli['Ultimo_Vendedor'].astype(str).str.strip().str.upper()
+        if 'Total_Compras' in df_cli.columns: df_cli['Total_Compras'] = limpar_int_serie(df_cli['Total_Compras'])
+        if 'Data_Ultima_Compra' in df_cli.columns: df_cli['Data_Ultima_Compra'] = pd.to_datetime(df_cli['Data_Ultima_Compra'], dayfirst=True, errors='coerce')
+    return tipar_clientes(df_cli)
+
+
+@METRICAS.cronometrar('limpeza.leads')
+def limpar_leads(regs):
+    df_leads = pd.DataFrame(regs).astype(str)
+    if not df_leads.empty:
+        df_leads['KEY_DOC'] = chaves_doc(df_leads['ID_Cliente_CNPJ_CPF'])
+        if 'Vendedor' in df_leads.columns: df_leads['Vendedor'] = df_leads['Vendedor'].str.strip().str.upper()
+        # Mesmos tipos da aba Clientes, senão a data vazia do lead quebra o cálculo de status
+        if 'Total_Compras' in df_leads.columns: df_leads['Total_Compras'] = limpar_int_serie(df_leads['Total_Compras'])
+        if 'Data_Ultima_Compra' in df_leads.columns: df_leads['Data_Ultima_Compra'] = pd.to_datetime(df_leads['Data_Ultima_Compra'], dayfirst=True, errors='coerce')
+    return tipar_clientes(df_leads)
+
+
+def mapa_nomes(df_cli):
+    # Nome_Fantasia por KEY_DOC (vale o último cadastro do documento), para preencher o Nome_Cliente
+    if df_cli.empty or 'KEY_DOC' not in df_cli.columns: return pd.Series(dtype=object)
+    nomes = pd.Series(df_cli['Nome_Fantasia'].to_numpy(), index=pd.Index(df_cli['KEY_DOC']))
+    return nomes[nomes.index.notna() & ~nomes.index.duplicated(keep='last')]
+
+
+@METRICAS.cronometrar('limpeza.interacoes')
+def limpar_interacoes(regs, nomes):
+    # `nomes`: mapa_nomes da carteira (montado uma vez, não a cada linha gravada). Aba só com o
+    # cabeçalho: frame vazio com as colunas de sempre (o Quadro e os filtros usam Data_Obj e KEY_DOC)
+    df_int = pd.DataFrame(regs) if regs else pd.DataFrame(columns=COLUNAS_INT)
+    if not df_int.empty:
+        if 'Valor_Proposta' in df_int.columns: df_int['Valor_Proposta'] = df_int['Valor_Proposta'].apply(limpar_int)
+        if 'Data' in df_int.columns: df_int['Data_Obj'] = pd.to_datetime(df_int['Data'], dayfirst=True, errors='coerce')
+        df_int['CNPJ_Cliente'] = df_int['CNPJ_Cliente'].astype(str)
+        # #ID da proposta e pedido do Protheus citados no Resumo, extraídos uma vez só
+        if 'Resumo' in df_int.columns:
+            df_int['ID_Proposta'] = extrair_ids(df_int['Resumo'])
+            df_int['Pedido'] = extrair_pedidos(df_int['Resumo'])
+        df_int['KEY_DOC'] = chaves_doc(df_int['CNPJ_Cliente'])
+        if 'Vendedor' in df_int.columns: df_int['Vendedor'] = df_int['Vendedor'].astype(str).str.strip().str.upper()
+
+        if 'Nome_Cliente' not in df_int.columns: df_int['Nome_Cliente'] = None
+        mask_n = df_int['Nome_Cliente'].isna() | (df_int['Nome_Cliente'] == "")
+        df_int.loc[mask_n, 'Nome_Cliente'] = df_int.loc[mask_n, 'KEY_DOC'].map(nomes).fillna("Cliente Carteira")
+    return tipar_interacoes(df_int)
+
+
+def chave_eco(df, aba):
+    # Identifica uma linha gravada por este processo quando ela volta na leitura incremental
+    if df.empty: return []
+    # Zeros à esquerda se perdem na leitura da planilha (o documento vira número)
+    docs = df['KEY_DOC'].astype(str).str.lstrip('0')
+    if aba == 'Novos_Leads':
+        return list(zip(docs, df['Nome_Fantasia'].astype(str)))
+    datas = pd.to_datetime(df['Data_Obj'], errors='coerce').dt.strftime('%d/%m/%Y').fillna('')
+    return list(zip(docs, datas, df['Tipo'].astype(str), df['Resumo'].astype(str), df['Vendedor'], df['Valor_Proposta']))
+
+
+# --- SINCRONIZAÇÃO ---
+def _sem_vazios_finais(linha):
+    linha = list(linha)
+    while linha and linha[-1] == '': linha.pop()
+    return linha
+
+
+class SincronizadorPlanilha:
+    # Lê as abas da planilha guardando, por aba, o cabeçalho e quantas linhas já foram lidas.
+    # `conectar()` devolve a planilha (gspread.Spreadsheet ou qualquer objeto com
+    # worksheet(titulo) cujas abas tenham get/batch_get), ou None se não houver conexão.
+    def __init__(self, conectar):
+        self._conectar = conectar
+        self.estado = {}
+
+    def planilha(self):
+        ss = self._conectar()
+        if not ss: raise ConnectionError("Sem conexão com a planilha")
+        return ss
+
+    @METRICAS.cronometrar('leitura.completa')
+    def ler_completo(self, ss, aba):
+        valores = ss.worksheet(aba).get(pad_values=True)
+        if not valores or valores == [[]]:
+            self.estado[aba] = {'cabecalho': [], 'linhas': 0}
+            return []
+        self.estado[aba] = {'cabecalho': valores[0], 'linhas': len(valores) - 1}
+        return registros(valores[0], valores[1:])
+
+    @METRICAS.cronometrar('leitura.incremental')
+    def ler_novos(self, ss, aba):
+        # Só as linhas depois da última lida, numa única chamada junto com o cabeçalho.
+        # Retorna None se o cabeçalho mudou (ou a aba nunca foi lida): aí é preciso recarga completa.
+        est = self.estado.get(aba)
+        if not est: return None
+        if not est['cabecalho']: return self.ler_completo(ss, aba)  # aba vazia: ler tudo é barato
+        ultima_col = rowcol_to_a1(1, len(est['cabecalho'])).rstrip('0123456789')
+        cab, novas = ss.worksheet(aba).batch_get(['1:1', f"A{est['linhas'] + 2}:{ultima_col}"])
+        if _sem_vazios_finais(cab[0] if cab else []) != _sem_vazios_finais(est['cabecalho']): return None
+        est['linhas'] += len(novas)
+        return registros(est['cabecalho'], novas)
+
+    # Carga completa das quatro abas, com o mesmo tratamento de falha por aba de antes
+    def carregar_tudo(self):
+        ss = self.planilha()
+
+        try: df_cfg = limpar_config(self.ler_completo(ss, "Config_Equipe"))
+        except Exception: df_cfg = pd.DataFrame()
+
+        try: df_cli = limpar_clientes(self.ler_completo(ss, "Clientes"))
+        except Exception: df_cli = pd.DataFrame()
+
+        try:
+            df_leads = limpar_leads(self.ler_completo(ss, "Novos_Leads"))
+            if not df_leads.empty: df_cli = tipar_clientes(pd.concat([df_cli, df_leads], ignore_index=True))
+        except Exception: pass
+
+        try: df_int = limpar_interacoes(self.ler_completo(ss, "Interacoes"), mapa_nomes(df_cli))
+        except Exception: df_int = pd.DataFrame(columns=COLUNAS_INT)
+
+        return df_cfg, df_cli, df_int
+
+    def carregar_clientes(self):
+        # Só a carteira (Clientes + Novos_Leads), sem reler as interações: depois de uma
+        # importação de clientes
+        ss = self.planilha()
+        df_cli = limpar_clientes(self.ler_completo(ss, "Clientes"))
+        df_leads = limpar_leads(self.ler_completo(ss, "Novos_Leads"))
+        return tipar_clientes(pd.concat([df_cli, df_leads], ignore_index=True)) if not df_leads.empty else df_cli
+
+    def carregar_novos(self, nomes):
+        # Novos_Leads e Interacoes só recebem linhas no final e são lidas de forma incremental;
+        # Config_Equipe é pequena e relida inteira; Clientes só muda na carga completa.
+        # `nomes` é o mapa_nomes da carteira atual. Retorna None quando alguma aba incremental
+        # exige recarga completa.
+        ss = self.planilha()
+        anterior = copy.deepcopy(self.estado)
+        try:
+            leads, ints = self.ler_novos(ss, "Novos_Leads"), self.ler_novos(ss, "Interacoes")
+            if leads is None or ints is None: return None
+            df_cfg = limpar_config(self.ler_completo(ss, "Config_Equipe"))
+        except Exception:
+            self.estado = anterior  # nada lido é descartado se a sincronização falhar no meio
+            raise
+        df_leads = limpar_leads(leads)
+        if not df_leads.empty:
+            nomes = pd.concat([nomes, mapa_nomes(df_leads)])
+            nomes = nomes[~nomes.index.duplicated(keep='last')]
+        return df_cfg, df_leads, limpar_interacoes(ints, nomes)
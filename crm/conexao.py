@@ -0,0 +1,108 @@
+import threading
+import time
+from collections import defaultdict
+
+import gspread
+import requests
+from google.auth.exceptions import GoogleAuthError
+
+# Leituras podem ser repetidas com segurança depois de reconectar; escritas não
+# (o append pode ter chegado na planilha antes da falha) e voltam o erro para quem chamou.
+LEITURAS = {'get', 'batch_get', 'get_all_records', 'get_all_values', 'row_values', 'col_values'}
+
+
+def _reconectar_resolve(e):
+    if isinstance(e, gspread.exceptions.APIError):
+        return getattr(e.response, 'status_code', None) in (401, 403)
+    return isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout, GoogleAuthError))
+
+
+class ClienteSheets:
+    # Conexão única com a planilha, reaproveitada por todo o processo (carga, sincronização,
+    # fila e importação). Autoriza e abre a planilha uma vez, guarda as abas por título e
+    # reconecta quando a sessão cai ou o token é recusado. O token em si é renovado pela
+    # sessão do google-auth. Cada chamada à API é contada e cronometrada por operação.
+    def __init__(self, credenciais, nome=None, chave=None, autorizar=gspread.authorize):
+        self._credenciais = credenciais
+        self._nome = nome
+        self._chave = chave
+        self._autorizar = autorizar
+        self._lock = threading.RLock()
+        self._ss = None
+        self._abas = {}
+        self._stats = defaultdict(lambda: {'chamadas': 0, 'erros': 0, 'total_s': 0.0, 'max_s': 0.0})
+
+    # --- CONEXÃO ---
+    def conectar(self):
+        # Devolve o próprio cliente, que se comporta como a planilha (worksheet(titulo))
+        self._planilha()
+        return self
+
+    def _planilha(self):
+        with self._lock:
+            if self._ss is None:
+                gc = self._medir('autorizar', lambda: self._autorizar(self._credenciais()))
+                # Abrir pelo nome custa uma busca extra no Drive; depois da primeira vez usa o id
+                if self._chave: self._ss = self._medir('abrir', lambda: gc.open_by_key(self._chave))
+                else: self._ss = self._medir('abrir', lambda: gc.open(self._nome))
+                self._chave = getattr(self._ss, 'id', None) or self._chave
+            return self._ss
+
+    def reconectar(self):
+        with self._lock:
+            self._ss = None
+            self._abas.clear()
+
+    def _aba(self, titulo):
+        with self._lock:
+            if titulo not in self._abas:
+                ss = self._planilha()
+                self._abas[titulo] = self._medir(f"{titulo}.abrir", lambda: ss.worksheet(titulo))
+            return self._abas[titulo]
+
+    def worksheet(self, titulo):
+        return _AbaInstrumentada(self, titulo)
+
+    # --- INSTRUMENTAÇÃO ---
+    def _medir(self, op, fn):
+        ini = time.perf_counter()
+        try: return fn()
+        except Exception:
+            with self._lock: self._stats[op]['erros'] += 1
+            raise
+        finally:
+            dur = time.perf_counter() - ini
+            with self._lock:
+                st = self._stats[op]
+                st['chamadas'] += 1
+                st['total_s'] += dur
+                st['max_s'] = max(st['max_s'], dur)
+
+    def estatisticas(self):
+        with self._lock:
+            return {op: dict(st, media_ms=st['total_s'] / st['chamadas'] * 1000 if st['chamadas'] else 0.0)
+                    for op, st in self._stats.items()}
+
+
+class _AbaInstrumentada:
+    # Repassa as chamadas para o worksheet do gspread, medindo cada uma e reconectando
+    # (com uma nova tentativa, no caso de leituras) quando a conexão falha.
+    def __init__(self, cliente, titulo):
+        self._cliente = cliente
+        self.title = titulo
+
+    def __getattr__(self, nome):
+        if not callable(getattr(self._cliente._aba(self.title), nome)):
+            return getattr(self._cliente._aba(self.title), nome)
+
+        def chamar(*args, **kwargs):
+            op = f"{self.title}.{nome}"
+            for tentativa in (1, 2):
+                try:
+                    ws = self._cliente._aba(self.title)
+                    return self._cliente._medir(op, lambda: getattr(ws, nome)(*args, **kwargs))
+                except Exception as e:
+                    if not _reconectar_resolve(e): raise
+                    self._cliente.reconectar()
+                    if tentativa == 2 or nome not in LEITURAS: raise
+        return chamar
@@ -0,0 +1,458 @@
+import threading
+import time
+from collections import Counter
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from crm.busca import IndiceBusca
+from crm.carga import chave_eco, limpar_interacoes, limpar_leads, mapa_nomes, registros
+from crm.esquema import anexar, relatorio_memoria, tipar_clientes, tipar_interacoes
+from crm.importacao import atualizar_clientes
+from crm.indicadores import COLUNAS_PLACAR, IndicePropostas, periodo, placar_vendedores
+from crm.metricas import METRICAS
+from crm.motor import ordem_data, recalcular_status_massa, IndiceStatus
+from crm.snapshot import carregar_snapshot, salvar_snapshot
+
+# Acima disso (ex.: importação do Protheus) recalcular o status de todos sai mais barato
+# que atualizar cliente a cliente
+LOTE_RECALCULO = 1000
+# Linhas recentes do log guardadas à parte para as visões acompanharem as gravações
+MAX_RECENTES = 20000
+
+
+def _ordenado(df):
+    # Log ordenado por Data_Obj (datetime64), datas vazias no fim. O sort é estável: entre
+    # datas iguais vale a ordem de registro, a mesma usada no desempate do status.
+    if 'Data_Obj' not in df.columns: return df
+    if df['Data_Obj'].dtype == object: df = df.assign(Data_Obj=pd.to_datetime(df['Data_Obj'], errors='coerce'))
+    ordem = ordem_data(df['Data_Obj'])
+    if (ordem[1:] >= ordem[:-1]).all(): return df
+    return df.iloc[np.argsort(ordem, kind='stable')].reset_index(drop=True)
+
+
+def _juntar(df, novas):
+    # Acrescenta linhas a um pedaço ordenado do log mantendo a ordem por data
+    return _ordenado(tipar_interacoes(anexar(df, _ordenado(novas))))
+
+
+class LogInteracoes:
+    # Log de interações com buffer de append: cada gravação entra numa lista e o
+    # DataFrame só é consolidado (um único concat) quando alguém lê o log inteiro. O log
+    # fica sempre ordenado por data, para que os filtros de período sejam buscas binárias
+    # (ver indicadores.periodo); só é reordenado quando chega uma linha com data anterior.
+    # `total` conta as linhas já registradas; as últimas gravações ficam também em
+    # `_recentes`, para quem guarda um pedaço do log pegar só o que chegou depois (desde).
+    def __init__(self, df):
+        self._df = _ordenado(df)
+        self._buffer = []
+        self._recentes = []
+        self.total = len(self._df)
+
+    def registrar_lote(self, df):
+        self._buffer.append(df)
+        self._recentes.append((self.total, df))
+        self.total += len(df)
+        while len(self._recentes) > 1 and self.total - self._recentes[1][0] >= MAX_RECENTES: self._recentes.pop(0)
+
+    def desde(self, n):
+        # Linhas registradas depois das n primeiras, na ordem de registro (None se já saíram de _recentes)
+        if n == self.total: return self._df.iloc[0:0]
+        if not self._recentes or self._recentes[0][0] > n: return None
+        partes = [df for pos, df in self._recentes if pos >= n]
+        return pd.concat(partes, ignore_index=True) if len(partes) > 1 else partes[0]
+
+    def frame(self):
+        if self._buffer:
+            self._df = _juntar(self._df, pd.concat(self._buffer, ignore_index=True))
+            self._buffer = []
+        return self._df
+
+
+class BaseCompartilhada:
+    # Dados únicos do processo (instanciada via st.cache_resource). As sessões só leem
+    # os frames daqui e toda gravação passa pelos métodos abaixo, sob o mesmo lock.
+    # Cada alteração gera uma nova `versao`; as visões por carteira são recriadas
+    # sob demanda e compartilhadas entre as sessões com a mesma carteira.
+    #
+    # Com `pasta_snapshot`, os frames já limpos são gravados em disco (Arrow) após
+    # cada carga; num restart a base sobe direto do snapshot e se reconcilia com a
+    # planilha em segundo plano.
+    #
+    # `fila` recebe as linhas gravadas (FilaEscrita ou EscritaDireta); a base aplica
+    # a linha localmente na hora, sem esperar a planilha.
+    def __init__(self, sinc, fila, ttl=3600, pasta_snapshot=None, intervalo_snapshot=300):
+        self._sinc = sinc
+        self._fila = fila
+        self._ttl = ttl
+        self._pasta_snapshot = pasta_snapshot
+        self._intervalo_snapshot = intervalo_snapshot
+        self._lock = threading.RLock()
+        self._lock_carga = threading.Lock()
+        self._thread = None
+        self._visoes = {}
+        self._partes = {}
+        self._historicos = {}
+        self._placares = {}
+        self._busca = None
+        self._nomes = None
+        # Linhas gravadas por este processo que ainda vão aparecer na próxima leitura incremental
+        self._ecos = Counter()
+        # Linhas gravadas durante uma releitura da planilha (None fora dela), ver _reler
+        self._gravadas = None
+        # Chamados a cada versão publicada (ver ouvir)
+        self._ouvintes = []
+        self.versao = 0
+        self.carregado_em = 0
+        self.snapshot_gravado_em = 0
+        if pasta_snapshot and self._abrir_snapshot(): self._em_segundo_plano(self._reconciliar)
+        else: self.recarregar()
+
+    def _instalar(self, cfg, cli, inter, recarga=False):
+        # Tudo montado fora do lock; sob o lock só a troca (e, na recarga, o que foi gravado durante ela)
+        if not cli.empty: cli = recalcular_status_massa(cli, inter)
+        log, idx_status, idx_propostas = LogInteracoes(inter), IndiceStatus(cli, inter), IndicePropostas(inter)
+        with self._lock:
+            self.df_cfg, self.df_cli = cfg, cli
+            self.log, self.idx_status, self.idx_propostas = log, idx_status, idx_propostas
+            self._partes = {}  # pedaços do log anterior
+            self._publicar()
+            if recarga:
+                self._ecos.clear()
+                self._reaplicar(('Novos_Leads', 'Interacoes'), {'Novos_Leads': cli, 'Interacoes': inter})
+                self.carregado_em = time.time()
+
+    @METRICAS.cronometrar('carga.completa')
+    def recarregar(self):
+        # O lock de carga só impede duas cargas ao mesmo tempo: as gravações não esperam o download
+        with self._lock_carga:
+            try: frames = self._reler(self._sinc.carregar_tudo)
+            except ConnectionError:
+                METRICAS.contar('carga.erros')
+                # Sem conexão: mantém o que já está carregado (ou o snapshot) e tenta de novo depois
+                if not self.versao: self._instalar(pd.DataFrame(), pd.DataFrame(), pd.DataFrame())
+                return
+            self._instalar(*frames, recarga=True)
+            METRICAS.contar('carga.completa')
+            self._gravar_snapshot()
+
+    def _reler(self, ler):
+        # Leitura longa da planilha fora do lock da base: as gravações seguem e ficam anotadas
+        # em _gravadas, para _reaplicar por cima do que foi lido
+        with self._lock: self._gravadas = []
+        try: return ler()
+        except BaseException:
+            with self._lock: self._gravadas = None
+            raise
+
+    def _reaplicar(self, abas, lidos):
+        # Depois de uma releitura (sob o lock): o que ainda está na fila não chegou na planilha e
+        # volta por cima; o que foi gravado durante a leitura e já enviado só volta se a leitura
+        # (`lidos`: frame relido por aba) não o trouxe. As duas viram eco da próxima sincronização.
+        pendentes = [(a, l) for a, l in self._fila.pendentes() if a in abas]
+        na_fila = Counter((a, tuple(l)) for a, l in pendentes)
+        enviadas = []
+        for a, l in self._gravadas or []:
+            if a not in abas: continue
+            if na_fila[(a, tuple(l))] > 0: na_fila[(a, tuple(l))] -= 1
+            else: enviadas.append((a, l))
+        self._gravadas = None
+        for aba in abas:
+            linhas = self._nao_lidas(aba, [l for a, l in enviadas if a == aba], lidos[aba])
+            linhas += [l for a, l in pendentes if a == aba]
+            if linhas: self._aplicar_local(aba, linhas)
+
+    def _nao_lidas(self, aba, linhas, lido):
+        # Das linhas gravadas, as que não estão no frame relido (comparadas pela chave de eco)
+        df = self._limpar(aba, linhas) if linhas else None
+        if df is None or df.empty: return []
+        chaves = chave_eco(df, aba)
+        if lido.empty: return linhas
+        docs = lido['KEY_DOC'].astype(str).str.lstrip('0')
+        presentes = Counter(chave_eco(lido[docs.isin({c[0] for c in chaves}).to_numpy()], aba))
+        faltam = []
+        for linha, chave in zip(linhas, chaves):
+            if presentes[chave] > 0: presentes[chave] -= 1
+            else: faltam.append(linha)
+        return faltam
+
+    # --- SNAPSHOT ---
+    def _abrir_snapshot(self):
+        snap = carregar_snapshot(self._pasta_snapshot)
+        if not snap: return False
+        frames, meta = snap
+        self._instalar(*frames)
+        self._sinc.estado = meta['estado']
+        self._ecos = Counter({(aba, tuple(chave)): n for aba, chave, n in meta['ecos']})
+        self.carregado_em = meta['carregado_em']
+        self.snapshot_gravado_em = meta['gravado_em']
+        with self._lock: self._reaplicar_diario()
+        return True
+
+    def _reaplicar_diario(self):
+        # O que ficou no diário da fila ainda não chegou na planilha e volta por cima do snapshot
+        # (vira eco da próxima sincronização). O que já estava aplicado quando o snapshot foi
+        # gravado tem o eco guardado junto e não é aplicado de novo.
+        ecos = Counter(self._ecos)
+        pendentes = self._fila.pendentes()
+        for aba in ('Novos_Leads', 'Interacoes'):
+            linhas = [l for a, l in pendentes if a == aba]
+            df = self._limpar(aba, linhas) if linhas else None
+            if df is None or df.empty: continue
+            faltam = []
+            for linha, chave in zip(linhas, chave_eco(df, aba)):
+                if ecos[(aba, chave)] > 0: ecos[(aba, chave)] -= 1
+                else: faltam.append(linha)
+            if faltam: self._aplicar_local(aba, faltam)
+
+    def _gravar_snapshot(self, forcar=True):
+        if not self._pasta_snapshot: return
+        if not forcar and time.time() - self.snapshot_gravado_em < self._intervalo_snapshot: return
+        with self._lock:
+            frames = (self.df_cfg, self.df_cli, self.log.frame())
+            meta = {'estado': self._sinc.estado, 'carregado_em': self.carregado_em,
+                    'ecos': [[aba, list(chave), n] for (aba, chave), n in self._ecos.items()]}
+        try:
+            with METRICAS.medir('snapshot'): salvar_snapshot(self._pasta_snapshot, frames, meta)
+            self.snapshot_gravado_em = time.time()
+        except OSError: pass  # sem disco gravável o app segue só com a planilha
+
+    def _reconciliar(self):
+        try:
+            if time.time() - self.carregado_em > self._ttl: self.recarregar()
+            else: self.sincronizar()
+        except Exception: METRICAS.contar('sincronizacao.erros')  # segue com os dados atuais; a próxima tenta de novo
+
+    def _em_segundo_plano(self, fn):
+        with self._lock:
+            if self._thread and self._thread.is_alive(): return
+            self._thread = threading.Thread(target=fn, daemon=True)
+            self._thread.start()
+
+    @METRICAS.cronometrar('sincronizacao')
+    def sincronizar(self):
+        # Lê só as linhas novas das abas incrementais; cai na recarga completa se o
+        # cabeçalho de alguma aba mudou.
+        # Lida fora do lock da base: uma linha gravada enquanto isso já é eco quando o resultado
+        # é aplicado, e sai dele em _sem_ecos se a leitura a trouxe.
+        with self._lock_carga:
+            novos = self._sinc.carregar_novos(self.nomes)
+            if novos is not None:
+                cfg, leads, ints = novos
+                METRICAS.contar('sincronizacao')
+                METRICAS.contar('sincronizacao.linhas', len(leads) + len(ints))
+                with self._lock:
+                    self.df_cfg = cfg
+                    leads = self._sem_ecos(leads, 'Novos_Leads')
+                    self._aplicar_leads(leads)
+                    ints = self._aplicar_interacoes(self._sem_ecos(ints, 'Interacoes'))
+                    self._publicar(ints if leads.empty else None)
+                self._gravar_snapshot(forcar=False)
+                return
+        self.recarregar()
+
+    def garantir_atualizado(self):
+        # Recarga completa vencida roda em segundo plano; as sessões seguem com os dados atuais
+        if time.time() - self.carregado_em > self._ttl: self._em_segundo_plano(self._reconciliar)
+
+    def ouvir(self, fn):
+        # fn(versao, interacoes) a cada versão publicada, sob o lock da base (deve ser rápido):
+        # `interacoes` são as aplicadas ponto a ponto, ou None se o status foi recalculado por inteiro
+        self._ouvintes.append(fn)
+
+    def _publicar(self, interacoes=None):
+        self.versao += 1
+        self._visoes = {}
+        self._historicos = {}
+        self._placares = {}
+        for fn in self._ouvintes: fn(self.versao, interacoes)
+
+    def _sem_ecos(self, df, aba):
+        if df.empty or not self._ecos: return df
+        manter = []
+        for chave in chave_eco(df, aba):
+            eco = (aba, chave)
+            if self._ecos[eco] > 0:
+                self._ecos[eco] -= 1
+                manter.append(False)
+            else: manter.append(True)
+        self._ecos += Counter()  # descarta contadores zerados
+        return df[manter]
+
+    def _aplicar_leads(self, df_leads):
+        if df_leads.empty: return
+        cli = tipar_clientes(pd.concat([self.df_cli, df_leads], ignore_index=True))
+        inter = self.log.frame()
+        self.df_cli = recalcular_status_massa(cli, inter)
+        self.idx_status = IndiceStatus(self.df_cli, inter)
+
+    def retrato(self):
+        # (versão, cópia dos clientes, log) consistentes entre si, para cálculos fora do lock
+        # (o Status dos clientes da base é alterado no lugar a cada interação gravada)
+        with self._lock: return self.versao, self.df_cli.copy(), self.log.frame()
+
+    def memoria(self):
+        # MB por tabela e por coluna dos frames da base
+        with self._lock:
+            return relatorio_memoria({'Config_Equipe': self.df_cfg, 'Clientes': self.df_cli, 'Interacoes': self.log.frame()})
+
+    @property
+    def df_int(self):
+        with self._lock: return self.log.frame()
+
+    @METRICAS.cronometrar('gravacao')
+    def gravar(self, aba, linha):
+        # `linha` na ordem das colunas da aba, como vai para a planilha. Enfileira e vira eco sob
+        # o mesmo lock, antes que a fila possa enviar a linha: uma sincronização que a leia já a
+        # encontra entre os ecos. Não espera cargas em andamento (ver _reler).
+        with self._lock:
+            self._fila.enfileirar(aba, linha)
+            self._aplicar_gravadas(aba, [linha])
+
+    @METRICAS.cronometrar('gravacao.lote')
+    def gravar_lote(self, aba, linhas):
+        with self._lock:
+            self._fila.enfileirar_lote(aba, linhas)
+            self._aplicar_gravadas(aba, linhas)
+
+    def _aplicar_gravadas(self, aba, linhas):
+        METRICAS.contar(f"gravacao.{aba}", len(linhas))
+        self._aplicar_local(aba, linhas)
+        if self._gravadas is not None: self._gravadas.extend((aba, l) for l in linhas)
+
+    @METRICAS.cronometrar('gravacao.clientes')
+    def gravar_clientes(self, df):
+        # Upsert de clientes (importar_clientes_csv) direto na aba Clientes, sem a fila, que só
+        # acrescenta linhas. Se algo mudou, a carteira é relida da planilha (as interações não
+        # mudam) e o status recalculado. Retorna o relatório de atualizar_clientes.
+        with self._lock_carga:
+            rel = atualizar_clientes(self._sinc.planilha().worksheet("Clientes"), df)
+            if not rel['novos'] and not rel['atualizados']: return rel
+            cli = self._reler(self._sinc.carregar_clientes)
+            with self._lock:
+                inter = self.log.frame()
+                self.df_cli = recalcular_status_massa(cli, inter) if not cli.empty else cli
+                self.idx_status = IndiceStatus(self.df_cli, inter)
+                self._publicar()
+                # Novos_Leads foi relida inteira: os ecos dela já vieram, e o que não veio é reaplicado
+                for eco in [e for e in self._ecos if e[0] == 'Novos_Leads']: del self._ecos[eco]
+                self._reaplicar(('Novos_Leads',), {'Novos_Leads': cli})
+        self._gravar_snapshot()
+        return rel
+
+    def _limpar(self, aba, linhas):
+        # Mesma limpeza da leitura da planilha; None se a aba nunca foi lida
+        cab = self._sinc.estado.get(aba, {}).get('cabecalho')
+        if not cab: return None
+        regs = registros(cab, [[str(v) for v in l] for l in linhas])
+        return limpar_leads(regs) if aba == 'Novos_Leads' else limpar_interacoes(regs, self.nomes)
+
+    def _aplicar_local(self, aba, linhas):
+        # Passa a linha pela mesma limpeza da leitura da planilha e aplica na base
+        df = self._limpar(aba, linhas)
+        if df is None: return  # aba nunca lida: a linha aparece na próxima sincronização
+        self._ecos.update((aba, chave) for chave in chave_eco(df, aba))
+        if aba == 'Novos_Leads':
+            self._aplicar_leads(df)
+            self._publicar()
+        else: self._publicar(self._aplicar_interacoes(df))
+
+    def _aplicar_interacoes(self, df_int):
+        # Devolve as interações aplicadas ponto a ponto (None se o status foi recalculado por inteiro)
+        if df_int.empty: return df_int
+        self.log.registrar_lote(df_int)
+        self.idx_propostas.registrar(df_int)
+        if len(df_int) > LOTE_RECALCULO:
+            inter = self.log.frame()
+            if not self.df_cli.empty: self.df_cli = recalcular_status_massa(self.df_cli, inter)
+            self.idx_status = IndiceStatus(self.df_cli, inter)
+            return None
+        for key, data, tipo in zip(df_int['KEY_DOC'], df_int['Data_Obj'], df_int['Tipo']):
+            self.idx_status.registrar(self.df_cli, key, data, tipo)
+        return df_int
+
+    # --- PLACARES (guardados até a próxima alteração da base) ---
+    def metas_mes(self, vendedores=None, hoje=None):
+        # Realizado no mês (da virada do mês em diante) de um grupo de vendedores (None = todos):
+        # linha TOTAL do placar, com clientes distintos do grupo e não a soma por vendedor
+        hoje = hoje or date.today()
+        chave = ('mes', hoje.year, hoje.month, tuple(sorted(vendedores)) if vendedores is not None else None)
+        with self._lock:
+            METRICAS.cache('metas', chave in self._placares)
+            if chave not in self._placares:
+                mes = ('mes', hoje.year, hoje.month)
+                # Só o mês corrente fica guardado: o anterior sai na virada
+                for velha in [k for k in self._partes if k[0] == 'mes' and k != mes]: del self._partes[velha]
+                df = self._parte_log(mes, lambda d: periodo(d, hoje.replace(day=1)))
+                if vendedores is not None and not df.empty: df = df[df['Vendedor'].isin(vendedores)]
+                placar = placar_vendedores(df, total=True)
+                # Por coluna, para não misturar os tipos numa Series só
+                self._placares[chave] = {c: placar[c].iloc[0] if len(placar) else 0 for c in COLUNAS_PLACAR}
+            return self._placares[chave]
+
+    def placar(self, carts, inicio=None, fim=None):
+        # Placar por vendedor da carteira no período; filtrar vendedores é só selecionar linhas
+        chave = ('placar', tuple(sorted(carts)), inicio, fim)
+        with self._lock:
+            METRICAS.cache('placar', chave in self._placares)
+            if chave not in self._placares:
+                _, df_int = self.carteira(carts)
+                self._placares[chave] = placar_vendedores(periodo(df_int, inicio, fim), self.idx_propostas)
+            return self._placares[chave]
+
+    def carteira(self, carts):
+        chave = tuple(sorted(carts))
+        with self._lock:
+            METRICAS.cache('carteira', chave in self._visoes)
+            if chave not in self._visoes:
+                df_cli = self.df_cli
+                if "TODOS" in carts or df_cli.empty: self._visoes[chave] = (df_cli, self.log.frame())
+                else:
+                    df_int = self._parte_log(('carteira', chave), lambda d: d[d['Vendedor'].isin(carts)])
+                    self._visoes[chave] = (df_cli[df_cli['Ultimo_Vendedor'].isin(carts)], df_int)
+            return self._visoes[chave]
+
+    def _parte_log(self, chave, filtrar):
+        # Pedaço filtrado do log que acompanha as gravações sem consolidar o log inteiro: só as
+        # linhas novas passam pelo filtro e entram no que já estava pronto. Refeito do log todo
+        # quando o log foi trocado (recarga) ou as linhas novas já saíram de LogInteracoes._recentes.
+        log = self.log
+        atual = self._partes.get(chave)
+        novas = log.desde(atual[1]) if atual and atual[0] is log else None
+        if novas is None: df = filtrar(log.frame())
+        elif novas.empty: return atual[2]
+        else:
+            novas = filtrar(_ordenado(novas))
+            df = _juntar(atual[2], novas) if not novas.empty else atual[2]
+        self._partes[chave] = (log, log.total, df)
+        return df
+
+    def historico(self, carts, key_doc):
+        # Interações de um cliente na carteira, pelas posições de cada KEY_DOC (montadas
+        # uma vez por versão) em vez de varrer o log a cada cliente selecionado
+        chave = tuple(sorted(carts))
+        with self._lock:
+            _, df_int = self.carteira(carts)
+            METRICAS.cache('historico', chave in self._historicos)
+            if chave not in self._historicos:
+                self._historicos[chave] = df_int.groupby('KEY_DOC', sort=False).indices if not df_int.empty else {}
+            pos = self._historicos[chave].get(key_doc)
+            return df_int.iloc[pos] if pos is not None else df_int.iloc[0:0]
+
+    @property
+    def nomes(self):
+        # mapa_nomes da carteira, refeito só quando o df_cli é trocado (como o índice de busca)
+        df_cli, atual = self.df_cli, self._nomes
+        if atual is None or atual[0] is not df_cli: atual = self._nomes = (df_cli, mapa_nomes(df_cli))
+        return atual[1]
+
+    @property
+    def busca(self):
+        # Índice de busca de clientes; só é refeito quando o df_cli é trocado (novos leads ou
+        # recarga), não a cada interação, que só altera o Status. Montado fora do lock.
+        df_cli, atual = self.df_cli, self._busca
+        METRICAS.cache('busca', atual is not None and atual[0] is df_cli)
+        if atual is None or atual[0] is not df_cli:
+            with METRICAS.medir('busca.indice'): atual = self._busca = (df_cli, IndiceBusca(df_cli))
+        return atual[1]
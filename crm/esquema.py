@@ -0,0 +1,80 @@
+import pandas as pd
+
+from crm.helpers import limpar_doc
+
+# Status possíveis, em ordem alfabética: a lista da carteira é ordenada por Status e a
+# ordem das categorias precisa ser a mesma da ordenação por texto
+STATUS = sorted(['🆕 NOVO S/ INTERAÇÃO', '🔴 RECUPERAR', '🟢 ATIVO', '⏳ NEGOCIAÇÃO', '⚠️ FOLLOW-UP',
+                 '👎 VENDA PERDIDA', '⭐ VENDA RECENTE'])
+TIPO_STATUS = pd.CategoricalDtype(STATUS)
+
+# Colunas com poucos valores distintos, guardadas como categoria
+CATEGORIAS_CLI = ['Ultimo_Vendedor', 'Tipo_Cliente', 'Vendedor', 'Origem']
+CATEGORIAS_INT = ['Tipo', 'Vendedor']
+
+# Documento com mais dígitos que isso não é CPF/CNPJ (e não cabe em int64)
+_MAX_DIGITOS = 18
+
+
+def chaves_doc(s):
+    # KEY_DOC: dígitos do documento como Int64 (NA quando não há dígitos)
+    dig = s.astype(str).str.replace(r'\D', '', regex=True)
+    return dig.where(dig.str.len().between(1, _MAX_DIGITOS)).astype('Int64')
+
+
+def chave_doc(v):
+    # Mesmo critério de chaves_doc para um valor só
+    d = limpar_doc(v)
+    return int(d) if 0 < len(d) <= _MAX_DIGITOS else None
+
+
+def _categorias(df, colunas):
+    for c in colunas:
+        if c in df.columns and not isinstance(df[c].dtype, pd.CategoricalDtype): df[c] = df[c].astype('category')
+
+
+def tipar_clientes(df):
+    # Esquema de Clientes (+ Novos_Leads). Reaplicado depois de cada concat, que volta as
+    # categorias diferentes para texto.
+    if df.empty: return df
+    if 'KEY_DOC' in df.columns and df['KEY_DOC'].dtype != 'Int64': df['KEY_DOC'] = df['KEY_DOC'].astype('Int64')
+    if 'Status' in df.columns and df['Status'].dtype != TIPO_STATUS: df['Status'] = df['Status'].astype(TIPO_STATUS)
+    _categorias(df, CATEGORIAS_CLI)
+    return df
+
+
+def tipar_interacoes(df):
+    if df.empty: return df
+    if 'KEY_DOC' in df.columns and df['KEY_DOC'].dtype != 'Int64': df['KEY_DOC'] = df['KEY_DOC'].astype('Int64')
+    _categorias(df, CATEGORIAS_INT)
+    return df
+
+
+def anexar(df, novo):
+    # concat que mantém o esquema de df: as categorias de `novo` entram nas de df e Int64
+    # continua Int64 (o concat puro de categorias diferentes ou de Int64 com object vira object)
+    # df vazio (aba só com o cabeçalho): vale o esquema de `novo`, não o object das colunas vazias
+    if df.empty: return novo.reindex(columns=novo.columns.union(df.columns, sort=False)).reset_index(drop=True)
+    if novo.empty: return pd.concat([df, novo], ignore_index=True)
+    ampliadas = {}
+    for c in df.columns.intersection(novo.columns):
+        tipo = df[c].dtype
+        if isinstance(tipo, pd.CategoricalDtype):
+            faltam = pd.Index(novo[c].dropna().unique()).difference(tipo.categories)
+            if len(faltam):
+                ampliadas[c] = df[c].cat.add_categories(faltam)
+                tipo = ampliadas[c].dtype
+            novo[c] = novo[c].astype(tipo)
+        elif tipo == 'Int64': novo[c] = novo[c].astype('Int64')
+    return pd.concat([df.assign(**ampliadas) if ampliadas else df, novo], ignore_index=True)
+
+
+def relatorio_memoria(tabelas):
+    # Memória por tabela e por coluna (memory_usage deep, em MB)
+    linhas = []
+    for nome, df in tabelas.items():
+        uso = df.memory_usage(deep=True, index=False)
+        for col, b in uso.items():
+            linhas.append({'Tabela': nome, 'Coluna': col, 'Tipo': str(df[col].dtype), 'MB': b / 2**20})
+    rel = pd.DataFrame(linhas, columns=['Tabela', 'Coluna', 'Tipo', 'MB'])
+    return rel, rel.groupby('Tabela', sort=False)['MB'].sum()
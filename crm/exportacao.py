@@ -0,0 +1,53 @@
+import codecs
+import io
+
+from openpyxl import Workbook
+
+from crm.helpers import fmt_data_serie, fmt_moeda_serie
+from crm.metricas import METRICAS
+
+# Linhas convertidas para texto/células por vez: o arquivo cresce bloco a bloco, sem uma
+# cópia inteira do relatório como texto além dele
+TAMANHO_BLOCO = 20000
+MAX_LINHAS_XLSX = 1048575  # limite de linhas de uma planilha do Excel, sem o cabeçalho
+COLUNAS_RELATORIO = ['Data_Obj', 'Nome_Cliente', 'Tipo', 'Resumo', 'Valor_Proposta', 'Vendedor', 'Valor_Proposta_Fmt']
+FORMATOS = {'CSV': ('csv', 'text/csv'),
+            'Excel': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')}
+
+
+def formatar_relatorio(dff):
+    # Detalhes das vendas como na tela e no arquivo: data dd/mm/aaaa e o valor também em R$
+    return dff.assign(Data_Obj=fmt_data_serie(dff['Data_Obj']), Valor_Proposta_Fmt=fmt_moeda_serie(dff['Valor_Proposta']))[COLUNAS_RELATORIO]
+
+
+def blocos(df, tamanho=TAMANHO_BLOCO):
+    for ini in range(0, len(df), tamanho): yield df.iloc[ini:ini + tamanho]
+
+
+def escrever_csv(df, destino, tamanho=TAMANHO_BLOCO):
+    # UTF-8 com BOM (o Excel reconhece os acentos), como o to_csv(...).encode('utf-8-sig') de antes
+    destino.write(codecs.BOM_UTF8)
+    destino.write(df.iloc[:0].to_csv(index=False).encode('utf-8'))
+    for bloco in blocos(df, tamanho): destino.write(bloco.to_csv(index=False, header=False).encode('utf-8'))
+
+
+def escrever_xlsx(df, destino, tamanho=TAMANHO_BLOCO):
+    # openpyxl em modo write_only: as linhas vão direto para o arquivo, sem guardar as células
+    if len(df) > MAX_LINHAS_XLSX: raise ValueError(f"{len(df):,} linhas não cabem numa planilha do Excel; exporte em CSV")
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Relatorio")
+    ws.append(list(df.columns))
+    for bloco in blocos(df, tamanho):
+        bloco = bloco.astype(object)
+        for linha in bloco.where(bloco.notna(), None).to_numpy().tolist(): ws.append(linha)
+    wb.save(destino)
+
+
+@METRICAS.cronometrar('exportacao')
+def exportar(df, formato='CSV', tamanho=TAMANHO_BLOCO):
+    # Arquivo do relatório em memória (BytesIO), para o st.download_button. Passado como
+    # `data=partial(exportar, df, formato)`, só roda quando alguém clica em baixar.
+    destino = io.BytesIO()
+    (escrever_xlsx if FORMATOS[formato][0] == 'xlsx' else escrever_csv)(df, destino, tamanho)
+    destino.seek(0)
+    return destino
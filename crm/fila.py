@@ -0,0 +1,173 @@
+import json
+import os
+import random
+import threading
+import time
+import uuid
+
+from crm.metricas import METRICAS
+
+
+def _cota_excedida(e):
+    return getattr(getattr(e, 'response', None), 'status_code', None) == 429
+
+
+def _transitorio(e):
+    # Cota (429), erro do servidor (5xx) ou de rede: vale repetir. O resto (aba inexistente,
+    # linha recusada pela API) falha igual na próxima tentativa
+    status = getattr(getattr(e, 'response', None), 'status_code', None)
+    if status is not None: return status == 429 or status >= 500
+    return isinstance(e, OSError)  # ConnectionError, TimeoutError e os erros de rede do requests
+
+
+class EscritaDireta:
+    # Mesma interface da FilaEscrita, gravando na hora (benchmarks e uso sem fila)
+    def __init__(self, conectar):
+        self._conectar = conectar
+
+    def enfileirar(self, aba, linha):
+        self._conectar().worksheet(aba).append_row(linha)
+
+    def enfileirar_lote(self, aba, linhas):
+        self._conectar().worksheet(aba).append_rows(linhas)
+
+    def pendentes(self):
+        return []
+
+
+class FilaEscrita:
+    # Gravações na planilha em segundo plano (write-behind). `enfileirar` só anota a
+    # linha num diário em disco e retorna; uma thread junta o que houver e envia com
+    # um append_rows por aba. Falhas transitórias (cota 429, 5xx, rede) são repetidas com
+    # espera exponencial, e o que estiver no diário é reenviado depois de um restart.
+    # A entrega é "pelo menos uma vez": se o processo cair entre o envio e a
+    # atualização do diário, o lote é reenviado.
+    # Um erro que não é transitório (aba inexistente, linha recusada) repetido `tentativas`
+    # vezes seguidas tira o lote da aba da fila, para um diário à parte (`arquivo_recusadas`),
+    # e as gravações seguintes voltam a andar.
+    def __init__(self, conectar, arquivo, intervalo=2.0, lote=5000, espera_max=120.0, espera_cota=15.0,
+                 tentativas=3, arquivo_recusadas=None):
+        self._conectar = conectar
+        self._arquivo = arquivo
+        raiz, ext = os.path.splitext(arquivo)
+        self.arquivo_recusadas = arquivo_recusadas or f"{raiz}.recusadas{ext}"
+        self._tentativas = tentativas
+        self._falhas_aba = {}
+        self._intervalo = intervalo
+        self._lote = lote
+        self._espera_max = espera_max
+        self._espera_cota = espera_cota
+        self._lock = threading.Lock()
+        self._evento = threading.Event()
+        self._itens = self._ler_diario(self._arquivo)
+        self.recusados = len(self._ler_diario(self.arquivo_recusadas))
+        self.enviados = 0
+        self.falhas = 0
+        self.ultimo_erro = None
+        self.ultima_recusa = None
+        self._thread = threading.Thread(target=self._trabalhar, daemon=True)
+        self._thread.start()
+        if self._itens: self._evento.set()
+
+    # --- DIÁRIO ---
+    @staticmethod
+    def _ler_diario(arquivo):
+        itens = []
+        try:
+            with open(arquivo, encoding='utf-8') as f:
+                for l in f:
+                    try: itens.append(json.loads(l))
+                    except ValueError: pass  # última linha cortada por uma queda no meio da escrita
+        except FileNotFoundError: pass
+        return itens
+
+    def _reescrever_diario(self):
+        tmp = f"{self._arquivo}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            for item in self._itens: f.write(json.dumps(item, ensure_ascii=False) + '\n')
+            f.flush(); os.fsync(f.fileno())
+        os.replace(tmp, self._arquivo)
+
+    # --- API ---
+    def enfileirar(self, aba, linha):
+        self.enfileirar_lote(aba, [linha])
+
+    def enfileirar_lote(self, aba, linhas):
+        # Um único fsync para o lote inteiro (importações com milhares de linhas)
+        itens = [{'id': uuid.uuid4().hex, 'aba': aba, 'linha': l} for l in linhas]
+        with self._lock:
+            pasta = os.path.dirname(self._arquivo)
+            if pasta: os.makedirs(pasta, exist_ok=True)
+            with open(self._arquivo, 'a', encoding='utf-8') as f:
+                f.write(''.join(json.dumps(i, ensure_ascii=False) + '\n' for i in itens))
+                f.flush(); os.fsync(f.fileno())
+            self._itens.extend(itens)
+        self._evento.set()
+
+    def pendentes(self):
+        with self._lock: return [(i['aba'], i['linha']) for i in self._itens]
+
+    # --- ENVIO ---
+    def descarregar(self):
+        with self._lock: lote = self._itens[:self._lote]
+        if not lote: return
+        por_aba = {}
+        for item in lote: por_aba.setdefault(item['aba'], []).append(item)
+        ss = self._conectar()
+        if not ss: raise ConnectionError("Sem conexão com a planilha")
+        # Erro permanente numa aba não segura as outras: é levantado depois que elas forem enviadas
+        erro = None
+        for aba, itens in por_aba.items():
+            try: ss.worksheet(aba).append_rows([i['linha'] for i in itens])
+            except Exception as e:
+                if _transitorio(e): raise
+                self._falhas_aba[aba] = self._falhas_aba.get(aba, 0) + 1
+                if self._falhas_aba[aba] >= self._tentativas: self._recusar(itens, e)
+                else: erro = erro or e
+                continue
+            self._falhas_aba.pop(aba, None)
+            self._tirar(itens)
+            self.enviados += len(itens)
+            METRICAS.contar('fila.envios')
+            METRICAS.contar('fila.linhas', len(itens))
+        if erro: raise erro
+
+    def _tirar(self, itens):
+        ids = {i['id'] for i in itens}
+        with self._lock:
+            self._itens = [i for i in self._itens if i['id'] not in ids]
+            self._reescrever_diario()
+
+    def _recusar(self, itens, e):
+        # Lote que falha sempre: vai para o diário de recusadas (com o erro) e sai da fila
+        erro = f"{type(e).__name__}: {e}"
+        with self._lock:
+            with open(self.arquivo_recusadas, 'a', encoding='utf-8') as f:
+                f.write(''.join(json.dumps(dict(i, erro=erro), ensure_ascii=False) + '\n' for i in itens))
+                f.flush(); os.fsync(f.fileno())
+        self._tirar(itens)
+        self._falhas_aba.pop(itens[0]['aba'], None)
+        self.recusados += len(itens)
+        METRICAS.contar('fila.recusadas', len(itens))
+        self.ultima_recusa = f"{len(itens)} linha(s) de {itens[0]['aba']}: {erro}"
+
+    def _trabalhar(self):
+        espera = self._intervalo
+        while True:
+            self._evento.wait()
+            time.sleep(self._intervalo)  # janela para juntar as gravações de vários usuários
+            self._evento.clear()
+            try:
+                self.descarregar()
+                espera = self._intervalo
+                self.ultimo_erro = None
+            except Exception as e:
+                self.falhas += 1
+                METRICAS.contar('fila.erros')
+                self.ultimo_erro = f"{type(e).__name__}: {e}"
+                # A cota de escrita do Sheets é por minuto: não adianta tentar logo em seguida
+                if _cota_excedida(e): espera = max(espera, self._espera_cota)
+                time.sleep(espera + random.uniform(0, espera / 2))
+                espera = min(espera * 2, self._espera_max)
+            with self._lock:
+                if self._itens: self._evento.set()
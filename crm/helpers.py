@@ -0,0 +1,69 @@
+import random
+import re
+import string
+
+import numpy as np
+import pandas as pd
+
+_ALFABETO_ID = np.array(list(string.ascii_uppercase + string.digits))
+RE_ID = r'(#[A-Z0-9]{4})'
+RE_PEDIDO = r'\[PROTHEUS\] Pedido: (\w+)'
+
+
+def gerar_id_proposta(): 
+    return ''.join(random.choices(string.ascii_uppercase + string.digits, k=4))
+
+def gerar_ids_proposta(n):
+    # Mesmo formato do gerar_id_proposta, n de uma vez
+    return np.random.default_rng().choice(_ALFABETO_ID, size=(n, 4)).view('<U4').ravel()
+
+def extrair_id(t): 
+    match = re.search(RE_ID, str(t))
+    return match.group(1) if pd.notna(t) and match else None
+
+def extrair_pedido_protheus(t): 
+    match = re.search(RE_PEDIDO, str(t))
+    return match.group(1) if pd.notna(t) and match else None
+
+def extrair_ids(resumos):
+    # extrair_id / extrair_pedido_protheus para uma coluna inteira (NaN onde não há)
+    return resumos.astype(str).str.extract(RE_ID)[0].where(resumos.notna())
+
+def extrair_pedidos(resumos):
+    return resumos.astype(str).str.extract(RE_PEDIDO)[0].where(resumos.notna())
+
+def limpar_int(v): 
+    try: return int(re.sub(r'[^\d]', '', str(v).split(',')[0])) if pd.notna(v) and str(v).strip() else 0
+    except: return 0
+
+def limpar_int_serie(s):
+    # limpar_int para uma coluna inteira: um só regex apaga da primeira vírgula em diante e o que não é dígito
+    txt = s.astype(str).str.replace(r'(?s),.*|\D', '', regex=True)
+    return pd.to_numeric(txt, errors='coerce').where(s.notna(), 0).fillna(0).astype('int64')
+
+def limpar_doc(v):
+    return ''.join(filter(str.isdigit, str(v)))
+
+def fmt_moeda(v): 
+    try: return f"R$ {int(v):,.0f}".replace(',', '.')
+    except: return "R$ 0"
+
+def fmt_data(d): 
+    return pd.to_datetime(d).strftime('%d/%m/%Y') if pd.notna(d) and str(d).strip() != '' else "-"
+
+def fmt_moeda_serie(s):
+    # fmt_moeda para uma coluna inteira: cada valor distinto é formatado uma vez (a maioria das
+    # interações tem valor 0, e os valores se repetem muito)
+    codigos, unicos = pd.factorize(np.trunc(pd.to_numeric(s, errors='coerce').fillna(0)).astype('int64'))
+    txt = np.array([f"R$ {v:,}".replace(',', '.') for v in unicos.tolist()], dtype=object)
+    return pd.Series(txt[codigos], index=s.index)
+
+def fmt_data_serie(s):
+    # fmt_data para uma coluna inteira, também pelos valores distintos; sem data (código -1) vira "-"
+    codigos, unicos = pd.factorize(pd.to_datetime(s, errors='coerce'))
+    txt = np.append(unicos.strftime('%d/%m/%Y').to_numpy(dtype=object), '-')
+    return pd.Series(txt[codigos], index=s.index)
+
+def fmt_doc(v):
+    d = limpar_doc(v)
+    return f"{d[:2]}.{d[2:5]}.{d[5:8]}/{d[8:12]}-{d[12:]}" if len(d)>11 else f"{d[:3]}.{d[3:6]}.{d[6:9]}-{d[9:]}"
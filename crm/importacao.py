@@ -0,0 +1,211 @@
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from gspread.utils import rowcol_to_a1
+from openpyxl import load_workbook
+
+from crm.esquema import chaves_doc
+from crm.helpers import extrair_pedidos, gerar_ids_proposta, limpar_int_serie
+from crm.metricas import METRICAS
+
+COLUNAS_PROTHEUS = ['DATA','CNPJ','VENDEDOR','VALOR','PEDIDO','STATUS']
+COLUNAS_CLIENTES = ['ID_Cliente_CNPJ_CPF','Nome_Fantasia','Contato','Tipo_Cliente','Telefone_Contato1','Telefone_Contato2','Email','Total_Compras','Data_Ultima_Compra','Total_Notas','Dias_Sem_Comprar','Ultimo_Vendedor']
+# Linhas por chamada de escrita na planilha (o Sheets limita o tamanho de cada requisição)
+LOTE_PLANILHA = 10000
+
+
+def pedidos_existentes(resumos):
+    # Pedidos do Protheus já registrados nas interações ("[PROTHEUS] Pedido: X" no Resumo)
+    if len(resumos) == 0: return set()
+    return set(extrair_pedidos(resumos).dropna())
+
+
+def ler_protheus(arquivo, bloco=5000):
+    # Lê o XLSX em modo streaming (read_only), devolvendo DataFrames de até `bloco` linhas.
+    # A primeira linha da planilha é o cabeçalho, como no pd.read_excel.
+    wb = load_workbook(arquivo, read_only=True, data_only=True)
+    try:
+        linhas = wb.active.iter_rows(values_only=True)
+        cab = next(linhas, None)
+        if cab is None: return
+        cab = [str(c).strip() if c is not None else f"Unnamed: {i}" for i, c in enumerate(cab)]
+        if not set(COLUNAS_PROTHEUS).issubset(cab): raise ValueError("Colunas Erradas")
+        buf = []
+        for l in linhas:
+            if not any(v is not None for v in l): continue  # linhas em branco no fim da exportação
+            buf.append(l)
+            if len(buf) >= bloco:
+                yield pd.DataFrame(buf, columns=cab, dtype=object)[COLUNAS_PROTHEUS]
+                buf = []
+        if buf: yield pd.DataFrame(buf, columns=cab, dtype=object)[COLUNAS_PROTHEUS]
+    finally: wb.close()
+
+
+def classificar(df):
+    # Converte um bloco da exportação nas linhas da aba Interacoes (mesmas regras do import antigo)
+    stt = df['STATUS'].astype(str).str.upper()
+    tipo = np.select(
+        [stt.str.contains('FECHADO', regex=False) | stt.str.contains('FATURADO', regex=False),
+         stt.str.contains('CANCELADO', regex=False)],
+        ['Venda Fechada', 'Venda Perdida'], 'Orçamento Enviado').astype(object)
+    pid = df['PEDIDO'].astype(str).str.strip()
+    ids = np.char.add(np.char.add('#', gerar_ids_proposta(len(df))), ' ').astype(object)
+    prefixo = np.where(tipo == 'Orçamento Enviado', ids, '')
+    datas = pd.to_datetime(df['DATA'], format='mixed', errors='coerce').dt.strftime('%d/%m/%Y')
+    return pd.DataFrame({
+        'CNPJ': df['CNPJ'].astype(str).str.replace(r'\D', '', regex=True),
+        'Data': datas.fillna(datetime.now().strftime('%d/%m/%Y')),
+        'Tipo': tipo,
+        'Resumo': prefixo + '[PROTHEUS] Pedido: ' + pid + ' | ' + stt,
+        'Vendedor': df['VENDEDOR'].astype(str).str.strip().str.upper(),
+        'Valor': limpar_int_serie(df['VALOR']),
+        'Pedido': pid,
+    }, index=df.index)
+
+
+@METRICAS.cronometrar('importacao')
+def importar_protheus(arquivo, pedidos, bloco=5000):
+    # Retorna (linhas para a aba Interacoes, relatório). `pedidos` é o conjunto de pedidos já
+    # registrados; duplicados contra ele e dentro do próprio arquivo ficam de fora. Linhas sem
+    # número de pedido ou sem documento do cliente são rejeitadas.
+    rel = {'lidas': 0, 'novos': 0, 'duplicados': 0, 'rejeitados': 0,
+           'tempos': {'leitura': 0.0, 'classificacao': 0.0, 'deduplicacao': 0.0}}
+    vistos, partes = set(pedidos), []
+    it = ler_protheus(arquivo, bloco)
+    while True:
+        ini = time.perf_counter()
+        df = next(it, None)
+        rel['tempos']['leitura'] += time.perf_counter() - ini
+        if df is None: break
+        rel['lidas'] += len(df)
+
+        ini = time.perf_counter()
+        vazio = df['PEDIDO'].isna() | df['PEDIDO'].astype(str).str.strip().eq('')
+        novas = classificar(df[~vazio])
+        invalido = novas['CNPJ'].eq('')
+        rel['rejeitados'] += int(vazio.sum() + invalido.sum())
+        novas = novas[~invalido]
+        rel['tempos']['classificacao'] += time.perf_counter() - ini
+
+        ini = time.perf_counter()
+        dup = np.fromiter((p in vistos for p in novas['Pedido']), bool, len(novas)) | novas['Pedido'].duplicated().to_numpy()
+        rel['duplicados'] += int(dup.sum())
+        novas = novas[~dup]
+        vistos.update(novas['Pedido'])
+        partes.append(novas)
+        rel['tempos']['deduplicacao'] += time.perf_counter() - ini
+
+    linhas = pd.concat(partes).drop(columns='Pedido').values.tolist() if partes else []
+    # Valor volta como int do Python (o json da fila e o gspread não aceitam numpy.int64)
+    linhas = [l[:5] + [int(l[5])] for l in linhas]
+    rel['novos'] = len(linhas)
+    return linhas, rel
+
+
+# --- CLIENTES (CSV do ERP) ---
+def ler_clientes_csv(arquivo, bloco=50000):
+    # Exportação de clientes do ERP: separador ";", Latin-1, decimais com vírgula. Tudo é lido
+    # como texto (dtype=str, sem NaN), em blocos, para não perder zeros à esquerda do documento
+    for df in pd.read_csv(arquivo, sep=';', encoding='latin-1', dtype=str, keep_default_na=False, chunksize=bloco):
+        df.columns = df.columns.str.strip()
+        if not set(COLUNAS_CLIENTES).issubset(df.columns): raise ValueError("Colunas Erradas")
+        yield df[COLUNAS_CLIENTES]
+
+
+def normalizar_clientes(df):
+    # Mesmas regras da leitura da aba (limpar_doc, limpar_int, datas dd/mm/aaaa) para a coluna
+    # inteira: texto aparado, documento só com dígitos (+ KEY_DOC) e vendedor em maiúsculas.
+    # Total_Compras vai em reais inteiros ("36297,70" -> "36297"): é o valor que o CRM usa, e a
+    # vírgula decimal seria lida de volta como separador de milhar (numericise do gspread)
+    df = df.apply(lambda c: c.str.strip())
+    df['ID_Cliente_CNPJ_CPF'] = df['ID_Cliente_CNPJ_CPF'].str.replace(r'\D', '', regex=True)
+    df['Ultimo_Vendedor'] = df['Ultimo_Vendedor'].str.upper()
+    # Datas se repetem muito: cada texto distinto é convertido uma vez
+    codigos, datas = pd.factorize(df['Data_Ultima_Compra'])
+    datas = pd.to_datetime(pd.Series(datas), format='%d/%m/%Y', errors='coerce').dt.strftime('%d/%m/%Y').fillna('')
+    df['Data_Ultima_Compra'] = np.append(datas.to_numpy(dtype=object), '')[codigos]
+    for c in ['Total_Compras', 'Total_Notas', 'Dias_Sem_Comprar']:
+        df[c] = limpar_int_serie(df[c]).astype(str).where(df[c].ne(''), '')
+    df['KEY_DOC'] = chaves_doc(df['ID_Cliente_CNPJ_CPF'])
+    return df
+
+
+@METRICAS.cronometrar('importacao.clientes')
+def importar_clientes_csv(arquivo, bloco=50000):
+    # Retorna (clientes normalizados, um por KEY_DOC, relatório). Linhas sem documento são
+    # rejeitadas; um documento repetido no arquivo vale pela última linha.
+    rel = {'lidas': 0, 'rejeitados': 0, 'duplicados': 0, 'tempos': {'leitura': 0.0, 'normalizacao': 0.0}}
+    partes = []
+    it = ler_clientes_csv(arquivo, bloco)
+    while True:
+        ini = time.perf_counter()
+        df = next(it, None)
+        rel['tempos']['leitura'] += time.perf_counter() - ini
+        if df is None: break
+        rel['lidas'] += len(df)
+        ini = time.perf_counter()
+        df = normalizar_clientes(df)
+        invalido = df['KEY_DOC'].isna()
+        rel['rejeitados'] += int(invalido.sum())
+        partes.append(df[~invalido])
+        rel['tempos']['normalizacao'] += time.perf_counter() - ini
+    if not partes: return pd.DataFrame(columns=COLUNAS_CLIENTES + ['KEY_DOC']), rel
+    df = pd.concat(partes, ignore_index=True)
+    dup = df['KEY_DOC'].duplicated(keep='last')
+    rel['duplicados'] = int(dup.sum())
+    return df[~dup].reset_index(drop=True), rel
+
+
+def _intervalos(linhas, maximo):
+    # Números de linha (ordenados) -> [(primeira, última)] de cada trecho contínuo, com no
+    # máximo `maximo` linhas por trecho
+    if not len(linhas): return []
+    quebras = np.flatnonzero(np.diff(linhas) != 1) + 1
+    return [(int(t[i]), int(t[min(i + maximo, len(t)) - 1])) for t in np.split(linhas, quebras) for i in range(0, len(t), maximo)]
+
+
+def atualizar_clientes(ws, df, lote=LOTE_PLANILHA):
+    # Upsert na aba Clientes por KEY_DOC. Clientes que já estão na aba e mudaram são reescritos
+    # com batch_update (linhas vizinhas num só intervalo); os novos vão por append_rows; os iguais
+    # não são enviados. Colunas da aba que o arquivo não tem ficam como estão.
+    valores = ws.get(pad_values=True)
+    if not valores or valores == [[]]:
+        ws.update([COLUNAS_CLIENTES], 'A1')
+        valores = [COLUNAS_CLIENTES]
+    cab = [str(c).strip() for c in valores[0]]
+    if 'ID_Cliente_CNPJ_CPF' not in cab: raise ValueError("Aba Clientes sem a coluna ID_Cliente_CNPJ_CPF")
+    n = len(cab)
+    atual = pd.DataFrame([(l + [''] * (n - len(l)))[:n] for l in valores[1:]], columns=cab, dtype=object)
+    # KEY_DOC -> linha na planilha (cabeçalho na linha 1); documento repetido na aba: vale a última
+    chaves = chaves_doc(atual['ID_Cliente_CNPJ_CPF']) if len(atual) else pd.Series([], dtype='Int64')
+    pos = pd.Series(np.arange(len(atual)) + 2, index=chaves)
+    pos = pos[pos.index.notna() & ~pos.index.duplicated(keep='last')]
+
+    novo = df.reindex(columns=cab)
+    existe = df['KEY_DOC'].isin(pos.index).to_numpy()
+    linhas = pos.loc[df.loc[existe, 'KEY_DOC']].to_numpy()
+    ordem = np.argsort(linhas, kind='stable')
+    linhas = linhas[ordem]
+    antigo = atual.iloc[linhas - 2].reset_index(drop=True)
+    upd = novo[existe].iloc[ordem].reset_index(drop=True)
+    upd = upd.where(upd.notna(), antigo).astype(str)
+    mudou = (upd != antigo.astype(str)).any(axis=1).to_numpy()
+    upd, linhas = upd[mudou], linhas[mudou]
+
+    ultima_col = rowcol_to_a1(1, n).rstrip('0123456789')
+    valores_upd = upd.to_numpy().tolist()
+    parte, i, no_lote = [], 0, 0
+    for ini, fim in _intervalos(linhas, lote):
+        parte.append({'range': f"A{ini}:{ultima_col}{fim}", 'values': valores_upd[i:i + fim - ini + 1]})
+        i += fim - ini + 1
+        no_lote += fim - ini + 1
+        if no_lote >= lote:
+            ws.batch_update(parte)
+            parte, no_lote = [], 0
+    if parte: ws.batch_update(parte)
+
+    novas = novo[~existe].fillna('').astype(str).to_numpy().tolist()
+    for ini in range(0, len(novas), lote): ws.append_rows(novas[ini:ini + lote])
+    return {'novos': len(novas), 'atualizados': int(mudou.sum()), 'iguais': int((~mudou).sum())}
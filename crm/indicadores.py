@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+
+from crm.metricas import METRICAS
+
+ORCAMENTO = 'Orçamento Enviado'
+RESOLUCOES = ['Venda Fechada', 'Venda Perdida']
+ATIVIDADES = ['Ligação Realizada', 'WhatsApp Enviado', 'Agendou Visita']
+
+# Placar por vendedor: valores em R$ (Orcado, Fat, Perdido, Pipeline = orçamentos ainda
+# abertos), contagens e taxa de conversão (fechadas / (fechadas + perdidas))
+COLUNAS_PLACAR = {
+    'Fat': 'int64', 'Cli': 'int64', 'Ativ': 'int64', 'Orcado': 'int64', 'Pipeline': 'int64', 'Perdido': 'int64',
+    'Orcamentos': 'int64', 'Fechadas': 'int64', 'Perdidas': 'int64', 'Conversao': 'float64',
+}
+
+
+def _chaves(df, coluna):
+    # (KEY_DOC, valor) das linhas com a coluna preenchida (a mesma proposta é sempre do mesmo cliente)
+    df = df[df[coluna].notna()]
+    return zip(df['KEY_DOC'], df[coluna])
+
+
+class IndicePropostas:
+    # Propostas resolvidas (Venda Fechada/Perdida) por cliente, pelo #ID da proposta e pelo
+    # pedido do Protheus, mais todos os pedidos do Protheus já registrados. A BaseCompartilhada
+    # atualiza o índice a cada interação aplicada; os conjuntos são trocados, nunca alterados
+    # no lugar, para que as sessões leiam sem lock.
+    def __init__(self, df_int):
+        self.ids_resolvidos = frozenset()
+        self.pedidos_resolvidos = frozenset()
+        self.pedidos = frozenset()
+        self.registrar(df_int)
+
+    def registrar(self, df):
+        if df.empty or 'ID_Proposta' not in df.columns: return
+        res = df[df['Tipo'].isin(RESOLUCOES)]
+        if not res.empty:
+            self.ids_resolvidos = self.ids_resolvidos | frozenset(_chaves(res, 'ID_Proposta'))
+            self.pedidos_resolvidos = self.pedidos_resolvidos | frozenset(_chaves(res, 'Pedido'))
+        self.pedidos = self.pedidos | frozenset(df['Pedido'].dropna())
+
+    def abertas(self, df):
+        # Máscara (numpy) dos "Orçamento Enviado" de df que ainda não foram fechados nem perdidos
+        if df.empty or 'ID_Proposta' not in df.columns: return np.zeros(len(df), dtype=bool)
+        orc = df['Tipo'].eq(ORCAMENTO).to_numpy(copy=True)
+        docs = df['KEY_DOC'].to_numpy(dtype=object)[orc]
+        fechada = np.zeros(len(docs), dtype=bool)
+        for col, resolvidos in (('ID_Proposta', self.ids_resolvidos), ('Pedido', self.pedidos_resolvidos)):
+            # Consulta no set em vez de isin: custa o tamanho da consulta, não o do índice.
+            # Valores vazios (NaN) nunca estão no índice.
+            fechada |= np.fromiter((c in resolvidos for c in zip(docs, df[col].to_numpy()[orc])), bool, len(docs))
+        orc[orc] = ~fechada
+        return orc
+
+
+def propostas_abertas(df, indice):
+    return df[indice.abertas(df)]
+
+
+def periodo(df, inicio=None, fim=None):
+    # Linhas com inicio <= Data_Obj <= fim (datas inclusive, None = sem limite; datas vazias
+    # nunca entram). Depende do log ordenado por Data_Obj com NaT no fim, como a LogInteracoes
+    # mantém (as visões por carteira são filtros do log e continuam ordenadas): duas buscas binárias.
+    if df.empty or 'Data_Obj' not in df.columns: return df
+    datas = df['Data_Obj'].to_numpy()
+    i = np.searchsorted(datas, np.datetime64(pd.Timestamp(inicio)), 'left') if inicio is not None else 0
+    fim = np.datetime64(pd.Timestamp(fim) + pd.Timedelta(days=1)) if fim is not None else np.datetime64('NaT')
+    return df.iloc[i:np.searchsorted(datas, fim, 'left')]
+
+
+@METRICAS.cronometrar('placar')
+def placar_vendedores(df, indice=None, mensal=False, total=False):
+    # Placar de todos os vendedores numa passada: as colunas de cada indicador são montadas
+    # com máscaras e somadas num único groupby (Cli, que é contagem distinta, num segundo).
+    # Índice Vendedor (e Mes, com `mensal`); com `total`, uma só linha 'TOTAL' para o df todo.
+    # Sem `indice` (IndicePropostas) o Pipeline fica zerado.
+    if df.empty:
+        vazio = pd.DataFrame({c: pd.Series(dtype=t) for c, t in COLUNAS_PLACAR.items()})
+        return vazio.rename_axis('Vendedor')
+    tipo, valor = df['Tipo'], df['Valor_Proposta'].to_numpy()
+    orc, fech, perd = tipo.eq(ORCAMENTO).to_numpy(), tipo.eq('Venda Fechada').to_numpy(), tipo.eq('Venda Perdida').to_numpy()
+    aberta = indice.abertas(df) if indice is not None else np.zeros(len(df), dtype=bool)
+    chaves = [pd.Series('TOTAL', index=df.index, name='Vendedor') if total else df['Vendedor']]
+    if mensal: chaves.append(df['Data_Obj'].dt.to_period('M').rename('Mes'))
+    aux = pd.DataFrame({
+        'Fat': np.where(fech, valor, 0), 'Ativ': tipo.isin(ATIVIDADES).to_numpy(),
+        'Orcado': np.where(orc, valor, 0), 'Pipeline': np.where(aberta, valor, 0), 'Perdido': np.where(perd, valor, 0),
+        'Orcamentos': orc, 'Fechadas': fech, 'Perdidas': perd,
+    }, index=df.index)
+    placar = aux.groupby(chaves, observed=True).sum()
+    cli = df['CNPJ_Cliente'][fech].groupby([c[fech] for c in chaves], observed=True).nunique()
+    placar['Cli'] = cli.reindex(placar.index, fill_value=0)
+    resolvidas = placar['Fechadas'] + placar['Perdidas']
+    placar['Conversao'] = placar['Fechadas'] / resolvidas.where(resolvidas > 0)
+    return placar[list(COLUNAS_PLACAR)].astype(COLUNAS_PLACAR)
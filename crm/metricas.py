@@ -0,0 +1,168 @@
+import json
+import logging
+import sys
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from functools import wraps
+
+import numpy as np
+import pandas as pd
+
+try: import resource
+except ImportError: resource = None  # Windows: sem pico de memória do processo
+
+# Latências guardadas por etapa (as mais recentes): os percentis valem para essa janela
+JANELA = 1000
+PERCENTIS = (50, 90, 99)
+# Etapa mais lenta que isso vai para o log (JSON numa linha), para achar o rerun lento depois
+LIMITE_LENTO = 2.0
+
+log = logging.getLogger('crm.metricas')
+
+
+class Metricas:
+    # Tempos por etapa, contadores e acertos de cache do processo (compartilhados pelas sessões,
+    # como a base). Registrar é um append numa deque sob lock; percentis e exportação só são
+    # calculados quando alguém abre o diagnóstico ou pede o texto.
+    def __init__(self, janela=JANELA):
+        self._lock = threading.Lock()
+        self._janela = janela
+        self._tempos = defaultdict(lambda: deque(maxlen=self._janela))
+        self._totais = defaultdict(lambda: [0, 0.0])  # desde o início: [chamadas, segundos]
+        self._caches = defaultdict(lambda: [0, 0])  # [acertos, faltas]
+        self._contadores = Counter()
+        self.inicio = time.time()
+
+    # --- REGISTRO ---
+    @contextmanager
+    def medir(self, etapa):
+        # with METRICAS.medir('etapa'): ...
+        ini = time.perf_counter()
+        try: yield
+        finally: self.registrar(etapa, time.perf_counter() - ini)
+
+    def cronometrar(self, etapa):
+        # Decorador: mede cada chamada da função como `etapa`
+        def decorar(fn):
+            @wraps(fn)
+            def medida(*args, **kwargs):
+                with self.medir(etapa): return fn(*args, **kwargs)
+            return medida
+        return decorar
+
+    def registrar(self, etapa, segundos):
+        with self._lock:
+            self._tempos[etapa].append(segundos)
+            tot = self._totais[etapa]
+            tot[0] += 1
+            tot[1] += segundos
+        if segundos > LIMITE_LENTO: log.warning(json.dumps({'evento': 'etapa_lenta', 'etapa': etapa, 'segundos': round(segundos, 3)}))
+
+    def contar(self, nome, n=1):
+        with self._lock: self._contadores[nome] += n
+
+    def cache(self, nome, acerto):
+        with self._lock: self._caches[nome][0 if acerto else 1] += 1
+
+    def reiniciar(self):
+        with self._lock:
+            self._tempos.clear(); self._totais.clear(); self._caches.clear(); self._contadores.clear()
+            self.inicio = time.time()
+
+    # --- LEITURA ---
+    def latencias(self):
+        # Por etapa: chamadas e total desde o início, percentis e máximo (ms) da janela recente
+        with self._lock:
+            janelas = {e: np.fromiter(d, float, len(d)) for e, d in self._tempos.items()}
+            totais = {e: tuple(t) for e, t in self._totais.items()}
+        linhas = {}
+        for etapa, t in sorted(janelas.items()):
+            ps = np.percentile(t, PERCENTIS) * 1000 if len(t) else [np.nan] * len(PERCENTIS)
+            linhas[etapa] = {'chamadas': totais[etapa][0], 'total_s': totais[etapa][1],
+                             **{f"p{p}_ms": v for p, v in zip(PERCENTIS, ps)}, 'max_ms': t.max() * 1000 if len(t) else np.nan}
+        colunas = ['chamadas', 'total_s'] + [f"p{p}_ms" for p in PERCENTIS] + ['max_ms']
+        return pd.DataFrame.from_dict(linhas, orient='index', columns=colunas).rename_axis('etapa')
+
+    def caches(self):
+        with self._lock: dados = {c: tuple(v) for c, v in self._caches.items()}
+        df = pd.DataFrame.from_dict(dados, orient='index', columns=['acertos', 'faltas']).rename_axis('cache').sort_index()
+        df['taxa'] = df['acertos'] / (df['acertos'] + df['faltas'])
+        return df
+
+    def contadores(self):
+        with self._lock: return dict(self._contadores)
+
+
+METRICAS = Metricas()
+
+
+def memoria_processo_mb():
+    # Pico de memória residente do processo (None onde o módulo resource não existe)
+    if resource is None: return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / 2**20 if sys.platform == 'darwin' else pico / 2**10  # bytes no macOS, KB no Linux
+
+
+def tamanho_mb(valores):
+    # Memória aproximada de um conjunto de objetos (ex.: st.session_state): DataFrames por
+    # memory_usage, o resto por sys.getsizeof
+    total = 0
+    for v in valores:
+        if isinstance(v, (pd.DataFrame, pd.Series)): total += int(np.sum(v.memory_usage(deep=True)))
+        else: total += sys.getsizeof(v)
+    return total / 2**20
+
+
+# --- EXPORTAÇÃO ---
+def _escapar(v):
+    return str(v).replace('\\', '\\\\').replace('"', '\\"')
+
+
+def _rotulos(**kw):
+    return '{' + ','.join(f'{k}="{_escapar(v)}"' for k, v in kw.items()) + '}'
+
+
+def prometheus(metricas=METRICAS, api=None, memoria=None):
+    # Formato texto do Prometheus. `api`: ClienteSheets.estatisticas(); `memoria`: {nome: MB}
+    linhas = ['# TYPE crm_etapa_segundos summary']
+    for etapa, r in metricas.latencias().iterrows():
+        for p in PERCENTIS:
+            if pd.notna(r[f"p{p}_ms"]): linhas.append(f"crm_etapa_segundos{_rotulos(etapa=etapa, quantile=p / 100)} {r[f'p{p}_ms'] / 1000:.6f}")
+        linhas.append(f"crm_etapa_segundos_count{_rotulos(etapa=etapa)} {int(r['chamadas'])}")
+        linhas.append(f"crm_etapa_segundos_sum{_rotulos(etapa=etapa)} {r['total_s']:.6f}")
+    linhas.append('# TYPE crm_cache_total counter')
+    for cache, r in metricas.caches().iterrows():
+        linhas.append(f"crm_cache_total{_rotulos(cache=cache, resultado='acerto')} {int(r['acertos'])}")
+        linhas.append(f"crm_cache_total{_rotulos(cache=cache, resultado='falta')} {int(r['faltas'])}")
+    linhas.append('# TYPE crm_eventos_total counter')
+    for nome, n in sorted(metricas.contadores().items()): linhas.append(f"crm_eventos_total{_rotulos(evento=nome)} {n}")
+    if api:
+        linhas.append('# TYPE crm_sheets_chamadas_total counter')
+        for op, st in sorted(api.items()):
+            linhas.append(f"crm_sheets_chamadas_total{_rotulos(operacao=op)} {st['chamadas']}")
+            linhas.append(f"crm_sheets_erros_total{_rotulos(operacao=op)} {st['erros']}")
+            linhas.append(f"crm_sheets_segundos_total{_rotulos(operacao=op)} {st['total_s']:.6f}")
+    if memoria:
+        linhas.append('# TYPE crm_memoria_mb gauge')
+        for nome, mb in memoria.items():
+            if mb is not None: linhas.append(f"crm_memoria_mb{_rotulos(item=nome)} {mb:.3f}")
+    return '\n'.join(linhas) + '\n'
+
+
+def registros_json(metricas=METRICAS, api=None, memoria=None):
+    # O mesmo conteúdo como log estruturado: um objeto JSON por linha
+    agora = round(time.time(), 3)
+    regs = []
+    for e, r in metricas.latencias().iterrows():
+        reg = {'ts': agora, 'tipo': 'etapa', 'etapa': e, **{k: None if pd.isna(v) else round(float(v), 4) for k, v in r.items()}}
+        reg['chamadas'] = int(r['chamadas'])
+        regs.append(reg)
+    regs += [{'ts': agora, 'tipo': 'cache', 'cache': c, 'acertos': int(r['acertos']), 'faltas': int(r['faltas'])}
+             for c, r in metricas.caches().iterrows()]
+    regs += [{'ts': agora, 'tipo': 'contador', 'evento': n, 'valor': v} for n, v in sorted(metricas.contadores().items())]
+    regs += [{'ts': agora, 'tipo': 'sheets', 'operacao': op, 'chamadas': st['chamadas'], 'erros': st['erros'],
+              'total_s': round(st['total_s'], 3)} for op, st in sorted((api or {}).items())]
+    regs += [{'ts': agora, 'tipo': 'memoria', 'item': n, 'mb': None if mb is None else round(mb, 3)} for n, mb in (memoria or {}).items()]
+    return '\n'.join(json.dumps(r, ensure_ascii=False) for r in regs) + '\n'
@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+from crm.esquema import TIPO_STATUS
+from crm.metricas import METRICAS
+
+# Status derivado da última interação registrada para o cliente
+STATUS_POR_TIPO = {
+    'Orçamento Enviado': '⏳ NEGOCIAÇÃO',
+    'Ligação Realizada': '⚠️ FOLLOW-UP',
+    'WhatsApp Enviado': '⚠️ FOLLOW-UP',
+    'Agendou Visita': '⚠️ FOLLOW-UP',
+    'Venda Perdida': '👎 VENDA PERDIDA',
+    'Venda Fechada': '⭐ VENDA RECENTE',
+}
+
+DIAS_RECUPERAR = 60
+_NAT_ORDEM = np.iinfo(np.int64).max
+
+
+def ordem_data(datas):
+    # Chave inteira de ordenação por data. Datas vazias contam como as mais recentes,
+    # o mesmo critério do sort_values (na_position='last') usado antes.
+    dt = pd.Series(datas)
+    # Já datetime64 (o log tipado): o to_datetime ainda varreria os valores um a um
+    if not pd.api.types.is_datetime64_dtype(dt): dt = pd.to_datetime(dt, errors='coerce')
+    ordem = dt.to_numpy(dtype='datetime64[ns]').view(np.int64).copy()
+    ordem[dt.isna().to_numpy()] = _NAT_ORDEM
+    return ordem
+
+
+def ultima_interacao_por_cliente(df_i):
+    # Última interação de cada KEY_DOC sem ordenar o log inteiro: pega a maior data
+    # do grupo e, em caso de empate, a linha registrada por último.
+    if df_i.empty: return df_i.iloc[0:0]
+    codigos, chaves = pd.factorize(df_i['KEY_DOC'])  # sem documento (NA) fica com -1 e não entra
+    if not len(chaves): return df_i.iloc[0:0]
+    ordem = ordem_data(df_i['Data_Obj'])
+    com_doc = codigos >= 0
+    maxima = np.full(len(chaves), np.iinfo(np.int64).min)
+    np.maximum.at(maxima, codigos[com_doc], ordem[com_doc])
+    pos = np.flatnonzero(com_doc & (ordem == maxima[codigos]))
+    ultima_pos = np.full(len(chaves), -1)
+    np.maximum.at(ultima_pos, codigos[pos], pos)
+    return df_i.iloc[ultima_pos]
+
+
+def status_recencia(data_ultima_compra, hoje=None):
+    hoje = hoje or datetime.now().date()
+    dias = (pd.Timestamp(hoje) - data_ultima_compra).dt.days
+    status = np.select([dias.isna(), dias >= DIAS_RECUPERAR], ['🆕 NOVO S/ INTERAÇÃO', '🔴 RECUPERAR'], '🟢 ATIVO')
+    # Categoria de tamanho fixo: a atualização pontual do IndiceStatus só troca um código
+    return dias, pd.Series(status, index=data_ultima_compra.index, dtype=TIPO_STATUS)
+
+
+@METRICAS.cronometrar('status.massa')
+def recalcular_status_massa(df_c, df_i, hoje=None):
+    if df_c.empty: return df_c
+
+    if 'Data_Ultima_Compra' in df_c.columns:
+        df_c['Dias_Sem_Comprar'], df_c['Status'] = status_recencia(df_c['Data_Ultima_Compra'], hoje)
+    else:
+        df_c['Status'] = pd.Series('🟢 ATIVO', index=df_c.index, dtype=TIPO_STATUS)
+
+    if df_i.empty: return df_c
+
+    ultimas = ultima_interacao_por_cliente(df_i)
+    # Mapeamento feito sobre as categorias de Tipo, não linha a linha
+    status_ultima = ultimas['Tipo'].astype('category').map(STATUS_POR_TIPO)
+    mapa = pd.Series(status_ultima.to_numpy(dtype=object), index=ultimas['KEY_DOC'].to_numpy())
+    df_c['Status'] = df_c['KEY_DOC'].map(mapa).fillna(df_c['Status'].astype(object)).astype(TIPO_STATUS)
+    return df_c
+
+
+def _ordem_unica(data):
+    ts = pd.to_datetime(data, errors='coerce')
+    return _NAT_ORDEM if pd.isna(ts) else pd.Timestamp(ts).as_unit('ns').value
+
+
+class IndiceStatus:
+    # Última interação por KEY_DOC e posições de cada cliente em df_c, para que uma
+    # interação nova altere só o Status do cliente afetado, sem recalcular a base.
+    def __init__(self, df_c, df_i):
+        self.ultima = {}
+        if not df_i.empty:
+            ultimas = ultima_interacao_por_cliente(df_i)
+            self.ultima = dict(zip(ultimas['KEY_DOC'], zip(ordem_data(ultimas['Data_Obj']).tolist(), ultimas['Tipo'])))
+        self.linhas = df_c.groupby('KEY_DOC', sort=False).indices if not df_c.empty else {}
+
+    def copia(self):
+        # Índice independente para alterar sem mexer neste (as posições não mudam e são compartilhadas)
+        novo = IndiceStatus.__new__(IndiceStatus)
+        novo.ultima, novo.linhas = dict(self.ultima), self.linhas
+        return novo
+
+    def registrar(self, df_c, key, data, tipo, hoje=None):
+        if pd.isna(key): return False
+        ordem = _ordem_unica(data)
+        atual = self.ultima.get(key)
+        if atual and ordem < atual[0]: return False
+        self.ultima[key] = (ordem, tipo)
+        pos = self.linhas.get(key)
+        if pos is None or df_c.empty: return False
+
+        status = STATUS_POR_TIPO.get(tipo)
+        if status is None:
+            if 'Data_Ultima_Compra' in df_c.columns:
+                status = status_recencia(df_c['Data_Ultima_Compra'].iloc[pos], hoje)[1].to_numpy()
+            else: status = '🟢 ATIVO'
+        df_c.iloc[pos, df_c.columns.get_loc('Status')] = status
+        return True
@@ -0,0 +1,237 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+from crm.busca import paginar, paginas
+from crm.agendador import FOLLOW_UP, RECUPERAR
+from crm.exportacao import formatar_relatorio
+from crm.helpers import fmt_data_serie, fmt_moeda, fmt_moeda_serie, gerar_id_proposta
+from crm.importacao import importar_clientes_csv, importar_protheus
+from crm.indicadores import periodo, propostas_abertas
+from crm.metricas import METRICAS
+
+# Resultados guardados por ponto de entrada (os mais recentes), só da versão atual da base
+MAX_MEMO = 256
+# Pontos de entrada com resultado do tamanho do log: só os últimos
+LIMITES_MEMO = {'detalhes_gestor': 2}
+_VAZIO = object()
+
+
+class Servico:
+    # Tudo que as telas mostram, calculado fora do Streamlit. Cada ponto de entrada é
+    # memorizado pela chave (usuário/carteira, filtros, período) + a versão da base: um rerun
+    # que não mudou nada disso só lê o resultado pronto, e qualquer gravação ou sincronização
+    # (que troca `base.versao`) descarta tudo de uma vez. Compartilhado pelas sessões, como a base.
+    # Com `agendador`, carteira, status e filas saem do Quadro quando ele acompanha a versão atual
+    # (as gravações entram nele ponto a ponto); as metas, só quando ele foi montado nela.
+    def __init__(self, base, agendador=None, max_memo=MAX_MEMO):
+        self.base = base
+        self.agendador = agendador
+        self._max_memo = max_memo
+        self._memo = {}  # nome -> OrderedDict(chave -> resultado), só da geração atual
+        self._geracao = None
+        self._lock = threading.Lock()
+
+    def geracao(self):
+        # Versão da base e do Quadro: quando muda, nada guardado antes volta a ser lido
+        return self.base.versao, self.agendador.versao if self.agendador else 0
+
+    def _memorizar(self, nome, chave, calcular):
+        geracao = self.geracao()
+        with self._lock:
+            if self._geracao is None or geracao > self._geracao: self._memo, self._geracao = {}, geracao
+            memo = self._memo.setdefault(nome, OrderedDict()) if geracao == self._geracao else {}
+            valor = memo.get(chave, _VAZIO)
+            if valor is not _VAZIO: memo.move_to_end(chave)
+        METRICAS.cache(f"servico.{nome}", valor is not _VAZIO)
+        if valor is not _VAZIO: return valor
+        with METRICAS.medir(f"servico.{nome}"): valor = calcular()
+        with self._lock:
+            # Se a base mudou durante o cálculo, o resultado já nasce velho e não é guardado
+            if geracao == self._geracao:
+                memo = self._memo.setdefault(nome, OrderedDict())
+                memo[chave] = valor
+                while len(memo) > LIMITES_MEMO.get(nome, self._max_memo): memo.popitem(last=False)
+        return valor
+
+    def _quadro(self):
+        # Quadro do agendador, se o status dele é o da versão atual da base. Depois de uma gravação
+        # ele segue com o status do dia; só numa recarga (ou leads, importação grande) fica para trás
+        # até ser remontado, e aí vale a base, que já tem a mudança.
+        q = self.agendador.quadro() if self.agendador else None
+        return q if q is not None and q.versao_status == self.base.versao else None
+
+    # --- USUÁRIO ---
+    def usuarios(self):
+        df_cfg = self.base.df_cfg
+        return sorted(df_cfg['Usuario'].unique()) if not df_cfg.empty else []
+
+    def autenticar(self, usuario, senha):
+        df_cfg = self.base.df_cfg
+        ud = df_cfg[df_cfg['Usuario'] == usuario]
+        return not ud.empty and str(ud.iloc[0]['Senha']).strip() == str(senha).strip()
+
+    def perfil(self, usuario):
+        # Tipo (GESTOR/VENDEDOR), carteiras e metas do usuário; para o GESTOR as metas são a
+        # soma das metas dos vendedores
+        def calcular():
+            df_cfg = self.base.df_cfg
+            u = df_cfg[df_cfg['Usuario'] == usuario].iloc[0]
+            tipo = str(u['Tipo']).upper().strip()
+            carts = [x.strip().upper() for x in str(u['Carteira_Alvo']).split(',') if x.strip() != '']
+            if tipo == "GESTOR":
+                vend = df_cfg[df_cfg['Tipo'] == 'VENDEDOR']
+                metas = {'Fat': vend['Meta_Fat'].sum(), 'Cli': vend['Meta_Clientes'].sum(), 'Ativ': vend['Meta_Atividades'].sum()}
+            else: metas = {'Fat': u.get('Meta_Fat', 0), 'Cli': u.get('Meta_Clientes', 0), 'Ativ': u.get('Meta_Atividades', 0)}
+            return {'usuario': usuario, 'tipo': tipo, 'carts': carts, 'metas': metas}
+        return self._memorizar('perfil', (usuario,), calcular)
+
+    def metas(self, usuario, hoje=None):
+        # {indicador: (realizado no mês, meta)} da barra lateral
+        hoje = hoje or date.today()
+        q = self._quadro()
+        # O realizado do Quadro é o do retrato: depois de uma gravação vale a base
+        if q is not None and (q.versao_base != self.base.versao or (q.dia.year, q.dia.month) != (hoje.year, hoje.month)): q = None
+        def calcular():
+            p = self.perfil(usuario)
+            grupo = (None if "TODOS" in p['carts'] else p['carts']) if p['tipo'] == "GESTOR" else [usuario]
+            # Vendedor ou time todo: já calculado no Quadro; grupo de vendedores: pela base
+            if q is not None and (grupo is None or len(grupo) == 1): real = q.meta(grupo[0] if grupo else None)
+            else: real = self.base.metas_mes(grupo, hoje)
+            return {k: (real[k], meta) for k, meta in p['metas'].items()}
+        return self._memorizar('metas', (usuario, hoje.year, hoje.month, q and q.versao), calcular)
+
+    def vendedores_disponiveis(self, carts):
+        def calcular():
+            df_cfg = self.base.df_cfg
+            if "TODOS" in carts: return sorted(df_cfg[df_cfg['Tipo'] == 'VENDEDOR']['Usuario'].unique())
+            return sorted([v for v in carts if v in df_cfg['Usuario'].values])
+        return self._memorizar('vendedores', (tuple(sorted(carts)),), calcular)
+
+    # --- GESTOR ---
+    def painel_gestor(self, carts, inicio, fim, vendedores=()):
+        # KPIs e ranking do período, já formatados para exibir (None sem dados)
+        vendedores = tuple(sorted(vendedores))
+        chave = (tuple(sorted(carts)), inicio, fim, vendedores)
+        return self._memorizar('painel_gestor', chave, lambda: self._painel_gestor(carts, inicio, fim, vendedores))
+
+    def detalhes_gestor(self, carts, inicio, fim, vendedores=()):
+        # Interações do período formatadas para a tabela e a exportação (crm.exportacao). Do tamanho
+        # do período: memorizadas à parte, só as últimas (LIMITES_MEMO)
+        vendedores = tuple(sorted(vendedores))
+        def calcular():
+            dff = self._interacoes_gestor(carts, inicio, fim, vendedores)
+            nomes = self.base.df_cli.drop_duplicates('KEY_DOC', keep='last').set_index('KEY_DOC')['Nome_Fantasia']
+            return formatar_relatorio(dff.assign(Nome_Cliente=dff['KEY_DOC'].map(nomes).fillna("Nome não encontrado")))
+        return self._memorizar('detalhes_gestor', (tuple(sorted(carts)), inicio, fim, vendedores), calcular)
+
+    def _interacoes_gestor(self, carts, inicio, fim, vendedores):
+        _, minhas_int = self.base.carteira(carts)
+        if minhas_int.empty: return minhas_int
+        dff = periodo(minhas_int, inicio, fim)
+        return dff[dff['Vendedor'].isin(vendedores)] if vendedores else dff
+
+    def _painel_gestor(self, carts, inicio, fim, vendedores):
+        base = self.base
+        if self._interacoes_gestor(carts, inicio, fim, vendedores).empty: return None
+
+        # Placar por vendedor do período (guardado pela base); filtrar vendedores é só selecionar linhas.
+        # Na Mesa = Pipeline: orçamentos sem fechamento/perda registrado.
+        placar = base.placar(carts, inicio, fim)
+        if vendedores: placar = placar[placar.index.isin(vendedores)]
+        kpi = placar[['Orcado', 'Pipeline', 'Fat', 'Perdido']].sum().to_dict()
+
+        agg = placar[['Fat', 'Cli', 'Ativ', 'Conversao', 'Pipeline']].reset_index()
+        df_metas_merge = base.df_cfg[['Usuario', 'Meta_Fat']].rename(columns={'Usuario':'Vendedor'})
+        agg = pd.merge(agg, df_metas_merge, on='Vendedor', how='left').fillna({'Meta_Fat': 0})
+        pct_meta = (agg['Fat'] / agg['Meta_Fat'].where(agg['Meta_Fat'] > 0) * 100).round().astype('Int64')
+        agg['% Meta'] = np.where(pct_meta.notna(), pct_meta.astype(str) + '%', '-')
+        conv = (agg['Conversao'] * 100).round().astype('Int64')
+        agg['Conversao'] = np.where(conv.notna(), conv.astype(str) + '%', '-')
+        agg['Fat'] = agg['Fat'].map(fmt_moeda)
+        agg['Pipeline'] = agg['Pipeline'].map(fmt_moeda)
+
+        return {'kpi': kpi, 'ranking': agg}
+
+    # --- VENDEDOR ---
+    def lista_clientes(self, carts, status, busca=''):
+        # Clientes da carteira pela busca (nome/documento) ou, sem busca, pelos status marcados.
+        # Com o Quadro, o status é o do dia (recalculado na virada), não o da última carga.
+        q = self._quadro()
+        def calcular():
+            meus_cli = q.carteira(carts) if q is not None else self.base.carteira(carts)[0]
+            if busca: return meus_cli.loc[meus_cli.index.intersection(self.base.busca.buscar(busca))]
+            return meus_cli[meus_cli['Status'].isin(status)].sort_values('Status')
+        return self._memorizar('lista_clientes', (tuple(sorted(carts)), tuple(status), busca, q and q.versao), calcular)
+
+    def pagina_clientes(self, carts, status, busca, pagina):
+        # (total de clientes, nº de páginas, {ID: rótulo} da página) para o radio da carteira
+        def calcular():
+            lista = self.lista_clientes(carts, status, busca)
+            if lista.empty: return 0, 1, {}
+            pag = paginar(lista, pagina).drop_duplicates('ID_Cliente_CNPJ_CPF')
+            rotulos = dict(zip(pag['ID_Cliente_CNPJ_CPF'], "[" + pag['Status'].astype(str) + "] " + pag['Nome_Fantasia'].astype(str)))
+            return len(lista), paginas(len(lista)), rotulos
+        q = self._quadro()
+        return self._memorizar('pagina_clientes', (tuple(sorted(carts)), tuple(status), busca, pagina, q and q.versao), calcular)
+
+    def filas(self, vendedor):
+        # {status: clientes} das filas de recuperação e follow-up do vendedor no dia (vazio sem Quadro)
+        q = self._quadro()
+        return {st: q.fila(st, vendedor) for st in (RECUPERAR, FOLLOW_UP)} if q is not None else {}
+
+    def cliente(self, carts, id_cliente):
+        # Dados, histórico (mais recente primeiro) e propostas abertas de um cliente da carteira
+        def calcular():
+            meus_cli, _ = self.base.carteira(carts)
+            rot = self.base.busca.linha(id_cliente)
+            if rot is not None and rot in meus_cli.index: dados = meus_cli.loc[rot]
+            else: dados = meus_cli[meus_cli['ID_Cliente_CNPJ_CPF'] == id_cliente].iloc[0]
+            ints = self.base.historico(carts, dados['KEY_DOC']).sort_values('Data_Obj', ascending=False)
+            hist = ints[['Data_Obj', 'Tipo', 'Resumo', 'Valor_Proposta']].copy()
+            hist['Valor_Proposta'] = fmt_moeda_serie(hist['Valor_Proposta'])
+            hist['Data_Obj'] = fmt_data_serie(hist['Data_Obj'])
+            return {'dados': dados, 'historico': hist, 'abertas': propostas_abertas(ints, self.base.idx_propostas).to_dict('records')}
+        return self._memorizar('cliente', (tuple(sorted(carts)), id_cliente), calcular)
+
+    # --- GRAVAÇÃO ---
+    def salvar_interacao(self, cnpj, data_input, tipo, resumo, vend, val):
+        data_obj = data_input.date() if isinstance(data_input, datetime) else data_input
+        if tipo == "Orçamento Enviado": resumo = f"#{gerar_id_proposta()} {resumo}"
+        self.base.gravar("Interacoes", [str(cnpj), data_obj.strftime('%d/%m/%Y'), tipo, resumo, str(vend).strip().upper(), int(val)])
+
+    def salvar_lead(self, nome, doc, cont, tel, vend, ori, acao, res, val):
+        vend_clean = str(vend).strip().upper()
+        self.base.gravar("Novos_Leads", [str(doc), nome.upper(), cont, "NOVO LEAD", tel, "", "", "0", "", "0", "", vend_clean, ori])
+        if acao:
+            id_p = f"#{gerar_id_proposta()} " if acao == "Orçamento Enviado" else ""
+            self.base.gravar("Interacoes", [str(doc), datetime.now().strftime('%d/%m/%Y'), acao, f"{id_p}{res}", vend_clean, int(val)])
+
+    def importar(self, arquivo):
+        # Importa o Excel do Protheus; retorna a mensagem para o usuário
+        novos, rel = importar_protheus(arquivo, self.base.idx_propostas.pedidos)
+        ini = time.perf_counter()
+        if novos: self.base.gravar_lote("Interacoes", novos)
+        rel['tempos']['gravacao'] = time.perf_counter() - ini
+        METRICAS.contar('importacao.protheus.linhas', rel['novos'])
+        METRICAS.contar('importacao.protheus.rejeitadas', rel['rejeitados'])
+        tempos = " | ".join(f"{k}: {v:.1f}s" for k, v in rel['tempos'].items())
+        msg = f"{rel['novos']} importados, {rel['duplicados']} já existiam, {rel['rejeitados']} rejeitados ({tempos})"
+        return msg if novos else f"Nada novo. {msg}"
+
+    def importar_clientes(self, arquivo):
+        # CSV de clientes do ERP (upsert por documento na aba Clientes); retorna a mensagem
+        df, rel = importar_clientes_csv(arquivo)
+        ini = time.perf_counter()
+        res = self.base.gravar_clientes(df) if len(df) else {'novos': 0, 'atualizados': 0, 'iguais': 0}
+        rel['tempos']['gravacao'] = time.perf_counter() - ini
+        METRICAS.contar('importacao.clientes.novos', res['novos'])
+        METRICAS.contar('importacao.clientes.atualizados', res['atualizados'])
+        tempos = " | ".join(f"{k}: {v:.1f}s" for k, v in rel['tempos'].items())
+        msg = (f"{res['novos']} novos, {res['atualizados']} atualizados, {res['iguais']} sem mudança, "
+               f"{rel['rejeitados']} rejeitados, {rel['duplicados']} repetidos no arquivo ({tempos})")
+        return msg if res['novos'] or res['atualizados'] else f"Nada novo. {msg}"
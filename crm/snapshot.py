@@ -0,0 +1,53 @@
+import json
+import os
+import time
+import uuid
+
+import pyarrow as pa
+import pyarrow.feather as feather
+
+# Mudou a limpeza/formato dos frames? Aumente: snapshots antigos passam a ser ignorados
+VERSAO_SNAPSHOT = 4
+PASTA_PADRAO = os.environ.get('CRM_SNAPSHOT_DIR', '.crm_snapshot')
+TABELAS = ('cfg', 'cli', 'int')
+
+
+def _para_arrow(df):
+    # Colunas object com tipos misturados (ex.: número e texto vindos da planilha) não
+    # têm tipo Arrow; essas vão como texto. Datas (Data_Obj) e colunas homogêneas ficam como estão.
+    df = df.copy()
+    for c in df.columns[df.dtypes == object]:
+        try: pa.array(df[c], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError): df[c] = df[c].astype(str)
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def salvar_snapshot(pasta, frames, meta):
+    # Grava os arquivos de uma nova geração e só então troca o meta.json (os.replace é
+    # atômico): quem lê nunca vê um snapshot pela metade.
+    os.makedirs(pasta, exist_ok=True)
+    geracao = uuid.uuid4().hex[:12]
+    for nome, df in zip(TABELAS, frames):
+        feather.write_feather(_para_arrow(df), os.path.join(pasta, f"{nome}-{geracao}.arrow"), compression='uncompressed')
+    meta = dict(meta, versao=VERSAO_SNAPSHOT, geracao=geracao, gravado_em=time.time())
+    tmp = os.path.join(pasta, f"meta-{geracao}.tmp")
+    with open(tmp, 'w', encoding='utf-8') as f: json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp, os.path.join(pasta, 'meta.json'))
+    for arq in os.listdir(pasta):
+        if arq.endswith('.arrow') and geracao not in arq:
+            try: os.remove(os.path.join(pasta, arq))
+            except OSError: pass
+
+
+def carregar_snapshot(pasta):
+    # Retorna (frames, meta) ou None se não houver snapshot compatível
+    try:
+        with open(os.path.join(pasta, 'meta.json'), encoding='utf-8') as f: meta = json.load(f)
+        if meta.get('versao') != VERSAO_SNAPSHOT: return None
+        frames = tuple(
+            feather.read_table(os.path.join(pasta, f"{nome}-{meta['geracao']}.arrow"), memory_map=True).to_pandas()
+            for nome in TABELAS
+        )
+    except (OSError, ValueError, KeyError, pa.ArrowException):
+        return None
+    return frames, meta